@@ -0,0 +1,202 @@
+import math
+import os
+import threading
+import time
+
+from agents.ttl_cache import LRUTTLCache
+from redis_client import REDIS_URL, get_redis
+
+# Admission control for /analyze. Before queueing, the API estimates how
+# long the new task would wait:
+#   queue length (LLEN of the Celery queue) x recent task seconds (EWMA
+#   reported by the workers) / worker slots serving that queue
+# Above the queue's SLO the request is degraded to the lite mode (memory +
+# toxicity only), and above SLO x ADMISSION_REJECT_FACTOR it gets a 429.
+ADMISSION_ENABLED = os.getenv("ADMISSION", "1") == "1"
+ADMISSION_SLO_SECONDS = {
+    "interactive": float(os.getenv("ADMISSION_SLO_INTERACTIVE", "20")),
+    "bulk": float(os.getenv("ADMISSION_SLO_BULK", "900")),
+}
+ADMISSION_DEGRADE = os.getenv("ADMISSION_DEGRADE", "1") == "1"
+ADMISSION_REJECT_FACTOR = float(os.getenv("ADMISSION_REJECT_FACTOR", "3"))
+# Task seconds assumed until the workers have reported any
+ADMISSION_DEFAULT_TASK_SECONDS = float(os.getenv("ADMISSION_DEFAULT_TASK_SECONDS", "8"))
+ADMISSION_EWMA_ALPHA = float(os.getenv("ADMISSION_EWMA_ALPHA", "0.2"))
+# A worker's slots stop counting if it hasn't finished a task for this long
+ADMISSION_SLOTS_TTL = int(os.getenv("ADMISSION_SLOTS_TTL", "300"))
+# How long the API reuses an estimate, so a spike costs no extra Redis calls
+ADMISSION_CACHE_SECONDS = float(os.getenv("ADMISSION_CACHE_SECONDS", "1"))
+
+# Per-client token bucket: RATE_LIMIT_PER_MINUTE queued analyses on
+# average, with bursts of up to RATE_LIMIT_BURST
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+# /analyze/batch is charged one token per text it queues, from a bucket of
+# its own (a single batch may hold more texts than RATE_LIMIT_BURST)
+BATCH_RATE_LIMIT_PER_MINUTE = float(os.getenv("BATCH_RATE_LIMIT_PER_MINUTE", "120"))
+BATCH_RATE_LIMIT_BURST = float(os.getenv("BATCH_RATE_LIMIT_BURST", "200"))
+
+LATENCY_KEY = "inocula:admission:latency"
+SLOTS_PREFIX = "inocula:admission:slots:"
+BUCKET_PREFIX = "inocula:ratelimit:"
+MAX_RETRY_AFTER = 600
+
+_EWMA_SCRIPT = """
+local old = tonumber(redis.call('HGET', KEYS[1], ARGV[1]))
+local sample = tonumber(ARGV[2])
+local alpha = tonumber(ARGV[3])
+local new = sample
+if old then new = alpha * sample + (1 - alpha) * old end
+redis.call('HSET', KEYS[1], ARGV[1], tostring(new))
+return tostring(new)
+"""
+
+_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+def _retry_after(seconds: float) -> int:
+    return max(1, min(MAX_RETRY_AFTER, math.ceil(seconds)))
+
+
+# --- Worker side ---
+
+def record_task(queue: str, seconds: float, worker: str = None, slots: int = None):
+    """
+    Called by workers after each task: folds its duration into the queue's
+    EWMA and refreshes how many slots this worker serves the queue with.
+    Never raises; admission control must not fail an analysis.
+    """
+    try:
+        redis = get_redis()
+        redis.eval(_EWMA_SCRIPT, 1, LATENCY_KEY, queue, seconds, ADMISSION_EWMA_ALPHA)
+        if worker and slots:
+            redis.hset(SLOTS_PREFIX + queue, worker, f"{slots}:{time.time()}")
+    except Exception:
+        pass
+
+
+# --- API side ---
+
+_estimates = LRUTTLCache(64, ADMISSION_CACHE_SECONDS)
+
+
+def estimate_wait(queue: str) -> float:
+    """
+    Seconds a task queued now on `queue` would wait before starting.
+    """
+    cached = _estimates.get(queue)
+    if cached is not None:
+        return cached
+
+    redis = get_redis()
+    pipe = redis.pipeline()
+    pipe.llen(queue)
+    pipe.hget(LATENCY_KEY, queue)
+    pipe.hgetall(SLOTS_PREFIX + queue)
+    length, task_seconds, workers = pipe.execute()
+
+    now = time.time()
+    slots = 0
+    for value in workers.values():
+        count, seen = value.split(":", 1)
+        if now - float(seen) < ADMISSION_SLOTS_TTL:
+            slots += int(count)
+    task_seconds = float(task_seconds) if task_seconds else ADMISSION_DEFAULT_TASK_SECONDS
+    wait = length * task_seconds / max(1, slots)
+    _estimates.set(queue, wait)
+    return wait
+
+
+def admit(queue: str):
+    """
+    Returns (decision, estimated_wait, retry_after), decision being
+    "accept", "degrade" or "reject". Fails open if Redis is unreachable.
+    """
+    if not ADMISSION_ENABLED or not REDIS_URL:
+        return "accept", 0.0, None
+    try:
+        wait = estimate_wait(queue)
+    except Exception:
+        return "accept", 0.0, None
+
+    slo = ADMISSION_SLO_SECONDS.get(queue, ADMISSION_SLO_SECONDS["interactive"])
+    if wait <= slo:
+        return "accept", wait, None
+    if ADMISSION_DEGRADE and wait <= slo * ADMISSION_REJECT_FACTOR:
+        return "degrade", wait, None
+    # Roughly when the backlog will be back under the SLO
+    return "reject", wait, _retry_after(wait - slo)
+
+
+class LocalTokenBuckets:
+    """
+    Process-local buckets of one kind, for running without Redis.
+    """
+
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60
+        self.burst = burst
+        # A bucket idle for long enough to refill is dropped (it would be
+        # full anyway), like the Redis key's EXPIRE
+        self._buckets = LRUTTLCache(100000, burst / self.rate + 1 if self.rate > 0 else 1)
+        self._lock = threading.Lock()
+
+    def take(self, client: str, cost: float):
+        now = time.time()
+        with self._lock:
+            tokens, ts = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + max(0.0, now - ts) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets.set(client, (tokens, now))
+        return allowed, 0.0 if allowed else (cost - tokens) / self.rate
+
+
+_local_buckets = LocalTokenBuckets(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+_local_batch_buckets = LocalTokenBuckets(BATCH_RATE_LIMIT_PER_MINUTE, BATCH_RATE_LIMIT_BURST)
+
+
+def allow_client(client: str, cost: float = 1, batch: bool = False):
+    """
+    Takes `cost` tokens from the client's bucket (its batch bucket with
+    `batch`). Returns (allowed, retry_after), retry_after being None when
+    allowed. A cost above the burst takes the whole (full) bucket.
+    """
+    per_minute, burst = (BATCH_RATE_LIMIT_PER_MINUTE, BATCH_RATE_LIMIT_BURST) if batch else \
+        (RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+    if per_minute <= 0:
+        return True, None
+    rate = per_minute / 60
+    cost = min(cost, burst)
+    key = f"batch:{client}" if batch else client
+    try:
+        if REDIS_URL:
+            allowed, wait = get_redis().eval(
+                _BUCKET_SCRIPT, 1, BUCKET_PREFIX + key, rate, burst, time.time(), cost)
+            allowed, wait = bool(int(allowed)), float(wait)
+        else:
+            allowed, wait = (_local_batch_buckets if batch else _local_buckets).take(client, cost)
+    except Exception:
+        return True, None
+    return allowed, None if allowed else _retry_after(wait)
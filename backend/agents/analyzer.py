@@ -1,21 +1,19 @@
-from transformers import pipeline
+from agents.models import get_pipeline
+from agents.chunking import emotion_outputs
 from agents.state import AgentState
 
 print("Loading Analyzer Agent (emotion-distilroberta)...")
-emotion_pipeline = pipeline(
-    "text-classification", 
-    model="j-hartmann/emotion-english-distilroberta-base", 
-    return_all_scores=True
-)
+emotion_pipeline = get_pipeline("emotion")
 
 def analyzer_node(state: AgentState):
     """
     Deducts points from the score established by the detector.
     """
     text = state["input_text"]
-    current_score = state.get("score", 100)
     
-    results = emotion_pipeline(text)[0]
+    results = state.get("model_outputs", {}).get("emotions")
+    if results is None:
+        results = emotion_outputs([text])[0]
     
     found_emotions = []
     new_reasons = []
@@ -30,6 +28,5 @@ def analyzer_node(state: AgentState):
     
     return {
         "detected_emotions": found_emotions,
-        "reasons": new_reasons,
-        "score": max(0, current_score - deduction)
+        "signals": {"analyzer": {"deduction": deduction, "reasons": new_reasons}}
     }
\ No newline at end of file
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from agents.chunking import toxicity_outputs, emotion_outputs
+from agents.fallacy_engine import fallacy_outputs
+from agents.fallacy import FALLACY_LABELS
+from agents.graph import arun_inocula_agent, run_inocula_agent
+
+# Batched inference is opt-in. It only pays off when several tasks are in
+# flight in the same process, i.e. a worker started with a thread pool:
+#   celery -A celery_worker worker -P threads -c 16
+BATCH_MAX_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "1"))
+BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "10"))
+BATCHING_ENABLED = BATCH_MAX_SIZE > 1
+
+
+def run_model_batch(texts):
+    """
+    Runs each classifier once over the windows of every text in the list
+    and splits the outputs back per text, in the shape the graph nodes expect.
+    """
+    toxicity = toxicity_outputs(texts)
+    emotions = emotion_outputs(texts)
+    fallacies = fallacy_outputs(texts, FALLACY_LABELS)
+
+    return [
+        {"toxicity": tox, "emotions": emo, "fallacy": fal}
+        for tox, emo, fal in zip(toxicity, emotions, fallacies)
+    ]
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads for up to `window_ms`
+    (or until `max_size` items are waiting), hands them to `handler` as a
+    single list and resolves each caller's Future with its own result.
+    """
+
+    def __init__(self, handler, max_size=BATCH_MAX_SIZE, window_ms=BATCH_WINDOW_MS):
+        self.handler = handler
+        self.max_size = max_size
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_started(self):
+        # Started lazily so each prefork child gets its own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inocula-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.handler(items)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher():
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(run_model_batch)
+        return _batcher
+
+
+def run_batched_agent(text: str, on_event=None, trace: bool = False, explain: bool = True, embedding=None):
+    """
+    Same as run_inocula_agent, but the three classifiers run as part of a
+    shared micro-batch. The rest of the graph (Wikipedia, Gemini) still runs
+    in the calling thread, so network stages of different tasks overlap.
+    """
+    model_outputs = get_batcher().submit(text).result()
+    return run_inocula_agent(text, model_outputs=model_outputs, on_event=on_event, trace=trace, explain=explain,
+                             embedding=embedding)
+
+
+async def arun_batched_agent(text: str, on_event=None, trace: bool = False, explain: bool = True, embedding=None):
+    """
+    run_batched_agent for the async graph: the micro-batch is awaited
+    without holding the event loop.
+    """
+    model_outputs = await asyncio.wrap_future(get_batcher().submit(text))
+    return await arun_inocula_agent(text, model_outputs=model_outputs, on_event=on_event, trace=trace,
+                                    explain=explain, embedding=embedding)
@@ -0,0 +1,97 @@
+import inspect
+import os
+import threading
+
+from agents.scoring import FALLACY_MAX_DEDUCTION, combine_signals, score_band
+
+# Early-exit policy: run cheap signals first and skip the expensive steps
+# (the 5-hypothesis NLI fallacy pass, the Gemini call) when they cannot move
+# the verdict band any more. Off by default.
+CASCADE_ENABLED = os.getenv("CASCADE", "0") == "1"
+CASCADE_SKIP_FALLACY = os.getenv("CASCADE_SKIP_FALLACY", "1") == "1"
+CASCADE_SKIP_LLM = os.getenv("CASCADE_SKIP_LLM", "1") == "1"
+# Without Wikipedia context Gemini has nothing to contradict the text with,
+# so on a green/orange verdict it would only restate the local signals.
+CASCADE_SKIP_LLM_WITHOUT_CONTEXT = os.getenv("CASCADE_SKIP_LLM_WITHOUT_CONTEXT", "1") == "1"
+
+
+class CascadeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"fallacy_run": 0, "fallacy_skipped": 0, "llm_run": 0, "llm_skipped": 0}
+
+    def record(self, step: str, ran: bool):
+        with self._lock:
+            self.counts[f"{step}_{'run' if ran else 'skipped'}"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+stats = CascadeStats()
+
+
+def should_run_fallacy(state) -> bool:
+    """
+    The fallacy agent can only lower the score by FALLACY_MAX_DEDUCTION. Skip
+    it when even that would leave the detector + analyzer score in the same band.
+    """
+    if not CASCADE_SKIP_FALLACY:
+        return True
+    score, _ = combine_signals(state.get("signals", {}))
+    return score_band(score) != score_band(max(0, score - FALLACY_MAX_DEDUCTION))
+
+
+def should_run_llm(state) -> bool:
+    """
+    Gemini can only keep the score or override it to 0. Skip it when the
+    verdict is already red, or when there is no Wikipedia context to check.
+    """
+    if not CASCADE_SKIP_LLM:
+        return True
+    if score_band(state.get("score", 100)) == "red":
+        return False
+    has_context = bool(state.get("metadata", {}).get("verification_summary"))
+    return has_context or not CASCADE_SKIP_LLM_WITHOUT_CONTEXT
+
+
+def fallacy_skipped(state):
+    return {
+        "signals": {"fallacy": {"deduction": 0, "reasons": []}},
+        "skipped_steps": ["fallacy"],
+    }
+
+
+def explainer_skipped(state):
+    reasons = state.get("reasons", [])
+    return {
+        "explanation": f"Verdict from local signals: {reasons[0]}" if reasons else "Analysis complete.",
+        "skipped_steps": ["explainer"],
+    }
+
+
+def gate(step: str, node, should_run, skipped):
+    """
+    Wraps `node` (plain or async) so it only runs when `should_run(state)`,
+    returning `skipped(state)` otherwise.
+    """
+    if inspect.iscoroutinefunction(node):
+        async def gated(state):
+            ran = should_run(state)
+            stats.record(step, ran)
+            return await node(state) if ran else skipped(state)
+    else:
+        def gated(state):
+            ran = should_run(state)
+            stats.record(step, ran)
+            return node(state) if ran else skipped(state)
+    return gated
+
+
+def gated_fallacy(node):
+    return gate("fallacy", node, should_run_fallacy, fallacy_skipped)
+
+
+def gated_explainer(node):
+    return gate("llm", node, should_run_llm, explainer_skipped)
@@ -1,10 +1,4 @@
-import os
-from google import genai
-from dotenv import load_dotenv
-
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=GEMINI_API_KEY)
+from agents.llm import get_llm
 
 async def run_chat_followup(previous_analysis: dict, user_question: str):
     """
@@ -35,11 +29,8 @@ async def run_chat_followup(previous_analysis: dict, user_question: str):
     """
 
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt
-        )
-        return response.text.strip()
+        # Async client: the event loop keeps serving other requests meanwhile
+        return await get_llm().agenerate(prompt, call="chat")
     except Exception as e:
         print(f"DEBUG: Chat Agent Error: {e}")
         return "I'm sorry, I'm having trouble retrieving the context for that follow-up. Please try again."
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+import re
+
+from agents.models import get_pipeline
+from agents.metrics import MODEL_SECONDS, timed
+
+# Long texts are split into overlapping token windows so every part of an
+# article is scored, instead of overflowing or silently truncating at 512.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "510"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+# The NLI model also needs room for the hypothesis ("This example is ...");
+# its windows are built in agents/fallacy_engine.py
+NLI_HYPOTHESIS_TOKENS = 32
+# How per-chunk scores become one score per text: "max" flags a text if any
+# part of it is problematic, "mean" scores the text as a whole.
+CHUNK_AGGREGATION = os.getenv("CHUNK_AGGREGATION", "max")
+CHUNK_BATCH_SIZE = int(os.getenv("CHUNK_BATCH_SIZE", "16"))
+
+
+def split_windows(text: str, tokenizer, max_tokens: int = CHUNK_MAX_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS):
+    """
+    Splits `text` into pieces of at most `max_tokens` tokens, each sharing
+    `overlap` tokens with the previous one. Pieces are slices of the
+    original text (via offset mappings), not detokenized strings.
+    """
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    if len(offsets) <= max_tokens:
+        return [text]
+
+    step = max(1, max_tokens - overlap)
+    windows = []
+    for start in range(0, len(offsets), step):
+        end = min(start + max_tokens, len(offsets))
+        windows.append(text[offsets[start][0]:offsets[end - 1][1]])
+        if end == len(offsets):
+            break
+    return windows
+
+
+def _chunk_all(texts, tokenizer, max_tokens):
+    """
+    Flattens the windows of every text into one list, remembering which
+    slice belongs to which text.
+    """
+    chunks, spans = [], []
+    for text in texts:
+        windows = split_windows(text, tokenizer, max_tokens)
+        spans.append((len(chunks), len(chunks) + len(windows)))
+        chunks.extend(windows)
+    return chunks, spans
+
+
+def aggregate(values, rule: str = None):
+    rule = rule or CHUNK_AGGREGATION
+    if rule == "mean":
+        return sum(values) / len(values)
+    return max(values)
+
+
+def toxicity_outputs(texts):
+    """
+    toxic-bert over every window of every text in one batched call.
+    Returns, per text, a detector-style result with the aggregated toxic score.
+    """
+    pipe = get_pipeline("toxicity")
+    chunks, spans = _chunk_all(texts, pipe.tokenizer, CHUNK_MAX_TOKENS)
+    with timed(MODEL_SECONDS, model="toxicity"):
+        results = pipe(chunks, batch_size=CHUNK_BATCH_SIZE, truncation=True)
+
+    outputs = []
+    for start, end in spans:
+        scores = [r["score"] if r["label"] == "toxic" else 0.0 for r in results[start:end]]
+        outputs.append([{"label": "toxic", "score": aggregate(scores)}])
+    return outputs
+
+
+def emotion_outputs(texts):
+    """
+    Emotion scores per text, each label aggregated across the text's windows.
+    """
+    pipe = get_pipeline("emotion")
+    chunks, spans = _chunk_all(texts, pipe.tokenizer, CHUNK_MAX_TOKENS)
+    with timed(MODEL_SECONDS, model="emotion"):
+        results = pipe(chunks, batch_size=CHUNK_BATCH_SIZE, truncation=True)
+
+    outputs = []
+    for start, end in spans:
+        per_label = {}
+        for chunk_scores in results[start:end]:
+            for entry in chunk_scores:
+                per_label.setdefault(entry["label"], []).append(entry["score"])
+        outputs.append([{"label": label, "score": aggregate(scores)} for label, scores in per_label.items()])
+    return outputs
+
+
+# --- Claim selection for the verifier ---
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+CLAIM_WORDS = re.compile(
+    r"\b(is|are|was|were|has|have|cause[sd]?|cure[sd]?|prove[sd]?|confirm(ed|s)?|reveal(ed|s)?|"
+    r"announce[sd]?|discover(ed|s)?|found|killed|will|never|always)\b",
+    re.IGNORECASE,
+)
+QUERY_MAX_CHARS = 150
+
+
+def claim_score(sentence: str) -> float:
+    """
+    Rough "checkable claim" heuristic: numbers, named entities and assertive
+    verbs push a sentence up; questions and fragments push it down.
+    """
+    words = sentence.split()
+    if len(words) < 5 or sentence.rstrip().endswith("?"):
+        return 0.0
+    score = 1.0
+    score += 2.0 if re.search(r"\d", sentence) else 0.0
+    score += min(3, sum(1 for w in words[1:] if w[:1].isupper()))
+    score += 1.0 if CLAIM_WORDS.search(sentence) else 0.0
+    return score
+
+
+def claim_sentences(text: str, limit: int = 2):
+    """
+    The `limit` most claim-like sentences of `text`, in their original order,
+    each cut to a search-sized query.
+    """
+    sentences = [s.strip() for s in SENTENCE_SPLIT.split(text) if s.strip()]
+    if len(sentences) <= limit:
+        return [s[:QUERY_MAX_CHARS] for s in sentences] or [text[:QUERY_MAX_CHARS]]
+    ranked = sorted(range(len(sentences)), key=lambda i: claim_score(sentences[i]), reverse=True)[:limit]
+    return [sentences[i][:QUERY_MAX_CHARS] for i in sorted(ranked)]
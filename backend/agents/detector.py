@@ -1,21 +1,33 @@
-from transformers import pipeline
+from agents.models import get_pipeline
+from agents.chunking import toxicity_outputs
 from agents.state import AgentState
 
 print("Loading Detector Agent (toxic-bert)...")
-tox_pipeline = pipeline("text-classification", model="unitary/toxic-bert")
+tox_pipeline = get_pipeline("toxicity")
 
-def detector_node(state: AgentState):
+def toxicity_level(results):
     """
-    Starts with 100 points. Deducts based on toxicity.
+    Turns the raw toxic-bert output for one text into a 0-100 level.
     """
-    text = state["input_text"]
-    results = tox_pipeline(text)
-    
     # toxicity-bert returns scores for 'toxic'
     toxicity_score = 0
     for result in results:
         if result['label'] == 'toxic':
             toxicity_score = int(result['score'] * 100)
+    return toxicity_score
+
+def detector_node(state: AgentState):
+    """
+    Starts with 100 points. Deducts based on toxicity.
+    The deduction is applied by the join node (see agents/scoring.py).
+    """
+    text = state["input_text"]
+    results = state.get("model_outputs", {}).get("toxicity")
+    if results is None:
+        # Long texts are scored window by window (agents/chunking.py)
+        results = toxicity_outputs([text])[0]
+    
+    toxicity_score = toxicity_level(results)
     
     is_toxic = toxicity_score > 50
     reasons = []
@@ -28,6 +40,5 @@ def detector_node(state: AgentState):
     # START at 100 and subtract toxicity
     # If toxicity is 0, score remains 100 (Safe)
     return {
-        "score": 100 - toxicity_score,
-        "reasons": reasons
+        "signals": {"detector": {"deduction": toxicity_score, "reasons": reasons}}
     }
\ No newline at end of file
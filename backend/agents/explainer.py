@@ -1,20 +1,9 @@
-import os
-from google import genai
 from agents.state import AgentState
-from dotenv import load_dotenv
+from agents.llm import get_llm
+from agents.cascade import CASCADE_ENABLED, gated_explainer
+from agents.metrics import instrument_node
 
-# Load API Key
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-# Initialize the GenAI Client
-client = genai.Client(api_key=GEMINI_API_KEY)
-
-def explainer_node(state: AgentState):
-    """
-    Synthesizes findings and performs final factual validation.
-    If Wikipedia context contradicts the input, it overrides the score.
-    """
+def explainer_prompt(state: AgentState) -> str:
     text_snippet = state["input_text"]
     current_score = state.get("score", 100)
     reasons = state.get("reasons", [])
@@ -23,7 +12,7 @@ def explainer_node(state: AgentState):
     # Extract Wikipedia context from metadata
     wiki_context = state.get("metadata", {}).get("verification_summary", "No direct Wikipedia context found.")
     
-    prompt = f"""
+    return f"""
     As a Misinformation Expert, synthesize a final report.
     
     USER CONTENT: "{text_snippet}"
@@ -45,38 +34,75 @@ def explainer_node(state: AgentState):
     EXPLANATION: [text]
     """
 
-    try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt
-        )
-        response_text = response.text.strip()
-        
-        # Simple parsing logic
-        new_score = current_score
-        explanation = "Analysis complete."
-        
-        for line in response_text.split('\n'):
-            if line.startswith("FINAL_SCORE:"):
-                try:
-                    new_score = int(line.replace("FINAL_SCORE:", "").strip())
-                except: pass
-            if line.startswith("EXPLANATION:"):
-                explanation = line.replace("EXPLANATION:", "").strip()
+def explainer_update(state: AgentState, response_text: str) -> dict:
+    """
+    Parses Gemini's answer into the explainer's state update.
+    """
+    current_score = state.get("score", 100)
+
+    # Simple parsing logic
+    new_score = current_score
+    explanation = "Analysis complete."
+    
+    for line in response_text.split('\n'):
+        if line.startswith("FINAL_SCORE:"):
+            try:
+                new_score = int(line.replace("FINAL_SCORE:", "").strip())
+            except: pass
+        if line.startswith("EXPLANATION:"):
+            explanation = line.replace("EXPLANATION:", "").strip()
+
+    # Add a reason if the score was overridden to 0
+    final_reasons = []
+    if new_score == 0 and current_score > 0:
+        final_reasons = ["Factual Contradiction: This claim is explicitly refuted by established records."]
+
+    return {
+        "score": new_score,
+        "explanation": explanation,
+        "reasons": final_reasons
+    }
 
-        # Add a reason if the score was overridden to 0
-        final_reasons = []
-        if new_score == 0 and current_score > 0:
-            final_reasons = ["Factual Contradiction: This claim is explicitly refuted by established records."]
+EXPLAINER_FALLBACK = {"explanation": "Analysis complete. Factual verification suggest this may be inaccurate."}
 
-        return {
-            "score": new_score,
-            "explanation": explanation,
-            "reasons": final_reasons
-        }
+def explainer_node(state: AgentState):
+    """
+    Synthesizes findings and performs final factual validation.
+    If Wikipedia context contradicts the input, it overrides the score.
+    """
+    try:
+        return explainer_update(state, get_llm().generate(explainer_prompt(state), call="explain"))
+    except Exception as e:
+        print(f"DEBUG: Explainer API Error: {e}")
+        return dict(EXPLAINER_FALLBACK)
 
+async def aexplainer_node(state: AgentState):
+    """
+    explainer_node for the async graph: the Gemini call is awaited, so the
+    worker serves other requests meanwhile.
+    """
+    try:
+        return explainer_update(state, await get_llm().agenerate(explainer_prompt(state), call="explain"))
     except Exception as e:
         print(f"DEBUG: Explainer API Error: {e}")
-        return {
-            "explanation": "Analysis complete. Factual verification suggest this may be inaccurate."
-        }
\ No newline at end of file
+        return dict(EXPLAINER_FALLBACK)
+
+# Keys the explainer reads or writes, i.e. what the io queue stage needs
+STAGE_KEYS = ("input_text", "score", "reasons", "detected_emotions", "metadata",
+              "is_memory_hit", "skipped_steps", "tracing", "trace")
+# State keys the graph merges with operator.add instead of overwriting
+APPENDED_KEYS = ("reasons", "skipped_steps", "trace")
+
+def run_explainer_stage(state: dict, on_event=None, cascade: bool = CASCADE_ENABLED):
+    """
+    Runs the explainer outside the graph (the Celery io queue stage) and
+    merges its update into `state` the way the graph's reducers would.
+    """
+    node = gated_explainer(explainer_node) if cascade else explainer_node
+    update = instrument_node("explainer", node)(state) or {}
+    if on_event:
+        on_event("explainer", update)
+    merged = dict(state)
+    for key, value in update.items():
+        merged[key] = merged.get(key, []) + value if key in APPENDED_KEYS else value
+    return merged
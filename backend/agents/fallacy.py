@@ -1,11 +1,11 @@
-from transformers import pipeline
+import os
+from agents.models import get_pipeline
+from agents.fallacy_engine import fallacy_outputs
 from agents.state import AgentState
+from agents.scoring import FALLACY_DEDUCTION, FALLACY_MAX_DEDUCTION
 
 print("Loading Fallacy Agent (deberta-v3-nli)...")
-classifier = pipeline(
-    "zero-shot-classification", 
-    model="sileod/deberta-v3-base-tasksource-nli"
-)
+classifier = get_pipeline("fallacy")
 
 # Refined labels for better detection
 FALLACY_LABELS = [
@@ -15,32 +15,45 @@ FALLACY_LABELS = [
     "Logical Reasoning",
     "Fear Mongering"
 ]
+SOUND_LABEL = "Logical Reasoning"
+
+# Independent (multi-label) entailment probability above which a fallacy
+# counts as present (only used with FALLACY_MULTI_LABEL=1; not calibrated yet)
+FALLACY_MULTI_THRESHOLD = float(os.getenv("FALLACY_MULTI_THRESHOLD", "0.8"))
+
+def detected_fallacies(result: dict):
+    """
+    Fallacy labels found in a ranked result. Multi-label results can flag
+    several; single-label ones (softmax over labels) only their top label.
+    """
+    if result.get("multi_label"):
+        return [
+            label for label, score in zip(result["labels"], result["scores"])
+            if label != SOUND_LABEL and score > FALLACY_MULTI_THRESHOLD
+        ]
+    # We lowered the threshold to 0.3 to catch more subtle fallacies
+    top_label, top_score = result["labels"][0], result["scores"][0]
+    return [top_label] if top_label != SOUND_LABEL and top_score > 0.3 else []
 
 def fallacy_node(state: AgentState):
     """
-    More sensitive fallacy detection using Zero-Shot logic.
+    More sensitive fallacy detection using Zero-Shot logic, deducting
+    points for each fallacy found.
     """
     if state.get("is_memory_hit"):
         return {}
 
     text = state["input_text"]
-    current_score = state.get("score", 100)
     
     # We ask the model to rank the labels
-    result = classifier(text, candidate_labels=FALLACY_LABELS)
-    
-    top_label = result['labels'][0]
-    top_score = result['scores'][0]
+    result = state.get("model_outputs", {}).get("fallacy")
+    if result is None:
+        result = fallacy_outputs([text], FALLACY_LABELS)[0]
     
-    new_reasons = []
-    deduction = 0
-    
-    # We lowered the threshold to 0.3 to catch more subtle fallacies
-    if top_label != "Logical Reasoning" and top_score > 0.3:
-        new_reasons.append(f"Logical Flaw: {top_label}")
-        deduction = 25
+    fallacies = detected_fallacies(result)
+    new_reasons = [f"Logical Flaw: {label}" for label in fallacies]
+    deduction = min(FALLACY_MAX_DEDUCTION, FALLACY_DEDUCTION * len(fallacies))
         
     return {
-        "score": max(0, current_score - deduction),
-        "reasons": new_reasons
+        "signals": {"fallacy": {"deduction": deduction, "reasons": new_reasons}}
     }
\ No newline at end of file
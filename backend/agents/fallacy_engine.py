@@ -0,0 +1,145 @@
+import os
+import threading
+
+import torch
+
+from agents.models import get_pipeline
+from agents.chunking import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, NLI_HYPOTHESIS_TOKENS, aggregate
+from agents.metrics import MODEL_SECONDS, timed
+
+# NLI fallacy scoring without the zero-shot pipeline: every text is
+# tokenized once, the hypotheses ("This example is <label>.") are tokenized
+# once per process, and all (window, hypothesis) pairs of a batch of texts
+# go through the model together in length-sorted, padded batches.
+HYPOTHESIS_TEMPLATE = "This example is {}."
+# Pairs per forward pass (texts x windows x labels are split into these)
+FALLACY_PAIR_BATCH = int(os.getenv("FALLACY_PAIR_BATCH", "64"))
+# Score every label independently (entailment vs contradiction per pair)
+# instead of a softmax across labels, so co-occurring fallacies show up.
+# Off by default: it changes verdicts, and FALLACY_MULTI_THRESHOLD has to be
+# calibrated first (benchmarks/bench_fallacy_engine.py reports the agreement
+# with the single-label decision per threshold)
+FALLACY_MULTI_LABEL = os.getenv("FALLACY_MULTI_LABEL", "0") == "1"
+
+
+class FallacyEngine:
+    def __init__(self, pipe=None, template: str = HYPOTHESIS_TEMPLATE):
+        pipe = pipe or get_pipeline("fallacy")
+        self.model = pipe.model
+        self.tokenizer = pipe.tokenizer
+        self.template = template
+        label2id = {label.lower(): index for label, index in self.model.config.label2id.items()}
+        self.entailment_id = next(i for label, i in label2id.items() if label.startswith("entail"))
+        self.contradiction_id = next(i for label, i in label2id.items() if label.startswith("contra"))
+        self._hypotheses = {}
+        self._lock = threading.Lock()
+
+    def hypothesis_ids(self, label: str):
+        """
+        Token IDs of the hypothesis for `label`, tokenized once and cached.
+        """
+        ids = self._hypotheses.get(label)
+        if ids is None:
+            ids = self.tokenizer(self.template.format(label), add_special_tokens=False)["input_ids"]
+            with self._lock:
+                self._hypotheses[label] = ids
+        return ids
+
+    @staticmethod
+    def _windows(ids, max_tokens: int):
+        """
+        Same overlapping windows as chunking.split_windows, over token IDs.
+        """
+        if len(ids) <= max_tokens:
+            return [ids]
+        step = max(1, max_tokens - CHUNK_OVERLAP_TOKENS)
+        windows = []
+        for start in range(0, len(ids), step):
+            windows.append(ids[start:start + max_tokens])
+            if start + max_tokens >= len(ids):
+                break
+        return windows
+
+    def _pair(self, premise_ids, hypothesis_ids) -> dict:
+        features = {"input_ids": self.tokenizer.build_inputs_with_special_tokens(premise_ids, hypothesis_ids)}
+        if "token_type_ids" in self.tokenizer.model_input_names:
+            features["token_type_ids"] = self.tokenizer.create_token_type_ids_from_sequences(premise_ids, hypothesis_ids)
+        return features
+
+    def _logits(self, pairs) -> torch.Tensor:
+        """
+        Model logits for every pair, in input order. Pairs are sorted by
+        length first so each padded batch wastes as little as possible.
+        """
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i]["input_ids"]))
+        logits = [None] * len(pairs)
+        with torch.inference_mode():
+            for start in range(0, len(order), FALLACY_PAIR_BATCH):
+                chunk = order[start:start + FALLACY_PAIR_BATCH]
+                batch = self.tokenizer.pad([pairs[i] for i in chunk], return_tensors="pt")
+                batch = {name: tensor.to(self.model.device) for name, tensor in batch.items()}
+                for i, row in zip(chunk, self.model(**batch).logits.float().cpu()):
+                    logits[i] = row
+        return torch.stack(logits)
+
+    def score(self, texts, labels, multi_label: bool = FALLACY_MULTI_LABEL):
+        """
+        Returns one {label: score} dict per text, scores aggregated across
+        the text's windows. With `multi_label` each score is P(entailment)
+        of that label alone; otherwise scores sum to 1 over `labels`, like
+        the zero-shot pipeline.
+        """
+        hypotheses = [self.hypothesis_ids(label) for label in labels]
+        max_premise = CHUNK_MAX_TOKENS - NLI_HYPOTHESIS_TOKENS
+
+        pairs, spans = [], []
+        for text in texts:
+            windows = self._windows(self.tokenizer(text, add_special_tokens=False)["input_ids"], max_premise)
+            spans.append((len(pairs) // len(labels), len(pairs) // len(labels) + len(windows)))
+            pairs.extend(self._pair(window, hypothesis) for window in windows for hypothesis in hypotheses)
+
+        with timed(MODEL_SECONDS, model="fallacy"):
+            logits = self._logits(pairs).view(-1, len(labels), self.model.config.num_labels)
+
+        if multi_label:
+            pair_logits = logits[:, :, [self.contradiction_id, self.entailment_id]]
+            scores = pair_logits.softmax(dim=-1)[:, :, 1]
+        else:
+            scores = logits[:, :, self.entailment_id].softmax(dim=-1)
+
+        results = []
+        for start, end in spans:
+            window_scores = scores[start:end].tolist()
+            results.append({
+                label: aggregate([row[j] for row in window_scores]) for j, label in enumerate(labels)
+            })
+        return results
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_fallacy_engine() -> FallacyEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FallacyEngine()
+        return _engine
+
+
+def fallacy_outputs(texts, candidate_labels, multi_label: bool = FALLACY_MULTI_LABEL):
+    """
+    Fallacy ranking per text in the zero-shot pipeline's output shape
+    ({"sequence", "labels", "scores"}, highest first), plus "multi_label".
+    """
+    outputs = []
+    for text, scores in zip(texts, get_fallacy_engine().score(texts, candidate_labels, multi_label)):
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        outputs.append({
+            "sequence": text,
+            "labels": [label for label, _ in ranked],
+            "scores": [score for _, score in ranked],
+            "multi_label": multi_label,
+        })
+    return outputs
@@ -3,13 +3,18 @@ from agents.state import AgentState
 from agents.detector import detector_node
 from agents.analyzer import analyzer_node
 from agents.fallacy import fallacy_node
-from agents.explainer import explainer_node
-from agents.verifier import verifier_node # New
-from agents.memory import search_memory
+from agents.explainer import explainer_node, aexplainer_node
+from agents.verifier import verifier_node, averifier_node # New
+from agents.models import run_inference
+from agents.memory import embed, search_memory
+from agents.scoring import BRANCH_ORDER, combine_signals
+from agents.cascade import CASCADE_ENABLED, gated_fallacy, gated_explainer
+from agents.metrics import MEMORY_LOOKUPS, instrument_node
 
 def memory_node(state: AgentState):
     text = state["input_text"]
-    match = search_memory(text)
+    match = search_memory(text, vector=state.get("embedding"))
+    MEMORY_LOOKUPS.labels(result="hit" if match else "miss").inc()
     if match:
         return {
             "is_memory_hit": True,
@@ -19,40 +24,208 @@ def memory_node(state: AgentState):
         }
     return {"is_memory_hit": False}
 
+def join_node(state: AgentState):
+    """
+    Waits for every analysis branch and turns their deductions into the
+    stylistic score the explainer works from.
+    """
+    score, reasons = combine_signals(state.get("signals", {}))
+    return {"score": score, "reasons": reasons}
+
 def route_after_memory(state: AgentState):
+    if state.get("is_memory_hit"):
+        return "explainer"
+    return BRANCH_ORDER # Fan out to all independent agents at once
+
+def route_after_memory_sequential(state: AgentState):
     if state.get("is_memory_hit"):
         return "explainer"
     return "verifier" # Start with fact verification after memory
 
-workflow = StateGraph(AgentState)
+def route_after_memory_cascade(state: AgentState):
+    if state.get("is_memory_hit"):
+        return "explainer"
+    return ["verifier", "detector", "analyzer"] # Cheap signals first
+
+def build_graph(parallel: bool = True, overrides: dict = None, cascade: bool = CASCADE_ENABLED, explain: bool = True):
+    """
+    Compiles the agent workflow.
+
+    parallel=True:  Memory -> [Verifier | Detector | Analyzer | Fallacy] -> Join -> Explainer
+    parallel=False: Memory -> Verifier -> Detector -> Analyzer -> Fallacy -> Join -> Explainer
+    cascade=True:   Memory -> [Verifier | Detector | Analyzer -> Fallacy?] -> Join -> Explainer?
+                    (fallacy and Gemini only run if they can change the verdict band)
+
+    `overrides` replaces nodes by name (e.g. a stub explainer for benchmarks,
+    or ASYNC_NODES for the async graph).
+    explain=False stops after Join (and on memory hits), leaving the Gemini
+    stage to agents.explainer.run_explainer_stage on the io queue.
+    """
+    nodes = {
+        "memory": memory_node,
+        "verifier": verifier_node, # Fact Check Tool
+        "detector": detector_node,
+        "analyzer": analyzer_node,
+        "fallacy": fallacy_node,
+        "join": join_node,
+        "explainer": explainer_node,
+    }
+    nodes.update(overrides or {})
+    if not explain:
+        del nodes["explainer"]
+    if cascade:
+        nodes["fallacy"] = gated_fallacy(nodes["fallacy"])
+        if explain:
+            nodes["explainer"] = gated_explainer(nodes["explainer"])
+
+    workflow = StateGraph(AgentState)
+    for name, node in nodes.items():
+        workflow.add_node(name, instrument_node(name, node))
 
-workflow.add_node("memory", memory_node)
-workflow.add_node("verifier", verifier_node) # Fact Check Tool
-workflow.add_node("detector", detector_node)
-workflow.add_node("analyzer", analyzer_node)
-workflow.add_node("fallacy", fallacy_node)
-workflow.add_node("explainer", explainer_node)
+    workflow.set_entry_point("memory")
+    # Where the routers' "explainer" and the join lead
+    final = "explainer" if explain else END
 
-workflow.set_entry_point("memory")
+    if cascade:
+        workflow.add_conditional_edges(
+            "memory", route_after_memory_cascade,
+            {"explainer": final, "verifier": "verifier", "detector": "detector", "analyzer": "analyzer"}
+        )
+        workflow.add_edge(["detector", "analyzer"], "fallacy")
+        workflow.add_edge(["verifier", "fallacy"], "join")
+    elif parallel:
+        # The verifier's Wikipedia round-trips overlap with model inference
+        workflow.add_conditional_edges(
+            "memory", route_after_memory, {"explainer": final, **{name: name for name in BRANCH_ORDER}}
+        )
+        workflow.add_edge(BRANCH_ORDER, "join")
+    else:
+        workflow.add_conditional_edges(
+            "memory",
+            route_after_memory_sequential,
+            {"explainer": final, "verifier": "verifier"}
+        )
+        for current, following in zip(BRANCH_ORDER, BRANCH_ORDER[1:] + ["join"]):
+            workflow.add_edge(current, following)
 
-workflow.add_conditional_edges(
-    "memory",
-    route_after_memory,
-    {"explainer": "explainer", "verifier": "verifier"}
-)
+    workflow.add_edge("join", final)
+    if explain:
+        workflow.add_edge("explainer", END)
 
-# New logical flow: Memory -> Verifier -> Detector -> Analyzer -> Fallacy -> Explainer
-workflow.add_edge("verifier", "detector")
-workflow.add_edge("detector", "analyzer")
-workflow.add_edge("analyzer", "fallacy")
-workflow.add_edge("fallacy", "explainer")
-workflow.add_edge("explainer", END)
+    return workflow.compile()
 
-app_graph = workflow.compile()
+def route_after_memory_lite(state: AgentState):
+    return "end" if state.get("is_memory_hit") else "detector"
 
-def run_inocula_agent(text: str):
-    initial_state = {
+def build_lite_graph():
+    """
+    Memory -> Detector -> Join: the cheap mode admission control falls back
+    to under load (no Wikipedia, no emotion or fallacy models, no Gemini).
+    """
+    workflow = StateGraph(AgentState)
+    for name, node in {"memory": memory_node, "detector": detector_node, "join": join_node}.items():
+        workflow.add_node(name, instrument_node(name, node))
+    workflow.set_entry_point("memory")
+    workflow.add_conditional_edges("memory", route_after_memory_lite, {"end": END, "detector": "detector"})
+    workflow.add_edge("detector", "join")
+    workflow.add_edge("join", END)
+    return workflow.compile()
+
+def offloaded(node):
+    """
+    Async wrapper running a CPU-bound node on the inference executor
+    (agents/models.py), so the event loop stays free for network stages.
+    """
+    async def run(state):
+        return await run_inference(node, state)
+    return run
+
+async def ajoin_node(state: AgentState):
+    return join_node(state)
+
+# Node implementations of the async graph (the asyncio worker mode): the
+# verifier and explainer await their network calls, everything else runs
+# on the inference executor
+ASYNC_NODES = {
+    "memory": offloaded(memory_node),
+    "verifier": averifier_node,
+    "detector": offloaded(detector_node),
+    "analyzer": offloaded(analyzer_node),
+    "fallacy": offloaded(fallacy_node),
+    "join": ajoin_node,
+    "explainer": aexplainer_node,
+}
+
+app_graph = build_graph()
+# Everything but the Gemini stage, for workers that hand it to the io queue
+local_graph = build_graph(explain=False)
+lite_graph = build_lite_graph()
+async_app_graph = build_graph(overrides=ASYNC_NODES)
+async_local_graph = build_graph(overrides=ASYNC_NODES, explain=False)
+LITE_SKIPPED_STEPS = ["verifier", "analyzer", "fallacy", "explainer"]
+
+def initial_state(text: str, model_outputs: dict = None, trace: bool = False, embedding=None):
+    return {
         "input_text": text, "reasons": [], "detected_emotions": [], "score": 100,
-        "explanation": "", "metadata": {}, "is_memory_hit": False, "memory_context": ""
+        "explanation": "", "metadata": {}, "is_memory_hit": False, "memory_context": "",
+        "model_outputs": model_outputs or {}, "signals": {}, "skipped_steps": [],
+        "tracing": trace, "trace": [],
+        "embedding": embed(text) if embedding is None else embedding
     }
-    return app_graph.invoke(initial_state)
\ No newline at end of file
+
+def run_inocula_agent(text: str, model_outputs: dict = None, on_event=None, trace: bool = False, explain: bool = True,
+                      embedding=None):
+    """
+    Runs the graph on one text. If `on_event(node_name, update)` is given,
+    it is called with each node's output as soon as that node finishes.
+    With `trace=True` the final state's "trace" lists every node's latency.
+    With `explain=False` the explainer is left out. `embedding` is the
+    text's MiniLM vector, when the caller already computed it.
+    """
+    graph = app_graph if explain else local_graph
+    state = initial_state(text, model_outputs, trace, embedding)
+    if on_event is None:
+        return graph.invoke(state)
+
+    final_state = state
+    for mode, chunk in graph.stream(state, stream_mode=["updates", "values"]):
+        if mode == "updates":
+            for node_name, update in chunk.items():
+                on_event(node_name, update or {})
+        else:
+            final_state = chunk
+    return final_state
+
+async def arun_inocula_agent(text: str, model_outputs: dict = None, on_event=None, trace: bool = False,
+                             explain: bool = True, embedding=None):
+    """
+    run_inocula_agent on the async graph, for the asyncio worker mode.
+    Awaiting it from many tasks on one event loop overlaps their Wikipedia
+    and Gemini waits, while their inference queues on the executor.
+    """
+    graph = async_app_graph if explain else async_local_graph
+    if embedding is None:
+        embedding = await run_inference(embed, text)
+    state = initial_state(text, model_outputs, trace, embedding)
+    if on_event is None:
+        return await graph.ainvoke(state)
+
+    final_state = state
+    async for mode, chunk in graph.astream(state, stream_mode=["updates", "values"]):
+        if mode == "updates":
+            for node_name, update in chunk.items():
+                on_event(node_name, update or {})
+        else:
+            final_state = chunk
+    return final_state
+
+def run_lite_agent(text: str):
+    """
+    Runs the lite graph on one text, see build_lite_graph.
+    """
+    result = lite_graph.invoke(initial_state(text))
+    if result.get("is_memory_hit"):
+        explanation = f"Quick check: matches a known claim ({result.get('memory_context')})."
+    else:
+        explanation = "Quick check only: the service is busy, so fact checking and the full analysis were skipped."
+    return {**result, "explanation": explanation, "skipped_steps": LITE_SKIPPED_STEPS}
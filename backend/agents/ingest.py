@@ -0,0 +1,125 @@
+"""
+Bulk loader for debunked claims.
+
+Streams rows from a CSV (url, title, body, label — like data/sample_articles.csv)
+or JSONL file, encodes them in large batches and appends them to the
+semantic memory in chunks, skipping claims that are already stored.
+
+Run from the backend folder:
+    python -m agents.ingest ../data/sample_articles.csv --keep-labels false
+    python -m agents.ingest --seed   # only the seed claims, into an empty store
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+from agents import memory
+
+
+def iter_rows(path: str):
+    """
+    Yields one dict per row, reading the file lazily.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".json")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def row_text(row: dict) -> str:
+    if row.get("text"):
+        return row["text"].strip()
+    title = (row.get("title") or "").strip()
+    body = (row.get("body") or "").strip()
+    return f"{title}. {body}" if title and body else title or body
+
+
+def row_label(row: dict, source: str) -> str:
+    return f"Previously debunked ({row.get('url') or source})"
+
+
+def existing_hashes() -> set:
+    # Older records may predate the "hash" field
+    return {
+        record.get("hash") or memory.content_hash(record["text"])
+        for record in memory.knowledge_base
+    }
+
+
+def ingest_file(path: str, keep_labels=("false",), chunk_size: int = 4096, batch_size: int = 256):
+    """
+    Loads `path` into memory. Only rows whose `label` column is in
+    `keep_labels` are kept (pass None to keep every row). Peak memory is one
+    chunk of texts and their embeddings, plus the set of known hashes.
+
+    Returns a dict with read / added / skipped counts and rows per second.
+    """
+    source = os.path.basename(path)
+    stats = {"read": 0, "added": 0, "duplicates": 0, "filtered": 0}
+    texts, labels = [], []
+    start = time.perf_counter()
+
+    # Held for the whole load: other writers wait, and the index is saved
+    # once, when it's released
+    with memory.store_lock():
+        seen = existing_hashes()
+
+        def flush():
+            memory.add_many_to_memory(texts, labels, batch_size=batch_size)
+            stats["added"] += len(texts)
+            elapsed = time.perf_counter() - start
+            print(f"  {stats['read']} rows read, {stats['added']} added ({stats['read'] / elapsed:.0f} rows/sec)")
+            texts.clear()
+            labels.clear()
+
+        for row in iter_rows(path):
+            stats["read"] += 1
+            if keep_labels is not None and str(row.get("label", "")).lower() not in keep_labels:
+                stats["filtered"] += 1
+                continue
+            text = row_text(row)
+            if not text:
+                stats["filtered"] += 1
+                continue
+            digest = memory.content_hash(text)
+            if digest in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+            texts.append(text)
+            labels.append(row.get("memory_label") or row_label(row, source))
+            if len(texts) >= chunk_size:
+                flush()
+
+        if texts:
+            flush()
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["rows_per_sec"] = round(stats["read"] / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load debunked claims into semantic memory.")
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--seed", action="store_true", help="add the seed claims first if the store is empty")
+    parser.add_argument("--keep-labels", nargs="*", default=["false"],
+                        help="label values to ingest; pass no values to ingest every row")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if not args.paths and not args.seed:
+        parser.error("give at least one path, or --seed")
+    if args.seed:
+        memory.seed_memory()
+    keep = {label.lower() for label in args.keep_labels} or None
+    for path in args.paths:
+        print(f"Ingesting {path}...")
+        print(ingest_file(path, keep_labels=keep, chunk_size=args.chunk_size, batch_size=args.batch_size))
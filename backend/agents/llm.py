@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from agents import metrics
+from agents.ttl_cache import LRUTTLCache
+
+load_dotenv()
+
+# One gateway for every Gemini call (explainer and chat): bounded
+# concurrency, a response cache keyed on the prompt, retries with backoff
+# and a circuit breaker so an outage fails fast instead of stalling workers.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # gemini | stub
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+# Consecutive failures that open the breaker, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# Simulated round-trip of the stub backend
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0"))
+
+
+class LLMUnavailable(Exception):
+    """
+    Raised without calling the model while the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `max_failures` consecutive failures. Once `reset_after`
+    seconds have passed, calls are let through again; one more failure
+    re-opens it, one success closes it.
+    """
+
+    def __init__(self, max_failures: int = LLM_BREAKER_FAILURES, reset_after: float = LLM_BREAKER_RESET):
+        self.max_failures = max_failures
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            return self._opened_at is None or time.monotonic() - self._opened_at >= self.reset_after
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._failures >= self.max_failures:
+                self._opened_at = time.monotonic()
+
+
+class GeminiBackend:
+    def __init__(self, model: str = LLM_MODEL, client=None):
+        if client is None:
+            from google import genai
+            from google.genai import types
+            client = genai.Client(
+                api_key=os.getenv("GEMINI_API_KEY"),
+                http_options=types.HttpOptions(timeout=int(LLM_TIMEOUT * 1000)),
+            )
+        self.model = model
+        self.client = client
+
+    def generate(self, prompt: str) -> str:
+        return self.client.models.generate_content(model=self.model, contents=prompt).text
+
+    async def agenerate(self, prompt: str) -> str:
+        response = await self.client.aio.models.generate_content(model=self.model, contents=prompt)
+        return response.text
+
+
+class StubBackend:
+    """
+    Deterministic local stand-in for offline runs and benchmarks. Explainer
+    prompts get their stylistic score echoed back, so results only depend
+    on the local models; anything else gets a fixed answer.
+    """
+
+    model = "stub"
+
+    def __init__(self, latency: float = LLM_STUB_LATENCY):
+        self.latency = latency
+        self.requests = 0
+
+    def _answer(self, prompt: str) -> str:
+        self.requests += 1
+        match = re.search(r"Stylistic Score: (\d+)", prompt)
+        if match:
+            return f"FINAL_SCORE: {match.group(1)}\nEXPLANATION: Stub explanation."
+        return "Stub answer."
+
+    def generate(self, prompt: str) -> str:
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+
+def _retryable(error: Exception) -> bool:
+    # Client errors (bad request, auth, ...) won't succeed on a retry,
+    # rate limits and server errors might
+    code = getattr(error, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code != 429)
+
+
+class LLMGateway:
+    def __init__(self, backend=None, max_concurrency: int = LLM_MAX_CONCURRENCY, retries: int = LLM_RETRIES,
+                 backoff: float = LLM_BACKOFF, cache_size: int = LLM_CACHE_SIZE, cache_ttl: float = LLM_CACHE_TTL,
+                 breaker: CircuitBreaker = None):
+        self.backend = backend or BACKENDS[LLM_BACKEND]()
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = LRUTTLCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self.breaker = breaker or CircuitBreaker()
+        self._max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = None
+
+    def _key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.backend.model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key):
+        if self.cache is None:
+            return None
+        value = self.cache.get(key)
+        metrics.record_cache("llm", value is not None)
+        return value
+
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def generate(self, prompt: str, call: str = "generate") -> str:
+        """
+        Blocking call, for graph nodes running in worker threads.
+        """
+        key = self._key(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise LLMUnavailable("LLM circuit breaker is open")
+            try:
+                with self._slots, metrics.timed(metrics.EXTERNAL_SECONDS, metrics.EXTERNAL_FAILURES,
+                                                service="gemini", call=call):
+                    text = self.backend.generate(prompt).strip()
+            except Exception as e:
+                self.breaker.record(success=False)
+                if attempt == self.retries or not _retryable(e):
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+            self.breaker.record(success=True)
+            if self.cache is not None:
+                self.cache.set(key, text)
+            return text
+
+    async def agenerate(self, prompt: str, call: str = "generate") -> str:
+        """
+        Non-blocking call on the backend's async client, for the API.
+        """
+        key = self._key(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self._max_concurrency)
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise LLMUnavailable("LLM circuit breaker is open")
+            try:
+                async with self._async_slots:
+                    with metrics.timed(metrics.EXTERNAL_SECONDS, metrics.EXTERNAL_FAILURES, service="gemini", call=call):
+                        text = (await self.backend.agenerate(prompt)).strip()
+            except Exception as e:
+                self.breaker.record(success=False)
+                if attempt == self.retries or not _retryable(e):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            self.breaker.record(success=True)
+            if self.cache is not None:
+                self.cache.set(key, text)
+            return text
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm() -> LLMGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def set_llm(gateway: LLMGateway):
+    """
+    Replaces the shared gateway, e.g. with a stub backend in benchmarks.
+    """
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
@@ -0,0 +1,367 @@
+"""
+Local, offline knowledge index for the verifier (VERIFIER_BACKEND=local).
+
+Built once from a Wikipedia abstracts dump (enwiki-*-abstract.xml[.gz]) or
+any JSONL/CSV corpus with title, text (or abstract / extract / body) and
+url fields. Everything is stored as flat arrays next to each other and
+memory-mapped at load, so prefork children share the same pages and a
+lookup only touches the postings of the query's terms:
+- a BM25 inverted index (sorted term table, postings, document lengths)
+- optionally, MiniLM vectors (agents/memory.py) that re-rank the BM25
+  candidates by cosine similarity to the query
+- the documents themselves (JSON lines + byte offsets)
+
+Run from the backend folder:
+    python -m agents.local_kb build ../data/enwiki-latest-abstract.xml.gz --vectors
+    python -m agents.local_kb query "The moon landing was staged"
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+
+LOCAL_KB_DIR = os.getenv("LOCAL_KB_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_kb_store"))
+# BM25 candidates re-ranked by the vectors (when the index has them)
+LOCAL_KB_CANDIDATES = int(os.getenv("LOCAL_KB_CANDIDATES", "50"))
+# Weight of the cosine similarity vs the (max-normalized) BM25 score
+LOCAL_KB_DENSE_WEIGHT = float(os.getenv("LOCAL_KB_DENSE_WEIGHT", "0.5"))
+# Best matches under this BM25 score count as "nothing found", like an
+# empty Wikipedia search
+LOCAL_KB_MIN_SCORE = float(os.getenv("LOCAL_KB_MIN_SCORE", "5"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms are stored as fixed-width byte strings; longer tokens are dropped
+TERM_BYTES = 32
+
+META_FILE = "kb.json"
+TERMS_FILE = "terms.npy"
+POSTING_OFFSETS_FILE = "posting_offsets.npy"
+POSTING_DOCS_FILE = "posting_docs.npy"
+POSTING_TF_FILE = "posting_tf.npy"
+DOC_LENGTHS_FILE = "doc_lengths.npy"
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.jsonl"
+DOC_OFFSETS_FILE = "doc_offsets.npy"
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have he her his in is it its of on or that the their they this to was
+were which who will with not but had been also after into than then there these those its
+""".split())
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str):
+    return [
+        token for token in _TOKEN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS and len(token.encode("utf-8")) <= TERM_BYTES
+    ]
+
+
+# --- Corpus readers ---
+
+def iter_abstracts(path: str):
+    """
+    Yields {"title", "text", "url"} from a Wikipedia abstracts dump.
+    """
+    import xml.etree.ElementTree as ET
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            if event != "end" or element.tag != "doc":
+                continue
+            title = (element.findtext("title") or "").removeprefix("Wikipedia: ").strip()
+            yield {"title": title, "text": (element.findtext("abstract") or "").strip(), "url": element.findtext("url") or ""}
+            # Drop parsed docs so the tree never holds the whole dump
+            root.clear()
+
+
+def iter_rows(path: str):
+    """
+    Yields one dict per row of a JSONL (optionally gzipped) or CSV file.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="", encoding="utf-8") as f:
+        if ".jsonl" in path or ".json" in path:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def iter_corpus(path: str):
+    """
+    Yields {"title", "text", "url"} per document of `path`, skipping empty ones.
+    """
+    rows = iter_abstracts(path) if ".xml" in os.path.basename(path) else iter_rows(path)
+    for row in rows:
+        text = (row.get("text") or row.get("abstract") or row.get("extract") or row.get("body") or "").strip()
+        # Abstracts of list and disambiguation pages are often just "...may refer to:"
+        if len(text) < 20:
+            continue
+        yield {"title": (row.get("title") or "").strip(), "text": text, "url": row.get("url") or ""}
+
+
+# --- Build ---
+
+def build_index(path: str, out_dir: str = LOCAL_KB_DIR, vectors: bool = False, limit: int = None,
+                batch_size: int = 256) -> dict:
+    """
+    Builds the index for the corpus at `path` into `out_dir`, replacing
+    any previous one. Postings are collected as typed arrays (about 10
+    bytes each), so a full abstracts dump needs a few GB of RAM while
+    building. Returns build statistics.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    vocabulary = {}
+    term_ids, doc_ids, tfs = array("I"), array("I"), array("H")
+    doc_lengths = array("I")
+    doc_offsets = array("q", [0])
+
+    pending, vector_chunks, encode_seconds = [], [], 0.0
+    if vectors:
+        from agents.memory import dimension, embed_many
+
+    def encode_pending():
+        nonlocal encode_seconds
+        encode_start = time.perf_counter()
+        encoded = embed_many([f"{doc['title']}. {doc['text']}" for doc in pending], batch_size=batch_size)
+        vector_chunks.append(encoded.astype("float16"))
+        encode_seconds += time.perf_counter() - encode_start
+        pending.clear()
+
+    with open(os.path.join(out_dir, DOCS_FILE + ".tmp"), "wb") as docs_file:
+        for doc_id, doc in enumerate(iter_corpus(path)):
+            if limit and doc_id >= limit:
+                break
+            counts = Counter(tokenize(f"{doc['title']} {doc['text']}"))
+            for term, tf in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                tfs.append(min(tf, 65535))
+            doc_lengths.append(sum(counts.values()))
+            docs_file.write(json.dumps(doc).encode("utf-8") + b"\n")
+            doc_offsets.append(docs_file.tell())
+            if vectors:
+                pending.append(doc)
+                if len(pending) >= batch_size * 16:
+                    encode_pending()
+            if (doc_id + 1) % 100000 == 0:
+                print(f"  {doc_id + 1} documents read ({time.perf_counter() - start:.0f}s)")
+        if pending:
+            encode_pending()
+
+    count = len(doc_lengths)
+    # Term table sorted, so lookups are a binary search over the mmap
+    terms = sorted(vocabulary)
+    rank = np.empty(len(terms), dtype="int64")
+    rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+    term_order = rank[np.frombuffer(term_ids, dtype="uint32")] if term_ids else np.empty(0, dtype="int64")
+    order = np.argsort(term_order, kind="stable")
+    posting_offsets = np.zeros(len(terms) + 1, dtype="int64")
+    np.cumsum(np.bincount(term_order, minlength=len(terms)), out=posting_offsets[1:])
+
+    def save(name, values):
+        np.save(os.path.join(out_dir, name + ".tmp.npy"), values)
+        os.replace(os.path.join(out_dir, name + ".tmp.npy"), os.path.join(out_dir, name))
+
+    save(TERMS_FILE, np.array([term.encode("utf-8") for term in terms], dtype=f"S{TERM_BYTES}"))
+    save(POSTING_OFFSETS_FILE, posting_offsets)
+    save(POSTING_DOCS_FILE, np.frombuffer(doc_ids, dtype="uint32")[order])
+    save(POSTING_TF_FILE, np.frombuffer(tfs, dtype="uint16")[order])
+    save(DOC_LENGTHS_FILE, np.frombuffer(doc_lengths, dtype="uint32"))
+    save(DOC_OFFSETS_FILE, np.frombuffer(doc_offsets, dtype="int64"))
+    os.replace(os.path.join(out_dir, DOCS_FILE + ".tmp"), os.path.join(out_dir, DOCS_FILE))
+    if vectors:
+        save(VECTORS_FILE, np.concatenate(vector_chunks) if vector_chunks else np.empty((0, dimension), dtype="float16"))
+    elif os.path.exists(os.path.join(out_dir, VECTORS_FILE)):
+        os.remove(os.path.join(out_dir, VECTORS_FILE))
+
+    meta = {
+        "documents": count,
+        "terms": len(terms),
+        "postings": len(doc_ids),
+        "avg_length": float(np.mean(doc_lengths)) if count else 0.0,
+        "vectors": vectors,
+        "source": os.path.basename(path),
+        "built": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f)
+
+    elapsed = time.perf_counter() - start
+    return {
+        **meta,
+        "seconds": round(elapsed, 2),
+        "encode_seconds": round(encode_seconds, 2),
+        "docs_per_sec": round(count / elapsed, 1) if elapsed else 0.0,
+        "bytes": sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir)),
+    }
+
+
+# --- Query ---
+
+class LocalKnowledgeIndex:
+    """
+    Read-only view of a built index. lookup() returns the same
+    {"title", "extract", "url"} as WikipediaClient.lookup.
+    """
+
+    def __init__(self, directory: str = LOCAL_KB_DIR):
+        meta_path = os.path.join(directory, META_FILE)
+        if not os.path.exists(meta_path):
+            raise RuntimeError(f"No local knowledge index in {directory}; build one with python -m agents.local_kb build")
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self.terms = load(TERMS_FILE)
+        self.posting_offsets = load(POSTING_OFFSETS_FILE)
+        self.posting_docs = load(POSTING_DOCS_FILE)
+        self.posting_tf = load(POSTING_TF_FILE)
+        self.doc_lengths = load(DOC_LENGTHS_FILE)
+        self.doc_offsets = load(DOC_OFFSETS_FILE)
+        self.vectors = load(VECTORS_FILE) if self.meta.get("vectors") else None
+        self.count = self.meta["documents"]
+        self.avg_length = self.meta["avg_length"] or 1.0
+        self._docs_fd = os.open(os.path.join(directory, DOCS_FILE), os.O_RDONLY)
+
+    def __len__(self):
+        return self.count
+
+    def document(self, doc_id: int) -> dict:
+        start, end = int(self.doc_offsets[doc_id]), int(self.doc_offsets[doc_id + 1])
+        # pread: no shared file position, so threads can read concurrently
+        return json.loads(os.pread(self._docs_fd, end - start, start))
+
+    def _term_id(self, term: str):
+        key = term.encode("utf-8")
+        position = int(np.searchsorted(self.terms, key))
+        if position < len(self.terms) and self.terms[position] == key:
+            return position
+        return None
+
+    def bm25(self, query: str, k: int):
+        """
+        The `k` best (doc_ids, scores) for `query`, best first.
+        """
+        doc_parts, score_parts = [], []
+        for term in set(tokenize(query)):
+            term_id = self._term_id(term)
+            if term_id is None:
+                continue
+            start, end = self.posting_offsets[term_id], self.posting_offsets[term_id + 1]
+            docs = np.asarray(self.posting_docs[start:end])
+            tf = np.asarray(self.posting_tf[start:end], dtype="float32")
+            idf = np.log(1 + (self.count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / self.avg_length)
+            doc_parts.append(docs)
+            score_parts.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+        if not doc_parts:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        best = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return docs[best], scores[best]
+
+    def search(self, query: str, k: int = 1, vector=None):
+        """
+        The `k` best (doc_id, score) for `query`. With vectors in the index
+        and the query's `vector`, BM25 candidates are re-ranked by a mix of
+        BM25 and cosine similarity. Matches under LOCAL_KB_MIN_SCORE BM25
+        are left out.
+        """
+        docs, scores = self.bm25(query, max(k, LOCAL_KB_CANDIDATES if self.vectors is not None else k))
+        keep = scores >= LOCAL_KB_MIN_SCORE
+        docs, scores = docs[keep], scores[keep]
+        if not len(docs):
+            return []
+        if self.vectors is not None and vector is not None:
+            # Rows read in file order; docs are unique, so searchsorted maps them back
+            rows = np.sort(docs)
+            similarity = np.asarray(self.vectors[rows], dtype="float32") @ np.asarray(vector, dtype="float32")
+            similarity = similarity[np.searchsorted(rows, docs)]
+            scores = (1 - LOCAL_KB_DENSE_WEIGHT) * scores / scores.max() + LOCAL_KB_DENSE_WEIGHT * similarity
+            order = np.argsort(-scores)
+            docs, scores = docs[order], scores[order]
+        return [(int(doc), float(score)) for doc, score in zip(docs[:k], scores[:k])]
+
+    def lookup(self, query: str, vector=None):
+        """
+        The best document for `query` as {"title", "extract", "url"}, or None.
+        """
+        results = self.search(query, 1, vector)
+        if not results:
+            return None
+        doc = self.document(results[0][0])
+        return {"title": doc["title"], "extract": doc["text"], "url": doc["url"]}
+
+    def lookup_many(self, queries):
+        """
+        lookup() per query, embedding them in one batch when the index has vectors.
+        """
+        vectors = [None] * len(queries)
+        if self.vectors is not None and queries:
+            from agents.memory import embed_many
+            vectors = embed_many(queries)
+        return [self.lookup(query, vector) for query, vector in zip(queries, vectors)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_local_index() -> LocalKnowledgeIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LocalKnowledgeIndex()
+        return _index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local knowledge index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build")
+    build.add_argument("path")
+    build.add_argument("--out", default=LOCAL_KB_DIR)
+    build.add_argument("--vectors", action="store_true", help="also store MiniLM vectors for re-ranking")
+    build.add_argument("--limit", type=int)
+    build.add_argument("--batch-size", type=int, default=256)
+    query = commands.add_parser("query")
+    query.add_argument("text")
+    query.add_argument("--dir", default=LOCAL_KB_DIR)
+    query.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Building local knowledge index from {args.path}...")
+        print(build_index(args.path, args.out, vectors=args.vectors, limit=args.limit, batch_size=args.batch_size))
+    else:
+        kb = LocalKnowledgeIndex(args.dir)
+        vector = None
+        if kb.vectors is not None:
+            from agents.memory import embed
+            vector = embed(args.text)
+        start = time.perf_counter()
+        results = kb.search(args.text, args.k, vector)
+        print(f"{(time.perf_counter() - start) * 1000:.2f} ms")
+        for doc_id, score in results:
+            doc = kb.document(doc_id)
+            print(f"{score:8.3f}  {doc['title']}  {doc['url']}\n          {doc['text'][:160]}")
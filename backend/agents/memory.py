@@ -1,53 +1,419 @@
+import fcntl
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
-# 1. Load a lightweight, fast embedding model
-# 'all-MiniLM-L6-v2' is perfect for this—it's fast and small.
-print("Loading Semantic Memory Model (MiniLM)...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# 1. A lightweight, fast embedding model
+# 'all-MiniLM-L6-v2' is perfect for this—it's fast and small. Loaded on
+# first use (get_model), so importing this module downloads nothing.
+_model = None
+_model_lock = threading.Lock()
+
+def get_model() -> SentenceTransformer:
+    global _model
+    with _model_lock:
+        if _model is None:
+            print("Loading Semantic Memory Model (MiniLM)...")
+            _model = SentenceTransformer('all-MiniLM-L6-v2')
+        return _model
 
-# 2. Initialize a simple FAISS index (IndexFlatL2 uses Euclidean distance)
 # The dimension is 384 for this specific model.
 dimension = 384
-index = faiss.IndexFlatL2(dimension)
 
-# 3. Local storage for the actual text (FAISS only stores numbers)
-knowledge_base = []
+# 2. On-disk store. The index and its metadata survive restarts and are
+# memory-mapped at startup, so prefork children share the same pages.
+MEMORY_DIR = os.getenv("MEMORY_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "memory_store"))
+# "flat" is an exact scan. "ivf" / "hnsw" switch to approximate search once
+# the store grows past MEMORY_ANN_THRESHOLD vectors.
+MEMORY_INDEX_TYPE = os.getenv("MEMORY_INDEX_TYPE", "flat")
+MEMORY_ANN_THRESHOLD = int(os.getenv("MEMORY_ANN_THRESHOLD", "50000"))
+MEMORY_IVF_NLIST = int(os.getenv("MEMORY_IVF_NLIST", "1024"))
+MEMORY_IVF_NPROBE = int(os.getenv("MEMORY_IVF_NPROBE", "16"))
+MEMORY_HNSW_M = int(os.getenv("MEMORY_HNSW_M", "32"))
+MEMORY_HNSW_EF_SEARCH = int(os.getenv("MEMORY_HNSW_EF_SEARCH", "64"))
+# How often (seconds) search_memory checks for claims other processes added
+MEMORY_RELOAD_SECONDS = float(os.getenv("MEMORY_RELOAD_SECONDS", "30"))
+
+INDEX_FILE = "index.faiss"
+META_FILE = "meta.json"
+# flock()ed by writers (see store_lock), across processes
+LOCK_FILE = "store.lock"
+
+
+class KnowledgeBase:
+    """
+    Append-only store for the text behind each FAISS vector.
+    Records are JSON lines; a second file holds one int64 byte offset per
+    record, so lookups seek straight to a record without loading the file.
+    """
+
+    def __init__(self, directory: str, count: int = None):
+        self.data_path = os.path.join(directory, "knowledge_base.jsonl")
+        self.offsets_path = os.path.join(directory, "knowledge_base.offsets")
+        self._lock = threading.Lock()
+        self._count = self.stored_count()
+        if count is not None:
+            # Records past `count` belong to a write whose index isn't saved yet
+            self._count = min(self._count, count)
+
+    def stored_count(self) -> int:
+        return os.path.getsize(self.offsets_path) // 8 if os.path.exists(self.offsets_path) else 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, position: int) -> dict:
+        if not 0 <= position < self._count:
+            raise IndexError(position)
+        with open(self.offsets_path, "rb") as f:
+            f.seek(position * 8)
+            (offset,) = struct.unpack("<q", f.read(8))
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def extend(self, records):
+        with self._lock, open(self.data_path, "ab") as data, open(self.offsets_path, "ab") as offsets:
+            for record in records:
+                offsets.write(struct.pack("<q", data.tell()))
+                data.write(json.dumps(record).encode("utf-8") + b"\n")
+                self._count += 1
+
+    def append(self, record: dict):
+        self.extend([record])
+
+    def __iter__(self):
+        # Streams records in order without holding the file in memory
+        if not self._count:
+            return
+        with open(self.data_path, "rb") as f:
+            for _ in range(self._count):
+                yield json.loads(f.readline())
+
+    def truncate(self, count: int):
+        """
+        Drops records past `count` from disk (left behind by a write that
+        failed or crashed before saving its index).
+        """
+        with self._lock:
+            if self.stored_count() > count:
+                with open(self.offsets_path, "r+b") as f:
+                    f.seek(count * 8)
+                    (offset,) = struct.unpack("<q", f.read(8))
+                    f.truncate(count * 8)
+                # __iter__ reads the lines in order, so the text goes too
+                with open(self.data_path, "r+b") as f:
+                    f.truncate(offset)
+            self._count = min(self._count, count)
+
+
+def content_hash(text: str) -> str:
+    """
+    Identity of a claim for de-duplication: case and whitespace are ignored.
+    """
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def build_index(kind: str, vectors: np.ndarray):
+    """
+    Creates an index of the given kind ("flat", "ivf" or "hnsw") holding `vectors`.
+    """
+    if kind == "ivf":
+        # IVF needs enough training points per centroid (~39 in FAISS)
+        nlist = max(1, min(MEMORY_IVF_NLIST, len(vectors) // 39))
+        quantizer = faiss.IndexFlatL2(dimension)
+        new_index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        new_index.train(vectors)
+    elif kind == "hnsw":
+        new_index = faiss.IndexHNSWFlat(dimension, MEMORY_HNSW_M)
+    else:
+        new_index = faiss.IndexFlatL2(dimension)
+    if len(vectors):
+        new_index.add(vectors)
+    configure_search(new_index, kind)
+    return new_index
+
+
+def configure_search(target, kind: str):
+    if kind == "ivf":
+        faiss.ParameterSpace().set_index_parameter(target, "nprobe", MEMORY_IVF_NPROBE)
+    elif kind == "hnsw":
+        faiss.ParameterSpace().set_index_parameter(target, "efSearch", MEMORY_HNSW_EF_SEARCH)
+
+
+def _read_index(path: str, mmap: bool):
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY), True
+        except Exception:
+            # Not every index type / FAISS build supports mmap; load into RAM
+            pass
+    return faiss.read_index(path), False
+
+
+def _store_version():
+    # Changes whenever a writer saves (the index, then its metadata)
+    version = []
+    for name in (INDEX_FILE, META_FILE):
+        try:
+            stat = os.stat(os.path.join(MEMORY_DIR, name))
+            version.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+def _load_store():
+    """
+    Reads the saved store. Writers append records before saving the index,
+    so the index is what has been committed: records past it are a write in
+    progress (or one that crashed) and stay out of the view. Fewer records
+    than vectors means the files don't belong together; that is an error
+    rather than something to trim, since positions would map to the wrong
+    claims.
+    """
+    os.makedirs(MEMORY_DIR, exist_ok=True)
+    index_path = os.path.join(MEMORY_DIR, INDEX_FILE)
+    meta_path = os.path.join(MEMORY_DIR, META_FILE)
+
+    if not os.path.exists(index_path):
+        return faiss.IndexFlatL2(dimension), "flat", False, KnowledgeBase(MEMORY_DIR, count=0)
+
+    with open(meta_path) as f:
+        kind = json.load(f).get("kind", "flat")
+    loaded, mapped = _read_index(index_path, mmap=True)
+    configure_search(loaded, kind)
+    kb = KnowledgeBase(MEMORY_DIR, count=loaded.ntotal)
+    if len(kb) != loaded.ntotal:
+        raise RuntimeError(
+            f"Memory store in {MEMORY_DIR} is inconsistent: {len(kb)} records for {loaded.ntotal} vectors")
+    return loaded, kind, mapped, kb
+
+
+def _reload():
+    global index, index_kind, _index_mapped, knowledge_base, _loaded_version, _checked_at
+    version = _store_version()
+    index, index_kind, _index_mapped, knowledge_base = _load_store()
+    _loaded_version, _checked_at = version, time.monotonic()
+
+
+# 3. Load (or create) the index and the text metadata (FAISS only stores numbers)
+_reload()
+_write_lock = threading.RLock()
+_lock_depth = 0
+_dirty = False
+_seed_checked = False
+
+
+@contextmanager
+def store_lock():
+    """
+    Exclusive write access to the on-disk store, across processes (flock)
+    and threads. On entry the store is reloaded if another process saved
+    since, so new records append to the latest version; on exit whatever
+    was added is saved, so records and vectors on disk always line up.
+    Nested uses join the outer one: bulk loaders hold it for the whole load
+    and the index is saved once, at the end.
+    """
+    global _lock_depth, _dirty
+    with _write_lock:
+        _lock_depth += 1
+        try:
+            if _lock_depth > 1:
+                yield
+                return
+            os.makedirs(MEMORY_DIR, exist_ok=True)
+            with open(os.path.join(MEMORY_DIR, LOCK_FILE), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if _store_version() != _loaded_version:
+                    _reload()
+                committed = index.ntotal
+                # Left by a write that crashed before saving its index
+                knowledge_base.truncate(committed)
+                try:
+                    yield
+                except BaseException:
+                    # Undo this write: back to what's on disk
+                    knowledge_base.truncate(committed)
+                    _dirty = False
+                    _reload()
+                    raise
+                _save()
+        finally:
+            _lock_depth -= 1
+
+
+def _refresh():
+    # Picks up claims saved by other processes (ingest, other workers)
+    global _checked_at
+    if time.monotonic() - _checked_at < MEMORY_RELOAD_SECONDS:
+        return
+    # Skipped while this process is writing; its store is current then
+    if not _write_lock.acquire(blocking=False):
+        return
+    try:
+        if _lock_depth or _store_version() == _loaded_version:
+            _checked_at = time.monotonic()
+            return
+        try:
+            _reload()
+        except Exception as e:
+            print(f"Keeping the loaded memory store, reload failed: {e}")
+            _checked_at = time.monotonic()
+    finally:
+        _write_lock.release()
+
+
+def _ensure_writable():
+    # A memory-mapped index is read-only; pull it into RAM before the first write
+    global index, _index_mapped
+    if _index_mapped:
+        index, _index_mapped = _read_index(os.path.join(MEMORY_DIR, INDEX_FILE), mmap=False)
+        configure_search(index, index_kind)
+
+
+def _maybe_upgrade_index():
+    # Switch from the exact scan to the configured approximate index once,
+    # when the store crosses the threshold. Later adds go straight in.
+    global index, index_kind
+    if index_kind != "flat" or MEMORY_INDEX_TYPE == "flat" or index.ntotal < MEMORY_ANN_THRESHOLD:
+        return
+    print(f"Memory store reached {index.ntotal} vectors, building {MEMORY_INDEX_TYPE} index...")
+    index = build_index(MEMORY_INDEX_TYPE, index.reconstruct_n(0, index.ntotal))
+    index_kind = MEMORY_INDEX_TYPE
+
+
+def _save():
+    # Writes the index atomically, then its metadata. Called under store_lock.
+    global _dirty, _loaded_version
+    if not _dirty:
+        return
+    index_path = os.path.join(MEMORY_DIR, INDEX_FILE)
+    meta_path = os.path.join(MEMORY_DIR, META_FILE)
+    faiss.write_index(index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump({"kind": index_kind, "dimension": dimension, "count": index.ntotal}, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    _dirty = False
+    _loaded_version = _store_version()
+
+
+def save_memory():
+    """
+    Saves anything added outside store_lock (writes under it are saved
+    when it's released).
+    """
+    with store_lock():
+        pass
+
+
+def add_vectors(vectors: np.ndarray, records: list):
+    """
+    Appends already-encoded vectors and their metadata records, saved when
+    the (outermost) store_lock is released.
+    """
+    global _dirty
+    with store_lock():
+        _ensure_writable()
+        knowledge_base.extend(records)
+        index.add(np.asarray(vectors, dtype='float32'))
+        _dirty = True
+        _maybe_upgrade_index()
+
+
+def embed(text: str) -> np.ndarray:
+    """
+    The text's MiniLM embedding (unit length, so dot product = cosine).
+    Computed once per request and reused by memory search, the verifier and
+    the semantic result cache.
+    """
+    return get_model().encode([text], convert_to_numpy=True, show_progress_bar=False)[0].astype('float32')
+
+def embed_many(texts: list, batch_size: int = 64) -> np.ndarray:
+    return get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False).astype('float32')
+
 
 def add_to_memory(text: str, label: str):
     """
     Converts text to a vector and adds it to the FAISS index.
     """
-    vector = model.encode([text])
-    index.add(np.array(vector).astype('float32'))
-    knowledge_base.append({"text": text, "label": label})
+    vector = get_model().encode([text])
+    add_vectors(vector, [{"text": text, "label": label, "hash": content_hash(text)}])
     print(f"Added to memory: {text[:30]}...")
 
-def search_memory(query_text: str, threshold=0.8):
+def add_many_to_memory(texts: list, labels: list, batch_size: int = 256):
+    """
+    Batched version of add_to_memory for bulk loads. Encodes all texts in
+    batches of `batch_size` and adds them with a single index.add. Wrap the
+    whole load in store_lock() to save the index once, at the end.
+    """
+    if not texts:
+        return
+    vectors = get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    records = [
+        {"text": text, "label": label, "hash": content_hash(text)}
+        for text, label in zip(texts, labels)
+    ]
+    add_vectors(vectors, records)
+
+def search_memory(query_text: str, threshold=0.8, vector: np.ndarray = None):
     """
     Searches memory for similar debunked claims.
-    Returns the match if found, else None.
+    Returns the match if found, else None. Pass `vector` when the text's
+    embedding is already known.
     """
+    _refresh()
+    if not _seed_checked:
+        seed_memory()
     if index.ntotal == 0:
         return None
-        
-    query_vector = model.encode([query_text])
+
+    query_vector = embed(query_text) if vector is None else vector
     # Search for the top 1 closest match
-    distances, indices = index.search(np.array(query_vector).astype('float32'), 1)
-    
+    distances, indices = index.search(np.asarray(query_vector, dtype='float32').reshape(1, -1), 1)
+
     # In FAISS L2, a smaller distance means a closer match.
     # We convert this to a rough similarity check.
     if indices[0][0] != -1:
-        match = knowledge_base[indices[0][0]]
+        match = knowledge_base[int(indices[0][0])]
         # Simple heuristic: distance < 0.5 is usually a very strong match
         if distances[0][0] < 0.5:
             return match
-            
+
     return None
 
 # --- Initial Seed Data ---
-# Let's add some "common" misinformation to test the system
-add_to_memory("The moon is made of green cheese.", "Debunked Fact: Moon is rock.")
-add_to_memory("Drinking bleach cures viruses.", "Dangerous Hoax: Bleach is toxic.")
-add_to_memory("Bananas are actually radioactive fish.", "Satire: Bananas are fruit.")
\ No newline at end of file
+# Some "common" misinformation to test the system, added to an empty store
+# by seed_memory()
+SEED_CLAIMS = [
+    ("The moon is made of green cheese.", "Debunked Fact: Moon is rock."),
+    ("Drinking bleach cures viruses.", "Dangerous Hoax: Bleach is toxic."),
+    ("Bananas are actually radioactive fish.", "Satire: Bananas are fruit."),
+]
+
+def seed_memory() -> bool:
+    """
+    Adds SEED_CLAIMS if the store is empty. Run at worker start and on the
+    first search (or `python -m agents.ingest --seed`), not at import: under
+    store_lock, processes that start together seed once, and the ones that
+    find it already seeded load it. Returns whether anything was added.
+    """
+    global _seed_checked
+    with store_lock():
+        _seed_checked = True
+        if index.ntotal:
+            return False
+        texts, labels = zip(*SEED_CLAIMS)
+        add_many_to_memory(list(texts), list(labels))
+    print(f"Seeded memory with {len(SEED_CLAIMS)} claims.")
+    return True
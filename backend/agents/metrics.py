@@ -0,0 +1,71 @@
+import inspect
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+# Prometheus metrics shared by the API and the workers. With prefork workers,
+# set PROMETHEUS_MULTIPROC_DIR so every child's samples reach the exporter.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+NODE_SECONDS = Histogram(
+    "inocula_node_seconds", "Time spent in each LangGraph node", ["node"], buckets=LATENCY_BUCKETS)
+MODEL_SECONDS = Histogram(
+    "inocula_model_seconds", "Time spent in each transformer pipeline call", ["model"], buckets=LATENCY_BUCKETS)
+EXTERNAL_SECONDS = Histogram(
+    "inocula_external_seconds", "Latency of calls to external services", ["service", "call"], buckets=LATENCY_BUCKETS)
+EXTERNAL_FAILURES = Counter(
+    "inocula_external_failures_total", "Failed calls to external services", ["service", "call"])
+QUEUE_WAIT_SECONDS = Histogram(
+    "inocula_queue_wait_seconds", "Time from /analyze enqueue to task start", buckets=LATENCY_BUCKETS)
+TASKS = Counter("inocula_tasks_total", "Finished analysis tasks", ["status"])
+MEMORY_LOOKUPS = Counter("inocula_memory_lookups_total", "Semantic memory searches", ["result"])
+CACHE_LOOKUPS = Counter("inocula_cache_lookups_total", "Cache lookups", ["cache", "result"])
+ADMISSIONS = Counter(
+    "inocula_admissions_total", "Admission decisions for new analyses", ["queue", "decision"])
+
+
+@contextmanager
+def timed(histogram, failures=None, **labels):
+    """
+    Observes the duration of the block in `histogram` (with `labels`), and
+    counts an exception in `failures` if one is given.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if failures is not None:
+            failures.labels(**labels).inc()
+        raise
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def instrument_node(name: str, node):
+    """
+    Wraps a graph node (plain or async) so its latency is recorded, and
+    appended to the state's trace when the request asked for one.
+    """
+    def observe(state, update, start):
+        elapsed = time.perf_counter() - start
+        NODE_SECONDS.labels(node=name).observe(elapsed)
+        if state.get("tracing"):
+            update = {**(update or {}), "trace": [{"node": name, "ms": round(elapsed * 1000, 2)}]}
+        return update
+
+    if inspect.iscoroutinefunction(node):
+        async def instrumented(state):
+            start = time.perf_counter()
+            return observe(state, await node(state), start)
+    else:
+        def instrumented(state):
+            start = time.perf_counter()
+            return observe(state, node(state), start)
+    instrumented.__name__ = name
+    return instrumented
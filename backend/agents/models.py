@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from transformers import pipeline
+
+# CPU execution profile for the three classifiers:
+#   "default" - plain PyTorch fp32
+#   "int8"    - PyTorch dynamic int8 quantization of the Linear layers
+#   "onnx"    - ONNX Runtime via optimum (pip install optimum[onnxruntime])
+# INFERENCE_PROFILE_<NAME> (e.g. INFERENCE_PROFILE_FALLACY) overrides it per model.
+INFERENCE_PROFILE = os.getenv("INFERENCE_PROFILE", "default")
+PROFILES = ("default", "int8", "onnx")
+
+MODEL_SPECS = {
+    "toxicity": {
+        "task": "text-classification",
+        "model": "unitary/toxic-bert",
+        "options": {},
+    },
+    "emotion": {
+        "task": "text-classification",
+        "model": "j-hartmann/emotion-english-distilroberta-base",
+        "options": {"return_all_scores": True},
+    },
+    "fallacy": {
+        "task": "zero-shot-classification",
+        "model": "sileod/deberta-v3-base-tasksource-nli",
+        "options": {},
+    },
+}
+
+# Threads running CPU inference for the async graph (the asyncio worker
+# mode). 1 serializes it: concurrent requests queue for the models instead
+# of splitting the cores between them, while their network stages overlap.
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "1"))
+
+_pipelines = {}
+_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def profile_for(name: str) -> str:
+    profile = os.getenv(f"INFERENCE_PROFILE_{name.upper()}", INFERENCE_PROFILE)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown inference profile '{profile}' (expected one of {PROFILES})")
+    return profile
+
+
+def load_pipeline(name: str, profile: str = None):
+    """
+    Builds a fresh pipeline for one of MODEL_SPECS under the given profile.
+    """
+    spec = MODEL_SPECS[name]
+    profile = profile or profile_for(name)
+
+    if profile == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError("The 'onnx' profile needs optimum[onnxruntime] installed.") from e
+        model = ORTModelForSequenceClassification.from_pretrained(spec["model"], export=True)
+        tokenizer = AutoTokenizer.from_pretrained(spec["model"])
+        return pipeline(spec["task"], model=model, tokenizer=tokenizer, **spec["options"])
+
+    pipe = pipeline(spec["task"], model=spec["model"], **spec["options"])
+    if profile == "int8":
+        import torch
+        pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+def get_pipeline(name: str):
+    """
+    Process-wide shared pipeline, loaded on first use.
+    """
+    with _lock:
+        if name not in _pipelines:
+            _pipelines[name] = load_pipeline(name)
+        return _pipelines[name]
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="inocula-inference")
+        return _executor
+
+
+async def run_inference(fn, *args):
+    """
+    Awaits `fn(*args)` run on the inference executor, so CPU-bound work
+    never blocks the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_inference_executor(), fn, *args)
+
+
+def warm_up():
+    """
+    Loads every agent model and runs each once, so lazy initialization
+    (weights, tokenizers, first-call allocations) happens before any task.
+    """
+    import agents.graph  # noqa: F401 - importing the graph loads every agent
+    from agents.fallacy import FALLACY_LABELS
+    from agents.fallacy_engine import fallacy_outputs
+    from agents.memory import get_model as get_memory_model
+
+    sample = "Scientists confirmed the new bridge opened to traffic this morning."
+    get_pipeline("toxicity")(sample)
+    get_pipeline("emotion")(sample)
+    fallacy_outputs([sample], FALLACY_LABELS)
+    get_memory_model().encode([sample])
+
+    from agents.verifier import VERIFIER_BACKEND
+    if VERIFIER_BACKEND == "local":
+        from agents.local_kb import get_local_index
+        get_local_index().lookup(sample)
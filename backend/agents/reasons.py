@@ -0,0 +1,105 @@
+import re
+
+# Compact form of a task result, for everything kept in Redis (Celery
+# result backend, result and semantic caches). Every reason the agents
+# produce comes from one of these templates, so it is stored as its code,
+# or [code, argument] for templates with a placeholder. Emotions are
+# stored as their index in EMOTION_CODES. Text that matches no template
+# (e.g. from an older version) is kept as-is.
+COMPACT_SCHEMA = 1
+
+REASON_TEMPLATES = [
+    "Historical Match: This claim matches a previously debunked narrative.",
+    "Factual Context Found: Wikipedia ('{}')",
+    "Toxicity detected (Level: {}%)",
+    "Initial scan: Content does not show immediate toxic patterns.",
+    "Emotional trigger: {}",
+    "Logical Flaw: {}",
+    "Factual Contradiction: This claim is explicitly refuted by established records.",
+]
+# Stable names of the templates, used as analytics keys (rollups.py)
+REASON_KINDS = [
+    "memory_match",
+    "wikipedia_context",
+    "toxicity",
+    "no_toxicity",
+    "emotional_trigger",
+    "logical_flaw",
+    "factual_contradiction",
+]
+# Kinds whose argument is worth counting separately (the emotion or
+# fallacy), unlike e.g. the Wikipedia title or the toxicity level
+KINDS_WITH_ARGUMENT = ("emotional_trigger", "logical_flaw")
+# Labels of the emotion model (emotion-english-distilroberta-base)
+EMOTION_CODES = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
+
+_REASON_PATTERNS = [
+    re.compile("^" + re.escape(template).replace(re.escape("{}"), "(.*)") + "$", re.DOTALL)
+    for template in REASON_TEMPLATES
+]
+
+
+def encode_reason(reason: str):
+    for code, pattern in enumerate(_REASON_PATTERNS):
+        match = pattern.match(reason)
+        if match:
+            return [code, match.group(1)] if match.groups() else code
+    return reason
+
+
+def decode_reason(code) -> str:
+    if isinstance(code, str):
+        return code
+    if isinstance(code, int):
+        return REASON_TEMPLATES[code]
+    code, argument = code
+    return REASON_TEMPLATES[code].format(argument)
+
+
+def reason_key(reason: str) -> str:
+    """
+    Low-cardinality key of a reason, safe as a Mongo field name, e.g.
+    "toxicity" or "logical_flaw:fear_mongering". Unknown reasons are "other".
+    """
+    code = encode_reason(reason)
+    if isinstance(code, str):
+        return "other"
+    if isinstance(code, int):
+        return REASON_KINDS[code]
+    kind = REASON_KINDS[code[0]]
+    if kind in KINDS_WITH_ARGUMENT:
+        return f"{kind}:{re.sub(r'[^a-z0-9]+', '_', code[1].lower()).strip('_')}"
+    return kind
+
+
+def encode_emotion(label: str):
+    return EMOTION_CODES.index(label) if label in EMOTION_CODES else label
+
+
+def decode_emotion(code) -> str:
+    return EMOTION_CODES[code] if isinstance(code, int) else code
+
+
+def compact_result(result: dict) -> dict:
+    """
+    The compact form of a finished analysis payload.
+    """
+    return {
+        **result,
+        "schema": COMPACT_SCHEMA,
+        "reasons": [encode_reason(reason) for reason in result.get("reasons", [])],
+        "detected_emotions": [encode_emotion(label) for label in result.get("detected_emotions", [])],
+    }
+
+
+def expand_result(result: dict) -> dict:
+    """
+    Back to the readable payload clients get. Results stored before the
+    compact schema are returned unchanged.
+    """
+    if not isinstance(result, dict) or result.get("schema") != COMPACT_SCHEMA:
+        return result
+    expanded = {key: value for key, value in result.items() if key != "schema"}
+    expanded["reasons"] = [decode_reason(code) for code in result.get("reasons", [])]
+    expanded["detected_emotions"] = [decode_emotion(code) for code in result.get("detected_emotions", [])]
+    return expanded
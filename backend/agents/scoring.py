@@ -0,0 +1,37 @@
+# Order in which branch results are applied. This is the order the agents
+# used to run in sequentially, so scores and reasons come out the same no
+# matter which branch finishes first.
+BRANCH_ORDER = ["verifier", "detector", "analyzer", "fallacy"]
+
+def combine_signals(signals: dict, start_score: int = 100):
+    """
+    Applies each branch's deduction (clamped at 0) and concatenates their
+    reasons in BRANCH_ORDER.
+    """
+    score = start_score
+    reasons = []
+    for name in BRANCH_ORDER:
+        signal = signals.get(name)
+        if not signal:
+            continue
+        score = max(0, score - signal.get("deduction", 0))
+        reasons.extend(signal.get("reasons", []))
+    return score, reasons
+
+# Points taken off per fallacy found, and at most for all of them together
+# (here rather than in fallacy.py so the cascade can use them without
+# loading the NLI model)
+FALLACY_DEDUCTION = 25
+FALLACY_MAX_DEDUCTION = 50
+
+# Verdict bands, matching the colours the extension and dashboard show
+RED_MAX = 40     # 0-40: likely misinformation
+ORANGE_MAX = 70  # 41-70: questionable, >70: looks credible
+SCORE_BANDS = ("red", "orange", "green")
+
+def score_band(score: int) -> str:
+    if score > ORANGE_MAX:
+        return "green"
+    if score > RED_MAX:
+        return "orange"
+    return "red"
@@ -1,6 +1,12 @@
-from typing import TypedDict, List, Annotated
+from typing import Any, TypedDict, List, Annotated
 import operator
 
+def merge_dicts(left: dict, right: dict) -> dict:
+    """
+    Reducer for keys written by several parallel branches in one step.
+    """
+    return {**(left or {}), **(right or {})}
+
 class AgentState(TypedDict):
     input_text: str
     score: int
@@ -10,4 +16,18 @@ class AgentState(TypedDict):
     metadata: dict
     # New fields for Phase 2
     is_memory_hit: bool
-    memory_context: str
\ No newline at end of file
+    memory_context: str
+    # Raw classifier outputs computed ahead of time by the micro-batcher.
+    # Keys: "toxicity", "emotions", "fallacy". Nodes fall back to their own
+    # pipeline call when their key is missing.
+    model_outputs: dict
+    # Per-branch results ({"detector": {"deduction": 12, "reasons": [...]}, ...})
+    # written concurrently by the fan-out nodes and combined by the join node.
+    signals: Annotated[dict, merge_dicts]
+    # Steps the cascade policy decided not to run (see agents/cascade.py)
+    skipped_steps: Annotated[List[str], operator.add]
+    # Per-request timing trace, filled by agents/metrics.py when `tracing` is set
+    tracing: bool
+    trace: Annotated[List[dict], operator.add]
+    # MiniLM embedding of input_text, computed once (agents.memory.embed)
+    embedding: Any
@@ -1,64 +1,114 @@
+import asyncio
 import os
-import requests
-import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from agents.state import AgentState
+from agents.wikipedia import get_wikipedia_client
+from agents.local_kb import get_local_index
+from agents.chunking import claim_sentences
+from agents.memory import embed_many
+from agents.models import run_inference
 
-def verifier_node(state: AgentState):
+# Number of claim sentences looked up per text
+VERIFIER_CLAIMS = int(os.getenv("VERIFIER_CLAIMS", "2"))
+# Claim-like sentences shortlisted before ranking them by embedding
+VERIFIER_CANDIDATES = int(os.getenv("VERIFIER_CANDIDATES", "6"))
+# Where claims are looked up: "wikipedia" (live API) or "local" (offline
+# index built with python -m agents.local_kb build)
+VERIFIER_BACKEND = os.getenv("VERIFIER_BACKEND", "wikipedia")
+
+def select_queries(text: str, embedding=None, limit: int = VERIFIER_CLAIMS):
     """
-    Queries the Wikipedia API to find factual context for the claim.
-    Requires no API key or billing account.
+    Shortlists claim-like sentences, then keeps the `limit` closest to the
+    whole text's embedding (the sentences the text is actually about),
+    in their original order.
     """
-    # If it was a memory hit, we already know the answer
-    if state.get("is_memory_hit"):
-        return {}
+    candidates = claim_sentences(text, VERIFIER_CANDIDATES)
+    if embedding is None or len(candidates) <= limit:
+        return candidates[:limit]
+    similarity = embed_many(candidates) @ np.asarray(embedding, dtype='float32')
+    best = sorted(np.argsort(-similarity)[:limit])
+    return [candidates[i] for i in best]
 
-    text = state["input_text"]
-    # We take the first 150 characters to use as a search query
-    query = text[:150] 
-    
+def verification_update(pages) -> dict:
+    """
+    The verifier's state update for the pages found for its queries.
+    """
     new_reasons = []
-    verification_context = ""
+    summaries = []
     wiki_url = ""
+    seen_titles = set()
+    for page in pages:
+        if not page or page["title"] in seen_titles:
+            continue
+        seen_titles.add(page["title"])
+        top_title = page["title"]
+        wiki_url = wiki_url or page["url"]
+        new_reasons.append(f"Factual Context Found: Wikipedia ('{top_title}')")
+        summaries.append(f"Wikipedia summary for '{top_title}': {page['extract']}")
 
-    try:
-        # Step 1: Search Wikipedia for the most relevant page title
-        search_url = f"https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch={urllib.parse.quote(query)}&format=json&origin=*"
-        headers = {
-            'User-Agent': 'ProjectInocula/1.0 (https://github.com/your-username/Project-Inocula)'
-        }
-        
-        search_response = requests.get(search_url, headers=headers)
-        if search_response.status_code == 200:
-            search_data = search_response.json()
-            search_results = search_data.get("query", {}).get("search", [])
-            
-            if search_results:
-                # Take the top result title
-                top_title = search_results[0]['title']
-                
-                # Step 2: Get the summary for that specific page
-                summary_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{urllib.parse.quote(top_title)}"
-                summary_response = requests.get(summary_url, headers=headers)
-                
-                if summary_response.status_code == 200:
-                    summary_data = summary_response.json()
-                    extract = summary_data.get("extract", "")
-                    wiki_url = summary_data.get("content_urls", {}).get("desktop", {}).get("page", "")
-                    
-                    if extract:
-                        new_reasons.append(f"Factual Context Found: Wikipedia ('{top_title}')")
-                        verification_context = f"Wikipedia summary for '{top_title}': {extract}"
-            
-    except Exception as e:
-        print(f"DEBUG: Wikipedia Verifier Error: {e}")
+    verification_context = "\n".join(summaries)
 
     # We don't automatically deduct score here because Wikipedia is neutral.
     # Instead, we pass the 'verification_context' to the Explainer node (Gemini),
     # which will decide if the Wikipedia facts contradict the input text.
     return {
-        "reasons": new_reasons,
+        "signals": {"verifier": {"deduction": 0, "reasons": new_reasons}},
         "metadata": {
             "verification_summary": verification_context,
             "verification_link": wiki_url
         } if verification_context else {}
-    }
\ No newline at end of file
+    }
+
+def verifier_node(state: AgentState):
+    """
+    Queries the Wikipedia API (or the local index, see VERIFIER_BACKEND)
+    to find factual context for the claim.
+    Requires no API key or billing account.
+    """
+    # If it was a memory hit, we already know the answer
+    if state.get("is_memory_hit"):
+        return {}
+
+    text = state["input_text"]
+    # Search for the most claim-like sentences rather than the first 150 characters
+    queries = select_queries(text, state.get("embedding"))
+
+    pages = []
+    try:
+        if VERIFIER_BACKEND == "local":
+            # Memory-mapped BM25 (+ vectors) index: no network round-trips
+            pages = get_local_index().lookup_many(queries)
+        else:
+            # Search for the most relevant page per claim, then fetch its summary.
+            # Both calls are pooled, time-limited and cached (agents/wikipedia.py).
+            client = get_wikipedia_client()
+            with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+                pages = list(pool.map(client.lookup, queries))
+    except Exception as e:
+        print(f"DEBUG: Wikipedia Verifier Error: {e}")
+
+    return verification_update(pages)
+
+async def averifier_node(state: AgentState):
+    """
+    verifier_node for the async graph: the Wikipedia lookups are awaited
+    together on the event loop, the embedding and local index work runs
+    on the inference executor.
+    """
+    if state.get("is_memory_hit"):
+        return {}
+
+    queries = await run_inference(select_queries, state["input_text"], state.get("embedding"))
+
+    pages = []
+    try:
+        if VERIFIER_BACKEND == "local":
+            pages = await run_inference(lambda: get_local_index().lookup_many(queries))
+        else:
+            client = get_wikipedia_client()
+            pages = await asyncio.gather(*[client.alookup(query) for query in queries])
+    except Exception as e:
+        print(f"DEBUG: Wikipedia Verifier Error: {e}")
+
+    return verification_update(pages)
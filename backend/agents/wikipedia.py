@@ -0,0 +1,237 @@
+import asyncio
+import os
+import threading
+import time
+import urllib.parse
+
+import httpx
+
+from agents import metrics
+from agents.ttl_cache import LRUTTLCache
+
+# Base URLs are configurable so tests and benchmarks can point the client at
+# a local stub server (see benchmarks/stubs.py).
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKIPEDIA_REST_URL = os.getenv("WIKIPEDIA_REST_URL", "https://en.wikipedia.org/api/rest_v1")
+WIKIPEDIA_CONNECT_TIMEOUT = float(os.getenv("WIKIPEDIA_CONNECT_TIMEOUT", "2"))
+WIKIPEDIA_READ_TIMEOUT = float(os.getenv("WIKIPEDIA_READ_TIMEOUT", "4"))
+WIKIPEDIA_POOL_SIZE = int(os.getenv("WIKIPEDIA_POOL_SIZE", "10"))
+# Upper bound on simultaneous requests per process, to respect rate limits
+WIKIPEDIA_MAX_CONCURRENCY = int(os.getenv("WIKIPEDIA_MAX_CONCURRENCY", "4"))
+WIKIPEDIA_CACHE_SIZE = int(os.getenv("WIKIPEDIA_CACHE_SIZE", "4096"))
+WIKIPEDIA_CACHE_TTL = int(os.getenv("WIKIPEDIA_CACHE_TTL", str(6 * 3600)))
+
+USER_AGENT = 'ProjectInocula/1.0 (https://github.com/your-username/Project-Inocula)'
+
+# Cached marker for "Wikipedia had nothing", so empty answers are cached too
+_NOT_FOUND = ""
+
+
+class WikipediaStats:
+    """
+    Counters for cache effectiveness and upstream latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.upstream_seconds = 0.0
+
+    def record_cache(self, hit: bool):
+        metrics.record_cache("wikipedia", hit)
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def record_upstream(self, seconds: float, failed: bool):
+        metrics.EXTERNAL_SECONDS.labels(service="wikipedia", call="http").observe(seconds)
+        if failed:
+            metrics.EXTERNAL_FAILURES.labels(service="wikipedia", call="http").inc()
+        with self._lock:
+            self.upstream_calls += 1
+            self.upstream_seconds += seconds
+            if failed:
+                self.upstream_errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+                "upstream_calls": self.upstream_calls,
+                "upstream_errors": self.upstream_errors,
+                "upstream_avg_ms": 1000 * self.upstream_seconds / self.upstream_calls if self.upstream_calls else 0.0,
+            }
+
+
+class WikipediaClient:
+    """
+    Wikipedia search + page summary client with pooled keep-alive
+    connections, strict timeouts, an LRU+TTL cache on both calls and a cap
+    on concurrent upstream requests. Has sync and async variants of every call.
+    """
+
+    def __init__(self, api_url=WIKIPEDIA_API_URL, rest_url=WIKIPEDIA_REST_URL,
+                 connect_timeout=WIKIPEDIA_CONNECT_TIMEOUT, read_timeout=WIKIPEDIA_READ_TIMEOUT,
+                 pool_size=WIKIPEDIA_POOL_SIZE, max_concurrency=WIKIPEDIA_MAX_CONCURRENCY,
+                 cache_size=WIKIPEDIA_CACHE_SIZE, cache_ttl=WIKIPEDIA_CACHE_TTL):
+        self.api_url = api_url
+        self.rest_url = rest_url.rstrip("/")
+        self._client_options = {
+            "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+            "limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            "headers": {"User-Agent": USER_AGENT},
+        }
+        self._max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = None
+        self._client = None
+        self._async_client = None
+        self._client_lock = threading.Lock()
+        self.search_cache = LRUTTLCache(cache_size, cache_ttl)
+        self.summary_cache = LRUTTLCache(cache_size, cache_ttl)
+        self.stats = WikipediaStats()
+
+    # --- Request building / parsing (shared by sync and async paths) ---
+
+    def _search_request(self, query: str):
+        params = {"action": "query", "list": "search", "srsearch": query, "format": "json", "origin": "*"}
+        return self.api_url, params
+
+    def _summary_request(self, title: str):
+        return f"{self.rest_url}/page/summary/{urllib.parse.quote(title)}", None
+
+    @staticmethod
+    def _parse_search(data):
+        results = (data or {}).get("query", {}).get("search", [])
+        return results[0]["title"] if results else _NOT_FOUND
+
+    @staticmethod
+    def _parse_summary(title, data):
+        extract = (data or {}).get("extract", "")
+        if not extract:
+            return _NOT_FOUND
+        return {
+            "title": title,
+            "extract": extract,
+            "url": data.get("content_urls", {}).get("desktop", {}).get("page", ""),
+        }
+
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        return " ".join(text.split()).lower()
+
+    # --- Sync API ---
+
+    def _get(self, url, params):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options)
+        with self._slots:
+            start = time.perf_counter()
+            try:
+                response = self._client.get(url, params=params)
+            except httpx.HTTPError:
+                self.stats.record_upstream(time.perf_counter() - start, failed=True)
+                raise
+            failed = response.status_code >= 500 or response.status_code == 429
+            self.stats.record_upstream(time.perf_counter() - start, failed=failed)
+        if failed:
+            raise httpx.HTTPStatusError("Wikipedia unavailable", request=response.request, response=response)
+        return response.json() if response.status_code == 200 else None
+
+    def _cached(self, cache, key, fetch):
+        value = cache.get(key)
+        self.stats.record_cache(hit=value is not None)
+        if value is None:
+            value = fetch()
+            cache.set(key, value)
+        return value or None
+
+    def search(self, query: str):
+        """
+        Returns the title of the best matching page, or None.
+        """
+        def fetch():
+            return self._parse_search(self._get(*self._search_request(query)))
+        return self._cached(self.search_cache, self._cache_key(query), fetch)
+
+    def summary(self, title: str):
+        """
+        Returns {"title", "extract", "url"} for a page, or None.
+        """
+        def fetch():
+            return self._parse_summary(title, self._get(*self._summary_request(title)))
+        return self._cached(self.summary_cache, title, fetch)
+
+    def lookup(self, query: str):
+        """
+        Search followed by the summary of the top hit.
+        """
+        title = self.search(query)
+        return self.summary(title) if title else None
+
+    # --- Async API ---
+
+    async def _aget(self, url, params):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._client_options)
+            self._async_slots = asyncio.Semaphore(self._max_concurrency)
+        async with self._async_slots:
+            start = time.perf_counter()
+            try:
+                response = await self._async_client.get(url, params=params)
+            except httpx.HTTPError:
+                self.stats.record_upstream(time.perf_counter() - start, failed=True)
+                raise
+            failed = response.status_code >= 500 or response.status_code == 429
+            self.stats.record_upstream(time.perf_counter() - start, failed=failed)
+        if failed:
+            raise httpx.HTTPStatusError("Wikipedia unavailable", request=response.request, response=response)
+        return response.json() if response.status_code == 200 else None
+
+    async def _acached(self, cache, key, fetch):
+        value = cache.get(key)
+        self.stats.record_cache(hit=value is not None)
+        if value is None:
+            value = await fetch()
+            cache.set(key, value)
+        return value or None
+
+    async def asearch(self, query: str):
+        async def fetch():
+            return self._parse_search(await self._aget(*self._search_request(query)))
+        return await self._acached(self.search_cache, self._cache_key(query), fetch)
+
+    async def asummary(self, title: str):
+        async def fetch():
+            return self._parse_summary(title, await self._aget(*self._summary_request(title)))
+        return await self._acached(self.summary_cache, title, fetch)
+
+    async def alookup(self, query: str):
+        title = await self.asearch(query)
+        return await self.asummary(title) if title else None
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_wikipedia_client() -> WikipediaClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WikipediaClient()
+        return _client
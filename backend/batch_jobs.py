@@ -0,0 +1,32 @@
+import json
+import os
+
+from agents.ttl_cache import LRUTTLCache
+from redis_client import REDIS_URL, get_redis
+
+# How long a batch job's manifest (which task holds which text) is kept
+BATCH_JOB_TTL = int(os.getenv("BATCH_JOB_TTL", str(24 * 3600)))
+
+_local_jobs = LRUTTLCache(max_entries=1024, ttl=BATCH_JOB_TTL)
+
+
+def _job_key(job_id: str) -> str:
+    return f"inocula:batch:{job_id}"
+
+
+def save_job(job: dict):
+    """
+    Stores the manifest of a batch job under its job_id.
+    Falls back to process memory when no Redis is configured.
+    """
+    if REDIS_URL:
+        get_redis().set(_job_key(job["job_id"]), json.dumps(job), ex=BATCH_JOB_TTL)
+    else:
+        _local_jobs.set(job["job_id"], job)
+
+
+def load_job(job_id: str):
+    if REDIS_URL:
+        raw = get_redis().get(_job_key(job_id))
+        return json.loads(raw) if raw else None
+    return _local_jobs.get(job_id)
@@ -0,0 +1,97 @@
+"""
+Admission control against a local Redis with a simulated slow worker.
+
+A producer offers --rate requests/sec for --duration seconds to a scratch
+queue. --slots worker threads pop from it, each "task" taking
+--task-seconds, and report their durations with admission.record_task like
+the Celery workers do. Every request goes through admission.admit first:
+- accepted: queued
+- degraded: counted as a lite scan, not queued
+- rejected: counted with its Retry-After hint
+
+The run is repeated with admission off. Both runs report the queue wait of
+accepted tasks, which should stay near the SLO with admission on and keep
+growing with it off. A last check sends a burst from one client through
+the token bucket.
+
+Run from the backend folder (needs Redis):
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_admission --rate 5 --task-seconds 1 --slots 2
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+import admission
+from redis_client import get_redis
+
+QUEUE = "inocula-bench-admission"
+
+
+def worker(redis, task_seconds, slots, stop, waits):
+    while not stop.is_set():
+        item = redis.brpop(QUEUE, timeout=1)
+        if item is None:
+            continue
+        waits.append(time.time() - float(item[1]))
+        time.sleep(task_seconds)
+        admission.record_task(QUEUE, task_seconds, "bench-worker", slots)
+
+
+def run(rate, duration, task_seconds, slots, enabled):
+    redis = get_redis()
+    redis.delete(QUEUE, admission.SLOTS_PREFIX + QUEUE)
+    redis.hdel(admission.LATENCY_KEY, QUEUE)
+    admission.ADMISSION_ENABLED = enabled
+    admission._estimates.clear()
+
+    stop, waits, decisions, retry_after = threading.Event(), [], Counter(), []
+    threads = [threading.Thread(target=worker, args=(redis, task_seconds, slots, stop, waits)) for _ in range(slots)]
+    for thread in threads:
+        thread.start()
+
+    start = time.time()
+    while time.time() - start < duration:
+        decision, _, hint = admission.admit(QUEUE)
+        decisions[decision] += 1
+        if decision == "accept":
+            redis.lpush(QUEUE, str(time.time()))
+        elif decision == "reject":
+            retry_after.append(hint)
+        time.sleep(1 / rate)
+
+    # Let the accepted backlog drain so every accepted task has a wait
+    while redis.llen(QUEUE):
+        time.sleep(0.2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    waits.sort()
+    p = lambda q: waits[min(len(waits) - 1, int(q * len(waits)))] if waits else 0.0
+    hint = max(retry_after) if retry_after else "-"
+    return decisions, p(0.50), p(0.95), waits[-1] if waits else 0.0, hint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=5, help="offered requests/sec")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--task-seconds", type=float, default=1.0)
+    parser.add_argument("--slots", type=int, default=2)
+    parser.add_argument("--slo", type=float, default=5, help="queue wait SLO in seconds")
+    args = parser.parse_args()
+
+    admission.ADMISSION_SLO_SECONDS[QUEUE] = args.slo
+    print(f"offered {args.rate}/s, capacity {args.slots / args.task_seconds:.1f}/s, SLO {args.slo}s")
+    print(f"{'admission':>9} {'accept':>7} {'degrade':>8} {'reject':>7} {'p50 wait':>9} {'p95 wait':>9} "
+          f"{'max wait':>9} {'max Retry-After':>16}")
+    for enabled in (True, False):
+        decisions, p50, p95, worst, hint = run(args.rate, args.duration, args.task_seconds, args.slots, enabled)
+        print(f"{'on' if enabled else 'off':>9} {decisions['accept']:>7} {decisions['degrade']:>8} "
+              f"{decisions['reject']:>7} {p50:>9.1f} {p95:>9.1f} {worst:>9.1f} {hint:>16}")
+
+    get_redis().delete(admission.BUCKET_PREFIX + "bench-noisy-client")
+    allowed = sum(admission.allow_client("bench-noisy-client")[0] for _ in range(100))
+    print(f"\ntoken bucket: {allowed}/100 back-to-back requests from one client allowed "
+          f"(burst {admission.RATE_LIMIT_BURST:.0f}, {admission.RATE_LIMIT_PER_MINUTE:.0f}/min)")
@@ -0,0 +1,116 @@
+"""
+Worker execution modes under concurrent load, with Wikipedia and Gemini
+replaced by stubs that only add latency (benchmarks/stubs.py and the LLM
+gateway's stub backend, both uncached):
+- prefork: --processes worker processes, each loading its own models and
+  running run_inocula_agent on one text at a time (the current setup,
+  with the Gemini stage in the same task, i.e. IO_STAGE=0)
+- asyncio: one process running arun_inocula_agent for --in-flight texts
+  at once on its event loop, inference on INFERENCE_THREADS threads
+  (WORKER_EXECUTION=asyncio)
+
+Reports texts/sec, p50/p95 latency, peak RSS per worker process and in
+total, and checks that both modes give every text the same score.
+
+Run from the backend folder:
+    python -m benchmarks.bench_async_worker --texts 64 --processes 4 --in-flight 32
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+from benchmarks.bench_e2e import load_labeled, peak_rss_mb, percentiles
+from benchmarks.stubs import WikipediaStubServer
+
+
+def install_stubs(api_url, rest_url, llm_latency, concurrency):
+    """
+    Like bench_e2e.install_stubs, from the stub's URLs (for spawned
+    processes), with the per-process concurrency caps set to `concurrency`.
+    """
+    from agents import llm, wikipedia
+    wikipedia._client = wikipedia.WikipediaClient(
+        api_url=api_url, rest_url=rest_url, max_concurrency=concurrency, pool_size=concurrency, cache_ttl=0)
+    llm.set_llm(llm.LLMGateway(llm.StubBackend(latency=llm_latency), cache_size=0, max_concurrency=concurrency))
+
+
+def init_prefork(stub, barrier):
+    install_stubs(*stub, concurrency=1)
+    from agents.models import warm_up
+    warm_up()
+    # Start measuring once every process has its models loaded
+    barrier.wait()
+
+
+def analyze_prefork(text):
+    from agents.graph import run_inocula_agent
+
+    start = time.time()
+    result = run_inocula_agent(text)
+    return result["score"], start, time.time(), os.getpid(), peak_rss_mb(os.getpid())
+
+
+def run_asyncio(texts, stub, in_flight):
+    install_stubs(*stub, concurrency=in_flight)
+    from agents.graph import arun_inocula_agent
+    from agents.models import warm_up
+    warm_up()
+
+    async def main():
+        slots = asyncio.Semaphore(in_flight)
+
+        async def one(text):
+            async with slots:
+                start = time.time()
+                result = await arun_inocula_agent(text)
+                return result["score"], start, time.time()
+
+        return await asyncio.gather(*(one(text) for text in texts))
+
+    samples = asyncio.run(main())
+    return [(score, start, end, os.getpid(), peak_rss_mb(os.getpid())) for score, start, end in samples]
+
+
+def report(name, samples, workers):
+    elapsed = max(end for _, _, end, _, _ in samples) - min(start for _, start, _, _, _ in samples)
+    latency = percentiles([(end - start) * 1000 for _, start, end, _, _ in samples])
+    rss = {}
+    for _, _, _, pid, mb in samples:
+        rss[pid] = max(rss.get(pid, 0), mb)
+    print(f"{name:>8} {workers:>8} {len(samples) / elapsed:>10.2f} {latency['p50']:>8.0f} {latency['p95']:>8.0f} "
+          f"{max(rss.values()):>14.0f} {sum(rss.values()):>13.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--texts", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=4, help="prefork worker processes")
+    parser.add_argument("--in-flight", type=int, default=32, help="concurrent texts in the asyncio worker")
+    parser.add_argument("--wiki-ms", type=float, default=300)
+    parser.add_argument("--gemini-ms", type=float, default=1500)
+    args = parser.parse_args()
+
+    # Numbered, so every text is a distinct request
+    texts = [f"Report {i}. {text}" for i, (text, _) in enumerate(load_labeled(args.corpus, args.texts))]
+    context = multiprocessing.get_context("spawn")
+
+    with WikipediaStubServer(latency=args.wiki_ms / 1000) as wikipedia:
+        stub = (wikipedia.api_url, wikipedia.rest_url, args.gemini_ms / 1000)
+
+        barrier = context.Barrier(args.processes)
+        with context.Pool(args.processes, initializer=init_prefork, initargs=(stub, barrier)) as pool:
+            prefork = pool.map(analyze_prefork, texts, chunksize=1)
+
+        # A fresh process, so its peak RSS is its own
+        with context.Pool(1) as pool:
+            async_samples = pool.apply(run_asyncio, (texts, stub, args.in_flight))
+
+    print(f"\n{'mode':>8} {'workers':>8} {'texts/sec':>10} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'RSS/proc MB':>14} {'RSS total MB':>13}")
+    report("prefork", prefork, args.processes)
+    report("asyncio", async_samples, 1)
+    mismatches = sum(a[0] != b[0] for a, b in zip(prefork, async_samples))
+    print(f"\nscores differing between modes: {mismatches}/{len(texts)}")
@@ -0,0 +1,61 @@
+"""
+Throughput of the three classifiers: one text at a time vs micro-batches.
+
+Run from the backend folder:
+    python -m benchmarks.bench_batching --texts 256 --batch-size 16
+"""
+import argparse
+import csv
+import time
+
+from agents.detector import tox_pipeline
+from agents.analyzer import emotion_pipeline
+from agents.fallacy import classifier, FALLACY_LABELS
+from agents.batching import run_model_batch
+
+
+def load_corpus(path, n):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [f"{row['title']}. {row['body']}" for row in csv.DictReader(f)]
+    # Repeat the sample articles until we have enough texts
+    return [rows[i % len(rows)] for i in range(n)]
+
+
+def run_single(texts):
+    for text in texts:
+        tox_pipeline(text)
+        emotion_pipeline(text)
+        classifier(text, candidate_labels=FALLACY_LABELS)
+
+
+def run_batched(texts, batch_size):
+    for start in range(0, len(texts), batch_size):
+        run_model_batch(texts[start:start + batch_size])
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--texts", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, args.texts)
+
+    # Warm up both paths so model loading isn't measured
+    run_single(texts[:2])
+    run_batched(texts[:2], 2)
+
+    single = timed(run_single, texts)
+    batched = timed(run_batched, texts, args.batch_size)
+
+    print(f"texts: {len(texts)}")
+    print(f"one-at-a-time : {len(texts) / single:8.2f} texts/sec ({single:.2f}s)")
+    print(f"batch size {args.batch_size:<3}: {len(texts) / batched:8.2f} texts/sec ({batched:.2f}s)")
+    print(f"speedup       : {single / batched:8.2f}x")
@@ -0,0 +1,63 @@
+"""
+Cascade policy report: how many fallacy (NLI) and Gemini calls the early
+exits skip on a labeled set, and what that does to accuracy (a score of
+40 or below counts as predicted "false").
+
+By default Wikipedia and Gemini are called for real. With --offline both
+are replaced with deterministic stand-ins. The stand-in explainer keeps
+the stylistic score, so offline runs only show the effect of skipping
+the fallacy agent.
+
+Run from the backend folder:
+    python -m benchmarks.bench_cascade --corpus ../data/sample_articles.csv
+"""
+import argparse
+import csv
+
+from agents import cascade
+from agents.graph import build_graph, initial_state
+from agents.scoring import score_band
+
+
+def stub_verifier(state):
+    title = " ".join(state["input_text"].split()[:3])
+    return {
+        "signals": {"verifier": {"deduction": 0, "reasons": [f"Factual Context Found: Wikipedia ('{title}')"]}},
+        "metadata": {"verification_summary": f"Wikipedia summary for '{title}': stub.", "verification_link": ""},
+    }
+
+
+def stub_explainer(state):
+    return {"explanation": "Stub explanation."}
+
+
+def run(graph, articles):
+    correct = 0
+    for text, label in articles:
+        result = graph.invoke(initial_state(text))
+        correct += (score_band(result["score"]) == "red") == (label == "false")
+    return correct / len(articles)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--offline", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.corpus, newline="", encoding="utf-8") as f:
+        articles = [(f"{row['title']}. {row['body']}", row["label"].lower()) for row in csv.DictReader(f)]
+
+    overrides = {"verifier": stub_verifier, "explainer": stub_explainer} if args.offline else {}
+
+    baseline = run(build_graph(overrides=overrides, cascade=False), articles)
+    before = cascade.stats.snapshot()
+    with_cascade = run(build_graph(overrides=overrides, cascade=True), articles)
+    counts = {k: v - before[k] for k, v in cascade.stats.snapshot().items()}
+
+    n = len(articles)
+    print(f"texts: {n}")
+    print(f"fallacy NLI calls skipped: {counts['fallacy_skipped']}/{counts['fallacy_run'] + counts['fallacy_skipped']}")
+    print(f"Gemini calls skipped:      {counts['llm_skipped']}/{counts['llm_run'] + counts['llm_skipped']}")
+    print(f"accuracy without cascade:  {baseline:.3f}")
+    print(f"accuracy with cascade:     {with_cascade:.3f} (delta {with_cascade - baseline:+.3f})")
@@ -0,0 +1,78 @@
+"""
+Latency and peak memory of the three classifiers on long articles:
+- truncate: the whole text as one input, cut at the model limit
+  (what the single-string pipeline calls amounted to)
+- chunked: overlapping windows, batched, aggregated with max or mean
+
+Each mode runs in a fresh subprocess so peak RSS is measured separately.
+
+Run from the backend folder:
+    python -m benchmarks.bench_chunking --words 2000 5000
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_batching import load_corpus
+
+
+def long_article(words: int, corpus: str) -> str:
+    sentences = " ".join(load_corpus(corpus, 8)).split()
+    return " ".join(sentences[i % len(sentences)] for i in range(words))
+
+
+def run_mode(mode: str, text: str, repeats: int):
+    from agents import chunking
+    from agents.fallacy import FALLACY_LABELS
+    from agents.fallacy_engine import fallacy_outputs
+    from agents.models import get_pipeline
+
+    def truncate():
+        get_pipeline("toxicity")(text, truncation=True)
+        get_pipeline("emotion")(text, truncation=True)
+        get_pipeline("fallacy")(text, candidate_labels=FALLACY_LABELS)
+
+    def chunked():
+        chunking.toxicity_outputs([text])
+        chunking.emotion_outputs([text])
+        fallacy_outputs([text], FALLACY_LABELS)
+
+    if mode != "truncate":
+        chunking.CHUNK_AGGREGATION = mode
+    fn = truncate if mode == "truncate" else chunked
+    fn()  # warm-up
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    latency = (time.perf_counter() - start) / repeats
+    # ru_maxrss is in KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    windows = len(chunking.split_windows(text, get_pipeline("toxicity").tokenizer))
+    print(f"{latency:.4f} {peak_mb:.1f} {windows}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--words", type=int, nargs="+", default=[2000, 5000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, long_article(args.words[0], args.corpus), args.repeats)
+        raise SystemExit
+
+    print(f"{'words':>6} {'mode':>9} {'windows':>8} {'s/article':>10} {'peak RSS MB':>12}")
+    for words in args.words:
+        for mode in ("truncate", "max", "mean"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_chunking", "--mode", mode,
+                 "--words", str(words), "--repeats", str(args.repeats), "--corpus", args.corpus],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            latency, peak, windows = out.split()
+            print(f"{words:>6} {mode:>9} {windows:>8} {float(latency):>10.3f} {float(peak):>12.1f}")
@@ -0,0 +1,241 @@
+"""
+End-to-end benchmark and regression check. A labeled corpus is replayed
+through the whole pipeline, either:
+- inprocess: run_inocula_agent in this process, from a thread pool
+- http: POST /analyze (trace=true) then poll /status, against a running API
+
+In both cases Wikipedia and Gemini are replaced by deterministic stubs
+(benchmarks/stubs.py and the LLM gateway's stub backend, uncached). For
+http, start the worker with them installed:
+    python -m benchmarks.bench_e2e --serve-worker -- --pool solo
+
+Reports:
+- p50/p95/p99 latency per node and end to end
+- texts/sec at --concurrency
+- peak RSS (this process, or --worker-pid for http)
+- accuracy against the labels (a red score band counts as "false")
+
+--save writes the report to benchmarks/baselines/<name>.json, and
+--compare prints the change against a saved report, exiting with status 1
+when anything regressed beyond --tolerance.
+
+Run from the backend folder:
+    python -m benchmarks.bench_e2e --texts 64 --concurrency 4 --save main
+    python -m benchmarks.bench_e2e --texts 64 --concurrency 4 --compare main
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import WikipediaStubServer
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+# Metrics where a higher value is better; everything else is a latency/size
+HIGHER_IS_BETTER = {"texts_per_sec", "accuracy"}
+
+
+def load_labeled(path, n):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [(f"{row['title']}. {row['body']}", row["label"].lower()) for row in csv.DictReader(f)]
+    return [rows[i % len(rows)] for i in range(n)]
+
+
+def install_stubs(wikipedia: WikipediaStubServer, llm_latency: float):
+    """
+    Points this process's Wikipedia client at the stub server and its LLM
+    gateway at the stub backend. The LLM cache is off, so replayed texts
+    still pay the simulated round-trip.
+    """
+    from agents import llm, wikipedia as wiki
+    wiki._client = wiki.WikipediaClient(api_url=wikipedia.api_url, rest_url=wikipedia.rest_url)
+    llm.set_llm(llm.LLMGateway(llm.StubBackend(latency=llm_latency), cache_size=0))
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def peak_rss_mb(pid=None):
+    if pid is None:
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def summarize(samples, elapsed, rss_mb):
+    """
+    `samples` holds one (label, result, seconds) per text, where result has
+    "score" and a trace list of {"node", "ms"}.
+    """
+    from agents.scoring import score_band
+
+    per_node = {}
+    for _, result, _ in samples:
+        for entry in result.get("trace", []):
+            per_node.setdefault(entry["node"], []).append(entry["ms"])
+    correct = sum((score_band(result["score"]) == "red") == (label == "false") for label, result, _ in samples)
+    return {
+        "texts": len(samples),
+        "texts_per_sec": len(samples) / elapsed,
+        "accuracy": correct / len(samples),
+        "peak_rss_mb": rss_mb,
+        "total_ms": percentiles([seconds * 1000 for _, _, seconds in samples]),
+        "nodes_ms": {node: percentiles(ms) for node, ms in sorted(per_node.items())},
+    }
+
+
+def run_inprocess(corpus, concurrency):
+    from agents.graph import run_inocula_agent
+
+    def one(item):
+        text, label = item
+        start = time.perf_counter()
+        result = run_inocula_agent(text, trace=True)
+        return label, result, time.perf_counter() - start
+
+    run_inocula_agent(corpus[0][0])  # warm-up, so model loading isn't measured
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, corpus))
+    return summarize(samples, time.perf_counter() - start, peak_rss_mb())
+
+
+async def run_http(corpus, concurrency, base_url, poll_interval, worker_pid):
+    import httpx
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(http, index, text, label):
+        async with slots:
+            start = time.perf_counter()
+            # Unique text per replay, so nothing is deduplicated
+            task_id = (await http.post("/analyze", json={"text": f"{text} [{index}]", "trace": True})).json()["task_id"]
+            while True:
+                status = (await http.get(f"/status/{task_id}")).json()
+                if status["status"] in ("completed", "failed"):
+                    break
+                await asyncio.sleep(poll_interval)
+            result = status.get("result") or {}
+            trace = result.get("trace") or {}
+            return label, {"score": result.get("score", 100), "trace": trace.get("nodes", [])}, time.perf_counter() - start
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        await one(http, -1, *corpus[0])  # warm-up
+        start = time.perf_counter()
+        samples = await asyncio.gather(*(one(http, i, text, label) for i, (text, label) in enumerate(corpus)))
+    rss = peak_rss_mb(worker_pid) if worker_pid else None
+    return summarize(samples, time.perf_counter() - start, rss)
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and key not in ("texts", "concurrency"):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(report, baseline, tolerance):
+    """
+    Prints each metric next to the baseline and returns the names of the
+    ones that got worse by more than `tolerance` (a fraction).
+    """
+    current, before = flatten(report), flatten(baseline)
+    regressions = []
+    print(f"{'metric':>32} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name in sorted(set(current) & set(before)):
+        old, new = before[name], current[name]
+        change = (new - old) / old if old else 0.0
+        worse = -change if name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else change
+        flag = " REGRESSION" if worse > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:>32} {old:>10.2f} {new:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def baseline_path(name):
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def print_report(report):
+    print(f"texts: {report['texts']}  texts/sec: {report['texts_per_sec']:.2f}  "
+          f"accuracy: {report['accuracy']:.3f}  peak RSS MB: {report['peak_rss_mb'] or 'n/a'}")
+    print(f"{'node':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for node, p in {**report["nodes_ms"], "total": report["total_ms"]}.items():
+        print(f"{node:>12} {p['p50']:>9.1f} {p['p95']:>9.1f} {p['p99']:>9.1f}")
+
+
+def serve_worker(worker_args, wiki_latency, gemini_latency):
+    """
+    Runs a Celery worker with the stubs installed. Prefork children inherit
+    the patched clients; the stub server keeps running in this process.
+    """
+    from celery_worker import celery_app
+
+    with WikipediaStubServer(latency=wiki_latency) as wikipedia:
+        install_stubs(wikipedia, gemini_latency)
+        celery_app.worker_main(["worker", "--loglevel=INFO", *worker_args])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--texts", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--wikipedia-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--worker-pid", type=int, help="read the worker's peak RSS (http mode, Linux)")
+    parser.add_argument("--save", help="baseline name (or .json path) to write")
+    parser.add_argument("--compare", help="baseline name (or .json path) to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--serve-worker", action="store_true", help="run a stubbed Celery worker instead")
+    args, extra = parser.parse_known_args()
+
+    if args.serve_worker:
+        serve_worker([a for a in extra if a != "--"], args.wikipedia_latency, args.gemini_latency)
+        raise SystemExit
+
+    corpus = load_labeled(args.corpus, args.texts)
+    if args.mode == "inprocess":
+        with WikipediaStubServer(latency=args.wikipedia_latency) as wikipedia:
+            install_stubs(wikipedia, args.gemini_latency)
+            report = run_inprocess(corpus, args.concurrency)
+    else:
+        report = asyncio.run(run_http(corpus, args.concurrency, args.base_url, args.poll_interval, args.worker_pid))
+    report = {"mode": args.mode, "concurrency": args.concurrency, **report}
+    print_report(report)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved {baseline_path(args.save)}")
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+        if (baseline.get("mode"), baseline.get("concurrency")) != (args.mode, args.concurrency):
+            print("warning: baseline was recorded with a different mode or concurrency")
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
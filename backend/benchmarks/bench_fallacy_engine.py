@@ -0,0 +1,78 @@
+"""
+Fallacy engine vs the zero-shot pipeline, over the same texts:
+- pipeline: classifier(text, candidate_labels=FALLACY_LABELS), batched
+- engine single-label: softmax over labels, so the scores should match the
+  pipeline's (checks the engine builds the same inputs)
+- engine multi-label: independent entailment per label
+
+Reports texts/sec for each. It also reports two agreements with the
+pipeline: the top label (single-label) and the "has a fallacy" decision
+(multi-label). Finally it counts how many texts get more than one fallacy,
+and sweeps the multi-label threshold, to calibrate FALLACY_MULTI_THRESHOLD
+before turning on FALLACY_MULTI_LABEL.
+
+Run from the backend folder:
+    python -m benchmarks.bench_fallacy_engine --texts 128
+"""
+import argparse
+import time
+
+from agents.fallacy import FALLACY_LABELS, SOUND_LABEL, classifier, detected_fallacies
+from agents.fallacy_engine import fallacy_outputs
+from benchmarks.bench_batching import load_corpus
+
+
+def timed(fn, texts):
+    fn(texts[:2])  # warm-up
+    start = time.perf_counter()
+    results = fn(texts)
+    return results, len(texts) / (time.perf_counter() - start)
+
+
+def run_pipeline(texts, batch_size):
+    results = classifier(texts, candidate_labels=FALLACY_LABELS, batch_size=batch_size)
+    return [results] if isinstance(results, dict) else results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--texts", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.9")
+    args = parser.parse_args()
+
+    # Unique texts, so no run is helped by repeated inputs
+    texts = [f"{text} ({i})" for i, text in enumerate(load_corpus(args.corpus, args.texts))]
+
+    pipeline_results, pipeline_rate = timed(lambda t: run_pipeline(t, args.batch_size), texts)
+    single_results, single_rate = timed(lambda t: fallacy_outputs(t, FALLACY_LABELS, multi_label=False), texts)
+    multi_results, multi_rate = timed(lambda t: fallacy_outputs(t, FALLACY_LABELS, multi_label=True), texts)
+
+    top_agreement = sum(
+        p["labels"][0] == s["labels"][0] for p, s in zip(pipeline_results, single_results)) / len(texts)
+    max_score_gap = max(
+        abs(dict(zip(p["labels"], p["scores"]))[label] - score)
+        for p, s in zip(pipeline_results, single_results) for label, score in zip(s["labels"], s["scores"]))
+    pipeline_found = [detected_fallacies(p) for p in pipeline_results]
+    multi_found = [detected_fallacies(m) for m in multi_results]
+    decision_agreement = sum(bool(p) == bool(m) for p, m in zip(pipeline_found, multi_found)) / len(texts)
+    several = sum(len(found) > 1 for found in multi_found)
+
+    print(f"texts: {len(texts)}")
+    print(f"{'pipeline':>22}: {pipeline_rate:8.2f} texts/sec")
+    print(f"{'engine single-label':>22}: {single_rate:8.2f} texts/sec "
+          f"(top label agreement {top_agreement:.1%}, max score gap {max_score_gap:.4f})")
+    print(f"{'engine multi-label':>22}: {multi_rate:8.2f} texts/sec "
+          f"(fallacy yes/no agreement {decision_agreement:.1%}, {several} texts with 2+ fallacies)")
+
+    print("\nmulti-label threshold vs the single-label decision:")
+    for threshold in [float(value) for value in args.thresholds.split(",")]:
+        found = [
+            [label for label, score in zip(m["labels"], m["scores"]) if label != SOUND_LABEL and score > threshold]
+            for m in multi_results
+        ]
+        agreement = sum(bool(p) == bool(f) for p, f in zip(pipeline_found, found)) / len(texts)
+        flagged = sum(bool(f) for f in found) / len(texts)
+        print(f"  {threshold:.2f}: yes/no agreement {agreement:.1%}, texts flagged {flagged:.1%} "
+              f"(single-label {sum(bool(p) for p in pipeline_found) / len(texts):.1%})")
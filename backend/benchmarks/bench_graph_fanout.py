@@ -0,0 +1,232 @@
+"""
+Fan-out scoring check: the parallel branches (verifier, detector,
+analyzer, fallacy) each return a deduction that the join node applies in
+BRANCH_ORDER. The original sequential agents are reimplemented below (the
+detector set the score to 100 - toxicity, the analyzer and fallacy agents
+then subtracted from the running score), and compared with:
+- the branch outputs merged and joined in every order they can finish in
+- the compiled graphs, build_graph(parallel=False) and (parallel=True),
+  on score, reasons, color band and emotions
+
+The classifiers are not run: every text gets synthetic model outputs
+(passed in through state["model_outputs"]), and the pipelines are
+replaced by stubs that fail if called. Memory and the verifier are stub
+nodes and the explainer is left out, so no model is downloaded.
+
+With --latency (needs the real models), also compares per-request latency
+of the sequential and fan-out graphs; Gemini is skipped, and with
+--offline the Wikipedia verifier is a stub sleeping --verifier-ms.
+
+Run from the backend folder:
+    python -m benchmarks.bench_graph_fanout --texts 500
+    python -m benchmarks.bench_graph_fanout --latency --offline
+"""
+import argparse
+import csv
+import itertools
+import random
+import statistics
+import time
+
+EMOTIONS = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
+
+
+def load_corpus(path, n):
+    # Not bench_batching.load_corpus: importing that module loads the models
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [f"{row['title']}. {row['body']}" for row in csv.DictReader(f)]
+    return [rows[i % len(rows)] for i in range(n)]
+
+
+class StubPipeline:
+    def __call__(self, *args, **kwargs):
+        raise RuntimeError("The check passes model outputs in; no pipeline should run.")
+
+
+def install_stub_pipelines():
+    from agents import models
+    for name in models.MODEL_SPECS:
+        models._pipelines[name] = StubPipeline()
+
+
+def synthetic_outputs(rng, fallacy_labels):
+    """
+    Raw outputs in the shape of the three pipelines, spread so every
+    branch sometimes deducts and sometimes doesn't.
+    """
+    toxicity = [{"label": "toxic", "score": rng.random()}, {"label": "insult", "score": rng.random()}]
+    emotions = [{"label": label, "score": rng.random() * 0.8} for label in EMOTIONS]
+    scores = sorted((rng.random() for _ in fallacy_labels), reverse=True)
+    labels = rng.sample(fallacy_labels, len(fallacy_labels))
+    total = sum(scores)
+    fallacy = {"labels": labels, "scores": [score / total * rng.uniform(0.5, 2.5) for score in scores]}
+    return {"toxicity": toxicity, "emotions": emotions, "fallacy": fallacy}
+
+
+def baseline_sequential(outputs, verifier_reasons):
+    """
+    The original sequential agents: Verifier -> Detector -> Analyzer -> Fallacy.
+    """
+    reasons = list(verifier_reasons)
+
+    toxicity_score = 0
+    for result in outputs["toxicity"]:
+        if result["label"] == "toxic":
+            toxicity_score = int(result["score"] * 100)
+    if toxicity_score > 50:
+        reasons.append(f"Toxicity detected (Level: {toxicity_score}%)")
+    else:
+        reasons.append("Initial scan: Content does not show immediate toxic patterns.")
+    score = 100 - toxicity_score
+
+    emotions = []
+    deduction = 0
+    for entry in outputs["emotions"]:
+        if entry["label"] in ["anger", "fear"] and entry["score"] > 0.4:
+            emotions.append(entry["label"])
+            reasons.append(f"Emotional trigger: {entry['label'].upper()}")
+            deduction += 15
+    score = max(0, score - deduction)
+
+    top_label, top_score = outputs["fallacy"]["labels"][0], outputs["fallacy"]["scores"][0]
+    if top_label != "Logical Reasoning" and top_score > 0.3:
+        reasons.append(f"Logical Flaw: {top_label}")
+        score = max(0, score - 25)
+
+    return score, reasons, emotions
+
+
+def fanout(state, updates):
+    """
+    What the graph does with the branch updates arriving in this order:
+    merges them with the state's reducers, then runs the join node.
+    """
+    from agents.scoring import combine_signals
+    from agents.state import merge_dicts
+
+    signals, emotions = {}, []
+    for update in updates:
+        signals = merge_dicts(signals, update.get("signals"))
+        emotions = update.get("detected_emotions", emotions)
+    score, reasons = combine_signals(signals)
+    return score, reasons, emotions
+
+
+def verifier_reasons(text):
+    # What the stub verifier finds: context for about half the texts
+    return [f"Factual Context Found: Wikipedia ('{text[:20]}')"] if len(text) % 2 else []
+
+
+def stub_memory(state):
+    return {"is_memory_hit": False}
+
+
+def fixed_verifier(state):
+    return {"signals": {"verifier": {"deduction": 0, "reasons": verifier_reasons(state["input_text"])}}}
+
+
+def report_mismatch(text, expected, got):
+    print(f"MISMATCH for {text[:60]!r}")
+    print(f"  sequential: {expected}")
+    print(f"  got:        {got}")
+
+
+def check_orders(cases):
+    from agents.analyzer import analyzer_node
+    from agents.detector import detector_node
+    from agents.fallacy import fallacy_node
+
+    mismatches = 0
+    for text, outputs in cases:
+        state = {"input_text": text, "model_outputs": outputs, "is_memory_hit": False}
+        updates = [fixed_verifier(state), detector_node(state), analyzer_node(state), fallacy_node(state)]
+        expected = baseline_sequential(outputs, verifier_reasons(text))
+        for order in itertools.permutations(updates):
+            got = fanout(state, order)
+            if got != expected:
+                mismatches += 1
+                report_mismatch(text, expected, got)
+                break
+    print(f"join vs the sequential agents, every branch completion order: {mismatches}/{len(cases)} mismatches")
+    return mismatches
+
+
+def check_graphs(cases):
+    from agents.graph import build_graph, initial_state
+    from agents.scoring import score_band
+
+    overrides = {"memory": stub_memory, "verifier": fixed_verifier}
+    total = 0
+    for parallel in (False, True):
+        graph = build_graph(parallel=parallel, overrides=overrides, cascade=False, explain=False)
+        mismatches = 0
+        for text, outputs in cases:
+            score, reasons, emotions = baseline_sequential(outputs, verifier_reasons(text))
+            expected = (score, reasons, score_band(score), emotions)
+            final = graph.invoke(initial_state(text, outputs, embedding=[]))
+            got = (final["score"], final["reasons"], score_band(final["score"]), final["detected_emotions"])
+            if got != expected:
+                mismatches += 1
+                report_mismatch(text, expected, got)
+        name = "parallel" if parallel else "sequential"
+        print(f"build_graph({name}) vs the sequential agents: {mismatches}/{len(cases)} mismatches")
+        total += mismatches
+    return total
+
+
+def check(texts, seed):
+    install_stub_pipelines()
+    from agents.fallacy import FALLACY_LABELS
+
+    rng = random.Random(seed)
+    # Numbered, so the stub verifier's reasons vary across repeated articles
+    cases = [(f"Report {i}. {text}", synthetic_outputs(rng, FALLACY_LABELS)) for i, text in enumerate(texts)]
+    return check_orders(cases) + check_graphs(cases)
+
+
+def skip_explainer(state):
+    return {}
+
+
+def stub_verifier(delay):
+    def verifier(state):
+        time.sleep(delay)
+        return {"signals": {"verifier": {"deduction": 0, "reasons": []}}}
+    return verifier
+
+
+def compare_latency(texts, offline, verifier_ms):
+    from agents.graph import build_graph, initial_state
+
+    overrides = {"explainer": skip_explainer}
+    if offline:
+        overrides["verifier"] = stub_verifier(verifier_ms / 1000)
+    graphs = {
+        "sequential": build_graph(parallel=False, overrides=overrides),
+        "parallel": build_graph(parallel=True, overrides=overrides),
+    }
+    latencies = {name: [] for name in graphs}
+    for text in texts:
+        for name, graph in graphs.items():
+            start = time.perf_counter()
+            graph.invoke(initial_state(text))
+            latencies[name].append(time.perf_counter() - start)
+    for name, values in latencies.items():
+        print(f"{name:<10} median {statistics.median(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", action="store_true", help="also time the real graphs (loads the models)")
+    parser.add_argument("--offline", action="store_true")
+    parser.add_argument("--verifier-ms", type=float, default=400)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, args.texts)
+    if args.latency:
+        compare_latency(texts[:8], args.offline, args.verifier_ms)
+    else:
+        raise SystemExit(1 if check(texts, args.seed) else 0)
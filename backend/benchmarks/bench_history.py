@@ -0,0 +1,97 @@
+"""
+/history query latency at scale: fills a scratch collection on a local
+mongod with synthetic analyses, creates the production indexes, and
+compares these against the old skip()-based approach:
+- keyset (cursor) pagination
+- band filter
+- date-range filter
+
+Also times the buffered bulk writer's ingest rate.
+
+Run from the backend folder (needs a local mongod):
+    python -m benchmarks.bench_history --docs 1000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from agents.scoring import score_band
+from persistence import BufferedResultWriter, ensure_indexes
+
+
+def timed(fn, repeats=20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def page(collection, query, limit=20):
+    return list(collection.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit))
+
+
+def after(doc):
+    return {"$or": [
+        {"timestamp": {"$lt": doc["timestamp"]}},
+        {"timestamp": doc["timestamp"], "_id": {"$lt": doc["_id"]}},
+    ]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo", default="mongodb://localhost:27017")
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--deep-page", type=int, default=1000)
+    args = parser.parse_args()
+
+    collection = MongoClient(args.mongo).inocula_bench.analyses
+    collection.drop()
+
+    writer = BufferedResultWriter(collection_factory=lambda: collection, batch_size=5000)
+    now = datetime.now(timezone.utc)
+    random.seed(0)
+    start = time.perf_counter()
+    for i in range(args.docs):
+        score = random.randint(0, 100)
+        writer.write({
+            "_id": ObjectId(),
+            "task_id": f"bench-{i}",
+            "timestamp": now - timedelta(seconds=random.randint(0, 90 * 86400)),
+            "request_text": "synthetic",
+            "text_hash": f"{i:064x}",
+            "score_band": score_band(score),
+            "result": {"score": score, "reasons": [], "status": "complete"},
+            "status": "complete",
+        })
+        if (i + 1) % 5000 == 0:
+            writer.flush()
+    writer.flush()
+    ensure_indexes(collection)
+    elapsed = time.perf_counter() - start
+    print(f"wrote {args.docs} analyses in {elapsed:.1f}s ({args.docs / elapsed:.0f}/sec)")
+
+    # Cursor for the deep page, found by walking pages like a client would
+    cursor_doc = None
+    for _ in range(args.deep_page):
+        docs = page(collection, after(cursor_doc) if cursor_doc else {})
+        cursor_doc = docs[-1]
+
+    week_ago = now - timedelta(days=7)
+    cases = {
+        "first page": lambda: page(collection, {}),
+        f"page {args.deep_page} via skip()": lambda: list(
+            collection.find().sort([("timestamp", -1), ("_id", -1)]).skip(args.deep_page * 20).limit(20)),
+        f"page {args.deep_page} via cursor": lambda: page(collection, after(cursor_doc)),
+        "band=red": lambda: page(collection, {"score_band": "red"}),
+        "last 7 days": lambda: page(collection, {"timestamp": {"$gte": week_ago}}),
+        "band=red, last 7 days": lambda: page(collection, {"score_band": "red", "timestamp": {"$gte": week_ago}}),
+    }
+    for name, fn in cases.items():
+        print(f"{name:>28}: {timed(fn):8.2f} ms")
+
+    collection.drop()
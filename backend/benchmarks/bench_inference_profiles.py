@@ -0,0 +1,85 @@
+"""
+Accuracy vs latency of the CPU inference profiles (default / int8 / onnx)
+on data/sample_articles.csv.
+
+For each profile, every article goes through the three classifiers and
+the same deduction rules as the graph (no Wikipedia, no Gemini). Articles
+scoring 40 or below count as predicted "false". Reports:
+- mean latency per article
+- accuracy against the labels
+- agreement with the default profile's top labels
+
+Run from the backend folder:
+    python -m benchmarks.bench_inference_profiles --profiles default int8 onnx
+"""
+import argparse
+import csv
+import time
+
+from agents.models import load_pipeline
+from agents.fallacy import FALLACY_LABELS, fallacy_node
+from agents.detector import detector_node
+from agents.analyzer import analyzer_node
+from agents.scoring import combine_signals
+
+
+def load_articles(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(f"{row['title']}. {row['body']}", row["label"].lower()) for row in csv.DictReader(f)]
+
+
+def classify(pipelines, text):
+    return {
+        "toxicity": pipelines["toxicity"](text),
+        "emotions": pipelines["emotion"](text)[0],
+        "fallacy": pipelines["fallacy"](text, candidate_labels=FALLACY_LABELS),
+    }
+
+
+def top_labels(outputs):
+    emotions = max(outputs["emotions"], key=lambda entry: entry["score"])["label"]
+    return (outputs["toxicity"][0]["label"], emotions, outputs["fallacy"]["labels"][0])
+
+
+def stylistic_score(text, outputs):
+    state = {"input_text": text, "model_outputs": outputs}
+    signals = {}
+    for node in (detector_node, analyzer_node, fallacy_node):
+        signals.update(node(state)["signals"])
+    return combine_signals(signals)[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--profiles", nargs="+", default=["default", "int8", "onnx"])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    articles = load_articles(args.corpus)
+    reference = None
+
+    print(f"{'profile':>8} {'ms/article':>11} {'accuracy':>9} {'agreement':>10}")
+    for profile in args.profiles:
+        try:
+            pipelines = {name: load_pipeline(name, profile) for name in ("toxicity", "emotion", "fallacy")}
+        except RuntimeError as e:
+            print(f"{profile:>8} skipped: {e}")
+            continue
+
+        classify(pipelines, articles[0][0])  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            outputs = [classify(pipelines, text) for text, _ in articles]
+        latency = (time.perf_counter() - start) / (args.repeats * len(articles))
+
+        correct = sum(
+            (stylistic_score(text, out) <= 40) == (label == "false")
+            for (text, label), out in zip(articles, outputs)
+        )
+        labels = [top_labels(out) for out in outputs]
+        if reference is None:
+            reference = labels
+        agreement = sum(a == b for ref, cur in zip(reference, labels) for a, b in zip(ref, cur)) / (3 * len(labels))
+
+        print(f"{profile:>8} {latency * 1000:>11.1f} {correct / len(articles):>9.2f} {agreement:>10.2f}")
@@ -0,0 +1,100 @@
+"""
+Local knowledge index (agents/local_kb.py): build time and query latency.
+
+Builds the index for --corpus into a temporary folder, BM25 only and (with
+--vectors) with MiniLM vectors, and reports documents/sec, encoding time
+and size on disk. Then times lookups for --queries claim sentences taken
+from the corpus texts:
+- bm25: lookup without a query vector
+- hybrid: BM25 candidates re-ranked by cosine (query embedding timed apart)
+With --live, the same queries also go to the live Wikipedia API, which
+reports its latency and how often both backends pick the same title.
+
+Run from the backend folder (a Wikipedia abstracts dump, or any JSONL/CSV corpus):
+    python -m benchmarks.bench_local_kb --corpus ../data/enwiki-latest-abstract.xml.gz --limit 500000 --vectors
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from agents.chunking import claim_sentences
+from agents.local_kb import LocalKnowledgeIndex, build_index, iter_corpus
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return f"p50 {pick(0.5):7.2f} ms  p95 {pick(0.95):7.2f} ms  p99 {pick(0.99):7.2f} ms"
+
+
+def timed_lookups(lookup, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(lookup(query))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def sample_queries(path, count, limit):
+    texts = []
+    for i, doc in enumerate(iter_corpus(path)):
+        if limit and i >= limit:
+            break
+        texts.append(doc["text"])
+    random.seed(0)
+    queries = []
+    for text in random.sample(texts, min(count, len(texts))):
+        queries.extend(claim_sentences(text, 1) or [text[:150]])
+    return queries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--limit", type=int, help="index only the first N documents")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vectors", action="store_true")
+    parser.add_argument("--live", action="store_true", help="also query the live Wikipedia API")
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="inocula-local-kb-")
+    try:
+        print(f"{'build':>8} {'docs':>9} {'docs/sec':>10} {'encode s':>9} {'MB':>8}")
+        for vectors in ([False, True] if args.vectors else [False]):
+            stats = build_index(args.corpus, out_dir, vectors=vectors, limit=args.limit)
+            name = "hybrid" if vectors else "bm25"
+            print(f"{name:>8} {stats['documents']:>9} {stats['docs_per_sec']:>10.0f} "
+                  f"{stats['encode_seconds']:>9.1f} {stats['bytes'] / 1e6:>8.1f}")
+
+        kb = LocalKnowledgeIndex(out_dir)
+        queries = sample_queries(args.corpus, args.queries, args.limit)
+        kb.lookup(queries[0])  # warm-up
+        bm25_results, latencies = timed_lookups(kb.lookup, queries)
+        found = sum(result is not None for result in bm25_results)
+        print(f"\nqueries: {len(queries)}, bm25 found a document for {found / len(queries):.1%}")
+        print(f"{'bm25':>8}: {percentiles(latencies)}")
+
+        if args.vectors:
+            from agents.memory import embed
+            embed_latencies, vectors = [], {}
+            for query in queries:
+                start = time.perf_counter()
+                vectors[query] = embed(query)
+                embed_latencies.append(time.perf_counter() - start)
+            hybrid_results, latencies = timed_lookups(lambda q: kb.lookup(q, vectors[q]), queries)
+            changed = sum((b or {}).get("title") != (h or {}).get("title") for b, h in zip(bm25_results, hybrid_results))
+            print(f"{'hybrid':>8}: {percentiles(latencies)} (top document changed for {changed / len(queries):.1%})")
+            print(f"{'embed':>8}: {percentiles(embed_latencies)} (once per query, shared with the verifier)")
+
+        if args.live:
+            from agents.wikipedia import WikipediaClient
+            client = WikipediaClient()
+            live_results, latencies = timed_lookups(client.lookup, queries)
+            same = sum((live or {}).get("title") == (bm25 or {}).get("title") for live, bm25 in zip(live_results, bm25_results))
+            print(f"{'live':>8}: {percentiles(latencies)} (same title as bm25 for {same / len(queries):.1%})")
+            client.close()
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
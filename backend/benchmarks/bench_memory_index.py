@@ -0,0 +1,55 @@
+"""
+Recall@1 and query latency of the approximate memory indexes (IVF, HNSW)
+against the exact flat index, on random unit vectors shaped like MiniLM
+embeddings. Queries are noisy copies of stored vectors, like paraphrases.
+
+Run from the backend folder:
+    python -m benchmarks.bench_memory_index --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from agents.memory import build_index, dimension
+
+
+def unit_vectors(rng, n):
+    vectors = rng.standard_normal((n, dimension)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def measure(index, queries):
+    start = time.perf_counter()
+    _, ids = index.search(queries, 1)
+    elapsed = time.perf_counter() - start
+    return ids[:, 0], elapsed / len(queries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>9} {'index':>6} {'build s':>9} {'recall@1':>9} {'ms/query':>9}")
+    for size in args.sizes:
+        vectors = unit_vectors(rng, size)
+        picks = rng.integers(0, size, args.queries)
+        queries = vectors[picks] + args.noise * unit_vectors(rng, args.queries)
+
+        truth = None
+        for kind in ["flat", "ivf", "hnsw"]:
+            start = time.perf_counter()
+            index = build_index(kind, vectors)
+            build = time.perf_counter() - start
+
+            ids, latency = measure(index, queries)
+            if truth is None:
+                truth = ids
+            recall = float(np.mean(ids == truth))
+            print(f"{size:>9} {kind:>6} {build:>9.2f} {recall:>9.3f} {latency * 1000:>9.3f}")
+            del index
@@ -0,0 +1,163 @@
+"""
+Known-claim prefilter (prefilter.py): builds the index in-process for a
+set of claims (synthetic by default, plus the originals of
+data/paraphrases.csv), then reports:
+- filter size: raw, gzipped and as sent by /prefilter (base64 JSON), and
+  the delta size per 100 added claims
+- false-positive rate of the client's local answers (exact keys in the
+  Bloom filter), of its near candidates (band-pair keys, sent on to the
+  server) and of the server check on unrelated texts
+- recall on exact repeats (case, punctuation and spacing changed) and on
+  near repeats (one word added, dropped or replaced)
+- fraction of server calls avoided on a replayed traffic log: a synthetic
+  mix by default, or --traffic (one text per line, or JSON lines with
+  "text")
+No Redis needed.
+
+Run from the backend folder:
+    python -m benchmarks.bench_prefilter --claims 10000
+"""
+import argparse
+import csv
+import gzip
+import json
+import random
+import time
+
+from prefilter import BloomFilter, PrefilterIndex, bloom_keys, claim_entry, claim_signature
+
+WORDS = [
+    "vaccine", "moon", "water", "government", "secret", "cure", "cancer", "election", "fraud", "climate",
+    "hoax", "scientists", "doctors", "hidden", "microchip", "signal", "tower", "virus", "bleach", "diet",
+    "miracle", "banned", "study", "proves", "causes", "children", "billionaire", "plan", "control", "weather",
+    "flat", "earth", "landing", "fake", "poison", "food", "company", "media", "silence", "truth",
+    "ancient", "energy", "free", "device", "tax", "money", "bank", "collapse", "army", "border",
+]
+
+
+def random_claim(rng, vocabulary):
+    return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+
+def exact_variant(rng, text):
+    # Same normalized text: case, punctuation and spacing changed
+    words = text.rstrip(".").split()
+    words = [word.upper() if rng.random() < 0.3 else word for word in words]
+    return "  ".join(words) + rng.choice(["!", "?!", " ...", ""])
+
+
+def near_variant(rng, text, vocabulary):
+    words = text.rstrip(".").split()
+    edit = rng.choice(["add", "drop", "replace"])
+    position = rng.randrange(len(words))
+    if edit == "add":
+        words.insert(position, rng.choice(vocabulary))
+    elif edit == "drop" and len(words) > 3:
+        del words[position]
+    else:
+        words[position] = rng.choice(vocabulary)
+    return " ".join(words) + "."
+
+
+def load_traffic(path):
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                texts.append(json.loads(line)["text"] if line.startswith("{") else line)
+    return texts
+
+
+def build_index(claims):
+    index = PrefilterIndex()
+    index._reset("bench", BloomFilter.for_capacity(len(claims)))
+    for text, label in claims:
+        index._apply(json.loads(claim_entry(text, label)))
+    index.version = len(claims)
+    return index
+
+
+def client_hit(bloom, text):
+    """
+    Whether the extension answers `text` itself: an exact-key hit.
+    """
+    return bloom_keys(claim_signature(text))[0] in bloom
+
+
+def client_candidate(bloom, text):
+    """
+    A band-pair hit: the extension still asks the server, which confirms it.
+    """
+    return any(key in bloom for key in bloom_keys(claim_signature(text))[1:])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--claims", type=int, default=10000)
+    parser.add_argument("--pairs", default="../data/paraphrases.csv")
+    parser.add_argument("--probes", type=int, default=20000)
+    parser.add_argument("--traffic", help="replay this log instead of the synthetic mix")
+    parser.add_argument("--repeat-share", type=float, default=0.2,
+                        help="share of known claims in the synthetic traffic")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Unrelated texts use their own words, so any hit on them is a false positive
+    other_words = [f"{word}x{i}" for i, word in enumerate(WORDS * 4)]
+    with open(args.pairs, newline="", encoding="utf-8") as f:
+        pairs = [(row["original"], row["variant"], row["same_claim"] == "1") for row in csv.DictReader(f)]
+    originals = sorted({original for original, _, _ in pairs})
+    claims = [(text, "known") for text in originals]
+    claims += [(random_claim(rng, WORDS), "synthetic") for _ in range(args.claims - len(claims))]
+
+    start = time.perf_counter()
+    index = build_index(claims)
+    build_s = time.perf_counter() - start
+    snapshot = index.snapshot()
+    raw = bytes(index.bloom.bits)
+    print(f"{len(claims)} claims indexed in {build_s:.2f}s (m={index.bloom.m} bits, k={index.bloom.k})")
+    print(f"filter size: raw {len(raw) / 1024:.0f} KB, gzip {len(gzip.compress(raw)) / 1024:.0f} KB, "
+          f"/prefilter JSON {len(json.dumps(snapshot)) / 1024:.0f} KB")
+    delta = [key for text, _ in claims[:100] for key in bloom_keys(claim_signature(text))]
+    print(f"delta per 100 claims: {len(delta)} keys, {len(json.dumps(delta)) / 1024:.1f} KB")
+
+    unrelated = [random_claim(rng, other_words) for _ in range(args.probes)]
+    client_fp = sum(client_hit(index.bloom, text) for text in unrelated) / len(unrelated)
+    candidate_fp = sum(client_candidate(index.bloom, text) for text in unrelated) / len(unrelated)
+    server_fp = sum(index.match(text) is not None for text in unrelated) / len(unrelated)
+    print(f"\nfalse positives on {len(unrelated)} unrelated texts: client answers {client_fp:.5f}, "
+          f"near candidates {candidate_fp:.5f}, server {server_fp:.5f}")
+
+    sample = rng.sample(claims, min(len(claims), args.probes))
+    for name, make in (("exact", lambda text: exact_variant(rng, text)),
+                       ("near", lambda text: near_variant(rng, text, WORDS))):
+        variants = [make(text) for text, _ in sample]
+        client = sum(client_hit(index.bloom, text) for text in variants) / len(variants)
+        server = sum(index.match(text) is not None for text in variants) / len(variants)
+        print(f"{name:>5} repeats: client recall {client:.3f}, server recall {server:.3f}")
+    paraphrases = [variant for _, variant, same in pairs if same]
+    different = [variant for _, variant, same in pairs if not same]
+    print(f"paraphrases.csv: {sum(client_hit(index.bloom, text) for text in paraphrases)}/{len(paraphrases)} "
+          f"paraphrases and {sum(client_hit(index.bloom, text) for text in different)}/{len(different)} "
+          f"different claims caught (rewordings are left to the semantic cache)")
+
+    if args.traffic:
+        traffic = load_traffic(args.traffic)
+    else:
+        traffic = []
+        for _ in range(args.probes):
+            if rng.random() < args.repeat_share:
+                text = rng.choice(claims)[0]
+                traffic.append(rng.choice([text, exact_variant(rng, text), near_variant(rng, text, WORDS)]))
+            else:
+                traffic.append(random_claim(rng, other_words))
+    start = time.perf_counter()
+    client = [client_hit(index.bloom, text) for text in traffic]
+    check_us = (time.perf_counter() - start) / len(traffic) * 1e6
+    server = [index.match(text) is not None for text in traffic]
+    print(f"\nreplayed {len(traffic)} requests{'' if args.traffic else ' (synthetic)'}:")
+    print(f"  answered in the extension (no server call): {sum(client) / len(traffic):.3f}")
+    print(f"  answered by the /analyze fast path (no task): {sum(server) / len(traffic):.3f}")
+    print(f"  client answers the server would not confirm: {sum(c and not s for c, s in zip(client, server))}")
+    print(f"  client check: {check_us:.0f} us/text (Python; the extension does the same work in JS)")
@@ -0,0 +1,100 @@
+"""
+Load test for the queue tiers: a bulk backlog is queued through
+/analyze/batch, then interactive /analyze requests arrive at a steady rate
+while it drains. Two runs:
+- tiered: interactive requests use priority="interactive"
+- shared: interactive requests use priority="bulk", i.e. they queue behind
+  the backlog like they did with a single queue
+
+Reports interactive p50/p95/max latency (submit to completed) and how long
+the backlog took to drain.
+
+Needs the API, Redis and one worker per queue, e.g. with the stubs:
+    uvicorn main:app
+    python -m benchmarks.bench_e2e --serve-worker -- -Q interactive -c 2 -n interactive@%h
+    python -m benchmarks.bench_e2e --serve-worker -- -Q bulk -c 2 -n bulk@%h
+    python -m benchmarks.bench_e2e --serve-worker -- -Q io -P threads -c 16 -n io@%h
+
+Run from the backend folder:
+    python -m benchmarks.bench_priority_queues --bulk 400 --interactive 40
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.bench_batching import load_corpus
+
+BATCH_CHUNK = 200  # BATCH_MAX_TEXTS default
+
+
+async def wait_for(http, task_id, poll_interval):
+    while True:
+        status = (await http.get(f"/status/{task_id}")).json()["status"]
+        if status in ("completed", "failed"):
+            return
+        await asyncio.sleep(poll_interval)
+
+
+async def interactive_client(http, text, priority, poll_interval):
+    start = time.perf_counter()
+    task_id = (await http.post("/analyze", json={"text": text, "priority": priority})).json()["task_id"]
+    await wait_for(http, task_id, poll_interval)
+    return time.perf_counter() - start
+
+
+async def drain(http, job_ids, poll_interval):
+    """
+    Seconds until every item of every batch job has finished.
+    """
+    start = time.perf_counter()
+    for job_id in job_ids:
+        offset = 0
+        while offset is not None:
+            page = (await http.get(f"/analyze/batch/{job_id}", params={"offset": offset, "limit": 200})).json()
+            if all(item["status"] in ("completed", "failed") for item in page["items"]):
+                offset = page["next_offset"]
+            else:
+                await asyncio.sleep(poll_interval)
+    return time.perf_counter() - start
+
+
+async def run_mode(base_url, name, backlog, interactive, interval, poll_interval):
+    priority = "interactive" if name == "tiered" else "bulk"
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        job_ids = []
+        for start in range(0, len(backlog), BATCH_CHUNK):
+            response = await http.post("/analyze/batch", json={"texts": backlog[start:start + BATCH_CHUNK], "priority": "bulk"})
+            job_ids.append(response.json()["job_id"])
+        drainer = asyncio.create_task(drain(http, job_ids, 1.0))
+
+        clients = []
+        for text in interactive:
+            clients.append(asyncio.create_task(interactive_client(http, text, priority, poll_interval)))
+            await asyncio.sleep(interval)
+        latencies = sorted(await asyncio.gather(*clients))
+        drained = await drainer
+
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+    return p(0.50), p(0.95), latencies[-1], drained
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--bulk", type=int, default=400)
+    parser.add_argument("--interactive", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between interactive requests")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, args.bulk + args.interactive)
+    print(f"{'mode':>7} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'backlog drained s':>18}")
+    for name in ("tiered", "shared"):
+        # Unique texts per run, so the result cache doesn't answer
+        run_texts = [f"{text} [{name} {i} {time.time()}]" for i, text in enumerate(texts)]
+        p50, p95, worst, drained = asyncio.run(run_mode(
+            args.base_url, name, run_texts[:args.bulk], run_texts[args.bulk:], args.interval, args.poll_interval))
+        print(f"{name:>7} {p50:>8.2f} {p95:>8.2f} {worst:>8.2f} {drained:>18.1f}")
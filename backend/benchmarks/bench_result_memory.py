@@ -0,0 +1,139 @@
+"""
+Redis memory held per 100k finished analyses, before and after the compact
+result schema. Each part of what a finished task leaves in Redis is
+written --results times with synthetic (but realistically sized) results,
+measured through INFO used_memory, and deleted again:
+- result: the Celery result (celery-task-meta-*). Before: full JSON kept
+  for result_expires. After: compact, and removed once persisted to Mongo
+  (--keep-results measures it as if it were kept).
+- cache: the result cache entry. Before: full JSON. After: compact.
+- events: the /stream event log (kept EVENT_TTL). Before: node updates
+  with the verifier's Wikipedia extracts. After: without them.
+
+Reports MB per 100k results for each part and in total.
+
+Run from the backend folder (needs Redis, plus msgpack for --serializer msgpack):
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_result_memory --results 5000
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timezone
+
+from kombu.serialization import dumps
+
+from agents.reasons import compact_result
+from events import node_event
+from redis_client import get_redis
+
+PREFIX = "inocula-bench-memory:"
+TITLES = ["Moon landing", "5G", "Measles vaccine", "Climate change", "Chemtrail conspiracy theory"]
+
+
+def synthetic_analysis(rng, i):
+    """
+    (payload, node events) of one finished analysis.
+    """
+    title = rng.choice(TITLES)
+    toxicity = rng.randint(0, 90)
+    emotions = rng.sample(["anger", "fear"], rng.randint(0, 2))
+    reasons = [f"Factual Context Found: Wikipedia ('{title}')"]
+    reasons.append(f"Toxicity detected (Level: {toxicity}%)" if toxicity > 50
+                   else "Initial scan: Content does not show immediate toxic patterns.")
+    reasons += [f"Emotional trigger: {label.upper()}" for label in emotions]
+    if rng.random() < 0.4:
+        reasons.append("Logical Flaw: Fear Mongering")
+    payload = {
+        "score": rng.randint(0, 100),
+        "reasons": reasons,
+        "explanation": "The text repeats a claim that established records contradict. " * 6,
+        "detected_emotions": emotions,
+        "skipped_steps": [],
+        "status": "complete",
+        "analysis_id": f"{i:024x}",
+    }
+    extract = f"Wikipedia summary for '{title}': " + "Background on the topic from the article. " * 25
+    events = [
+        ("started", {}),
+        ("memory", {"is_memory_hit": False, "memory_context": ""}),
+        ("verifier", {"signals": {"verifier": {"deduction": 0, "reasons": reasons[:1]}},
+                      "metadata": {"verification_summary": "\n".join([extract] * 3),
+                                   "verification_link": f"https://en.wikipedia.org/wiki/{title}"}}),
+        ("detector", {"signals": {"detector": {"deduction": toxicity, "reasons": reasons[1:2]}}}),
+        ("analyzer", {"detected_emotions": emotions, "signals": {"analyzer": {"deduction": 15, "reasons": reasons[2:]}}}),
+        ("fallacy", {"signals": {"fallacy": {"deduction": 0, "reasons": []}}}),
+        ("join", {"score": payload["score"], "reasons": reasons}),
+        ("explainer", {"explanation": payload["explanation"], "reasons": []}),
+    ]
+    return payload, events
+
+
+def celery_meta(task_id, result, serializer):
+    _, _, data = dumps({
+        "status": "SUCCESS", "result": result, "traceback": None, "children": [],
+        "date_done": datetime.now(timezone.utc).isoformat(), "task_id": task_id,
+    }, serializer=serializer)
+    return data
+
+
+def measure(redis, write, count):
+    """
+    Bytes of Redis memory added by write(pipe, i) for i in range(count).
+    """
+    before = redis.info("memory")["used_memory"]
+    pipe = redis.pipeline(transaction=False)
+    for i in range(count):
+        write(pipe, i)
+        if i % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+    used = redis.info("memory")["used_memory"] - before
+    keys = list(redis.scan_iter(PREFIX + "*", count=1000))
+    for start in range(0, len(keys), 1000):
+        redis.delete(*keys[start:start + 1000])
+    return max(0, used)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=5000)
+    parser.add_argument("--serializer", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--keep-results", action="store_true",
+                        help="measure the compact Celery result as if it were not removed after persisting")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    analyses = [synthetic_analysis(rng, i) for i in range(args.results)]
+    redis = get_redis()
+
+    def event_log(lean):
+        def write(pipe, i):
+            payload, events = analyses[i]
+            messages = [{"event": name, "data": node_event(data) if lean else data} for name, data in events]
+            messages.append({"event": "complete", "data": payload})
+            pipe.rpush(f"{PREFIX}events:{i}", *[json.dumps(message) for message in messages])
+        return write
+
+    parts = {
+        "result": (
+            lambda pipe, i: pipe.set(f"{PREFIX}meta:{i}", celery_meta(str(i), analyses[i][0], "json")),
+            (lambda pipe, i: pipe.set(f"{PREFIX}meta:{i}", celery_meta(
+                str(i), compact_result(analyses[i][0]), args.serializer))) if args.keep_results else None,
+        ),
+        "cache": (
+            lambda pipe, i: pipe.set(f"{PREFIX}cache:{i}", json.dumps({"task_id": str(i), "result": analyses[i][0]})),
+            lambda pipe, i: pipe.set(f"{PREFIX}cache:{i}", json.dumps(
+                {"task_id": str(i), "result": compact_result(analyses[i][0])})),
+        ),
+        "events": (event_log(lean=False), event_log(lean=True)),
+    }
+
+    scale = 100000 / args.results / 1024 / 1024
+    totals = [0.0, 0.0]
+    print(f"results: {args.results} (serializer after: {args.serializer})")
+    print(f"{'part':>8} {'before MB/100k':>15} {'after MB/100k':>14}")
+    for name, (before, after) in parts.items():
+        sizes = [measure(redis, write, args.results) * scale if write else 0.0 for write in (before, after)]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print(f"{name:>8} {sizes[0]:>15.1f} {sizes[1]:>14.1f}")
+    print(f"{'total':>8} {totals[0]:>15.1f} {totals[1]:>14.1f} ({1 - totals[1] / max(totals[0], 1e-9):.0%} less)")
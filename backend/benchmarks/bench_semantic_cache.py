@@ -0,0 +1,82 @@
+"""
+Semantic result cache on a paraphrase set (data/paraphrases.csv): each
+original is cached, then its variant is looked up. A variant with
+same_claim=1 should hit (reusing the verdict). One with same_claim=0
+should miss: a different claim on the same topic, or the negation.
+
+Reports, per threshold:
+- hit rate on paraphrases
+- false-hit rate on different claims
+Also reports embedding latency and lookup latency at several cache sizes.
+
+Run from the backend folder:
+    python -m benchmarks.bench_semantic_cache --thresholds 0.85 0.9 0.93 0.95
+"""
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from agents.memory import embed
+from semantic_cache import InMemorySemanticCache, VectorTable
+
+
+def load_pairs(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["original"], row["variant"], row["same_claim"] == "1") for row in csv.DictReader(f)]
+
+
+def hit_rates(pairs, vectors, threshold):
+    paraphrase_hits = different_hits = paraphrases = different = 0
+    for original, variant, same in pairs:
+        # One cache per pair, so only the intended original can match
+        cache = InMemorySemanticCache(max_entries=4, threshold=threshold)
+        cache.set(vectors[original], original, {"text": original})
+        hit = cache.get(vectors[variant], variant) is not None
+        if same:
+            paraphrases += 1
+            paraphrase_hits += hit
+        else:
+            different += 1
+            different_hits += hit
+    return paraphrase_hits / paraphrases, different_hits / different
+
+
+def lookup_ms(size, dim, repeats=200):
+    rng = np.random.default_rng(0)
+    table = VectorTable(size, ttl=3600)
+    vectors = rng.standard_normal((size, dim)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for vector in vectors:
+        table.add(vector, None)
+    start = time.perf_counter()
+    for i in range(repeats):
+        table.nearest(vectors[i % size])
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", default="../data/paraphrases.csv")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.85, 0.90, 0.93, 0.95, 0.97])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000, 100000])
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs)
+    texts = sorted({text for original, variant, _ in pairs for text in (original, variant)})
+    embed(texts[0])  # warm-up
+    start = time.perf_counter()
+    vectors = {text: embed(text) for text in texts}
+    embed_ms = (time.perf_counter() - start) / len(texts) * 1000
+
+    print(f"pairs: {len(pairs)} ({sum(same for *_, same in pairs)} paraphrases)")
+    print(f"{'threshold':>10} {'paraphrase hits':>16} {'false hits':>11}")
+    for threshold in args.thresholds:
+        hits, false_hits = hit_rates(pairs, vectors, threshold)
+        print(f"{threshold:>10.2f} {hits:>16.1%} {false_hits:>11.1%}")
+
+    print(f"\nembedding: {embed_ms:.2f} ms/text (computed once per request and reused)")
+    dim = len(next(iter(vectors.values())))
+    for size in args.sizes:
+        print(f"lookup with {size:>7} entries: {lookup_ms(size, dim):.3f} ms")
@@ -0,0 +1,137 @@
+"""
+/stats latency at scale: fills a scratch collection on a local mongod with
+synthetic analyses (spread over 90 days), builds the rollups with the
+backfill job, then compares for several ranges:
+- naive: one aggregation pipeline over the analyses in the range
+- rollups: reading the range's bucket documents and summing them
+Both compute the same summary (count, average score, bands, top reasons,
+emotions, memory hits); the benchmark checks the counts agree.
+
+Also times the writer's rollup updates (the cost added to each flush).
+
+Run from the backend folder (needs a local mongod):
+    python -m benchmarks.bench_stats --docs 1000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from agents.scoring import score_band
+from benchmarks.bench_history import timed
+from persistence import BufferedResultWriter
+from rollups import backfill, choose_granularity, get_rollup_collection, merge_buckets, rollup_query
+
+REASONS = [
+    "Toxicity detected (Level: 72%)",
+    "Initial scan: Content does not show immediate toxic patterns.",
+    "Emotional trigger: FEAR",
+    "Emotional trigger: ANGER",
+    "Logical Flaw: Fear Mongering",
+    "Logical Flaw: Extreme Exaggeration",
+    "Factual Context Found: Wikipedia ('Moon landing')",
+    "Historical Match: This claim matches a previously debunked narrative.",
+]
+
+
+def synthetic_doc(i, now):
+    score = random.randint(0, 100)
+    reasons = random.sample(REASONS, random.randint(1, 3))
+    emotions = [reason.rsplit(" ", 1)[-1].lower() for reason in reasons if reason.startswith("Emotional")]
+    return {
+        "_id": ObjectId(),
+        "task_id": f"bench-{i}",
+        "timestamp": now - timedelta(seconds=random.randint(0, 90 * 86400)),
+        "request_text": "synthetic",
+        "text_hash": f"{i:064x}",
+        "score_band": score_band(score),
+        "result": {"score": score, "reasons": reasons, "detected_emotions": emotions, "status": "complete"},
+        "status": "complete",
+    }
+
+
+def naive_summary(collection, since, until):
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": since, "$lt": until}}},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, "count": {"$sum": 1}, "average_score": {"$avg": "$result.score"}}}],
+            "bands": [{"$group": {"_id": "$score_band", "count": {"$sum": 1}}}],
+            "reasons": [{"$unwind": "$result.reasons"}, {"$group": {"_id": "$result.reasons", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1}}],
+            "emotions": [{"$unwind": "$result.detected_emotions"},
+                         {"$group": {"_id": "$result.detected_emotions", "count": {"$sum": 1}}}],
+        }},
+    ]
+    return list(collection.aggregate(pipeline, allowDiskUse=True))[0]
+
+
+def rollup_summary(rollups, since, until):
+    granularity = choose_granularity(since, until)
+    return merge_buckets(rollups.find(rollup_query(granularity, since, until), {"_id": 0}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo", default="mongodb://localhost:27017")
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    collection = MongoClient(args.mongo).inocula_bench.analyses
+    rollups = get_rollup_collection(collection)
+    collection.drop()
+    rollups.drop()
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    random.seed(0)
+    start = time.perf_counter()
+    batch = []
+    for i in range(args.docs):
+        batch.append(synthetic_doc(i, now))
+        if len(batch) == 10000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    collection.create_index([("timestamp", -1), ("_id", -1)])
+    print(f"wrote {args.docs} analyses in {time.perf_counter() - start:.1f}s")
+
+    # Live path: the writer's flush with and without rollup updates (before
+    # the backfill, which then rebuilds the buckets these touched)
+    for with_rollups in (False, True):
+        writer = BufferedResultWriter(collection_factory=lambda: collection, batch_size=1000, rollups=with_rollups)
+        docs = [synthetic_doc(args.docs + i, now) for i in range(20000)]
+        for doc in docs:
+            doc["timestamp"] = now
+        start = time.perf_counter()
+        for offset in range(0, len(docs), 1000):
+            for doc in docs[offset:offset + 1000]:
+                writer.write(doc)
+            writer.flush()
+        print(f"writer flush {'with' if with_rollups else 'without'} rollups: "
+              f"{len(docs) / (time.perf_counter() - start):.0f} analyses/sec")
+        collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+
+    start = time.perf_counter()
+    stats = backfill(collection, until=now + timedelta(days=1))
+    elapsed = time.perf_counter() - start
+    print(f"backfill: {stats['buckets']} buckets from {stats['analyses']} analyses "
+          f"in {elapsed:.1f}s ({stats['analyses'] / elapsed:.0f}/sec)")
+
+    print(f"\n{'range':>10} {'naive ms':>10} {'rollups ms':>11} {'count naive':>12} {'count rollups':>14}")
+    for days in (1, 7, 30, 90):
+        # Whole days, so both read exactly the same analyses
+        until = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        since = until - timedelta(days=days)
+        naive = naive_summary(collection, since, until)
+        rolled = rollup_summary(rollups, since.replace(tzinfo=timezone.utc), until.replace(tzinfo=timezone.utc))
+        naive_ms = timed(lambda: naive_summary(collection, since, until), repeats=3)
+        rollup_ms = timed(lambda: rollup_summary(
+            rollups, since.replace(tzinfo=timezone.utc), until.replace(tzinfo=timezone.utc)))
+        naive_count = naive["totals"][0]["count"] if naive["totals"] else 0
+        print(f"{days:>8}d {naive_ms:>10.1f} {rollup_ms:>11.2f} {naive_count:>12} {rolled['count']:>14}")
+
+    collection.drop()
+    rollups.drop()
@@ -0,0 +1,79 @@
+"""
+Load test: N clients wait for their analysis by polling /status every
+--poll-interval seconds vs by holding one /stream connection.
+
+Needs the API, a worker and a local Redis running, e.g.
+    REDIS_URL=redis://localhost:6379/0 uvicorn main:app
+    REDIS_URL=redis://localhost:6379/0 celery -A celery_worker worker
+
+Reports API requests and Redis commands per mode (from INFO stats), and
+time to the first partial result vs to the final result.
+
+Run from the backend folder:
+    python -m benchmarks.bench_stream_vs_poll --clients 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.bench_batching import load_corpus
+from redis_client import get_redis
+
+
+async def poll_client(http, text, interval, counters):
+    start = time.perf_counter()
+    task_id = (await http.post("/analyze", json={"text": text})).json()["task_id"]
+    counters["requests"] += 1
+    while True:
+        counters["requests"] += 1
+        status = (await http.get(f"/status/{task_id}")).json()["status"]
+        if status in ("completed", "failed"):
+            elapsed = time.perf_counter() - start
+            return elapsed, elapsed
+        await asyncio.sleep(interval)
+
+
+async def stream_client(http, text, interval, counters):
+    start = time.perf_counter()
+    task_id = (await http.post("/analyze", json={"text": text})).json()["task_id"]
+    counters["requests"] += 2
+    first_partial = None
+    async with http.stream("GET", f"/stream/{task_id}", timeout=None) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event:") and first_partial is None and "started" not in line:
+                first_partial = time.perf_counter() - start
+            if line in ("event: complete", "event: failed"):
+                break
+    return first_partial, time.perf_counter() - start
+
+
+async def run_mode(client_fn, base_url, texts, interval):
+    counters = {"requests": 0}
+    redis = get_redis()
+    commands_before = redis.info("stats")["total_commands_processed"]
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        timings = await asyncio.gather(*(client_fn(http, text, interval, counters) for text in texts))
+    commands = redis.info("stats")["total_commands_processed"] - commands_before
+    first = sorted(t[0] for t in timings)
+    final = sorted(t[1] for t in timings)
+    return counters["requests"], commands, first[len(first) // 2], final[len(final) // 2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # Make every text unique so the result cache doesn't answer for us
+    texts = [f"{text} (load test {i})" for i, text in enumerate(load_corpus(args.corpus, args.clients))]
+
+    print(f"{'mode':>7} {'API requests':>13} {'Redis cmds':>11} {'p50 first s':>12} {'p50 final s':>12}")
+    for name, client_fn in (("poll", poll_client), ("stream", stream_client)):
+        run_texts = [f"{text} [{name}]" for text in texts]
+        requests, commands, first, final = asyncio.run(run_mode(client_fn, args.base_url, run_texts, args.poll_interval))
+        print(f"{name:>7} {requests:>13} {commands:>11} {first:>12.2f} {final:>12.2f}")
@@ -0,0 +1,42 @@
+"""
+Exercises the Wikipedia client against the local stub server: a replayed
+query stream with repeats, from several threads, then prints cache hit
+rate, upstream latency and how many requests reached the "upstream".
+
+Run from the backend folder:
+    python -m benchmarks.bench_wikipedia_client --latency-ms 150
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.wikipedia import WikipediaClient
+from benchmarks.bench_batching import load_corpus
+from benchmarks.stubs import WikipediaStubServer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="../data/sample_articles.csv")
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, 8)
+    random.seed(0)
+    queries = [random.choice(texts)[:150] for _ in range(args.lookups)]
+
+    with WikipediaStubServer(latency=args.latency_ms / 1000) as stub:
+        client = WikipediaClient(api_url=stub.api_url, rest_url=stub.rest_url)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(client.lookup, queries))
+        elapsed = time.perf_counter() - start
+
+        print(f"lookups: {args.lookups} in {elapsed:.2f}s ({args.lookups / elapsed:.0f}/sec)")
+        print(f"upstream requests served by stub: {stub.requests}")
+        for name, value in client.stats.snapshot().items():
+            print(f"{name:>16}: {value:.3f}" if isinstance(value, float) else f"{name:>16}: {value}")
+        client.close()
@@ -0,0 +1,86 @@
+"""
+Deterministic local stand-ins for external services, for offline tests and
+benchmarks.
+
+WikipediaStubServer answers the two endpoints agents/wikipedia.py uses.
+Point the client at it with:
+    WikipediaClient(api_url=stub.api_url, rest_url=stub.rest_url)
+or the WIKIPEDIA_API_URL / WIKIPEDIA_REST_URL environment variables.
+
+For Gemini, use the gateway's stub backend (LLM_BACKEND=stub, or
+agents.llm.StubBackend).
+"""
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _WikipediaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.requests += 1
+        time.sleep(stub.latency)
+        parsed = urllib.parse.urlparse(self.path)
+
+        if parsed.path == "/w/api.php":
+            query = urllib.parse.parse_qs(parsed.query).get("srsearch", [""])[0]
+            # The first three words make a stable, query-dependent title
+            title = " ".join(query.split()[:3]).title() or "Empty"
+            self._send(200, {"query": {"search": [{"title": title}]}})
+        elif parsed.path.startswith("/api/rest_v1/page/summary/"):
+            title = urllib.parse.unquote(parsed.path.rsplit("/", 1)[-1])
+            self._send(200, {
+                "extract": f"{title} is a topic described by the local stub encyclopedia.",
+                "content_urls": {"desktop": {"page": f"https://en.wikipedia.org/wiki/{urllib.parse.quote(title)}"}},
+            })
+        else:
+            self._send(404, {})
+
+
+class WikipediaStubServer:
+    """
+    Runs in a background thread on a free localhost port. `latency` adds a
+    fixed delay per request to mimic the real round-trip.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _WikipediaHandler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/w/api.php"
+
+    @property
+    def rest_url(self):
+        return f"{self.base_url}/api/rest_v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
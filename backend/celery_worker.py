@@ -1,8 +1,24 @@
 import os
+import gc
 import ssl
+import time
+import asyncio
 import logging
+import threading
 from celery import Celery
+from kombu import Queue
+from celery.signals import (
+    celeryd_after_setup, task_postrun, worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+)
+from bson import ObjectId
 from dotenv import load_dotenv
+from result_cache import get_result_cache, text_hash
+from semantic_cache import get_semantic_cache
+from persistence import build_analysis_doc, get_result_writer
+from events import publish_event, node_event
+from admission import record_task
+from agents.metrics import QUEUE_WAIT_SECONDS, TASKS, record_cache
+from agents.reasons import compact_result, expand_result
 
 # Set up logging to see what's happening in the terminal
 logging.basicConfig(level=logging.INFO)
@@ -19,46 +35,416 @@ celery_app = Celery(
     backend=REDIS_URL
 )
 
+# Queues, so interactive scans never wait behind a bulk re-scan:
+# - interactive: single /analyze requests from the extension and dashboard
+# - bulk: /analyze/batch jobs and re-scans
+# - io_interactive / io_bulk: the Gemini stage of each (only with
+#   IO_STAGE=1), so CPU workers don't sit idle on the round-trip and bulk
+#   explanations never hold up interactive ones
+# - lite: degraded memory + toxicity scans admitted under load (admission.py)
+# Give each its own worker for per-queue concurrency, e.g.
+#   celery -A celery_worker worker -Q interactive,lite -c 2 -n interactive@%h
+#   celery -A celery_worker worker -Q bulk -c 2 -n bulk@%h
+#   celery -A celery_worker worker -Q io_interactive -P threads -c 32 -n io@%h
+#   celery -A celery_worker worker -Q io_bulk -P threads -c 16 -n io-bulk@%h
+# A worker started without -Q consumes all of them.
+QUEUE_INTERACTIVE = "interactive"
+QUEUE_BULK = "bulk"
+QUEUE_IO_INTERACTIVE = "io_interactive"
+QUEUE_IO_BULK = "io_bulk"
+QUEUE_LITE = "lite"
+IO_TIME_LIMIT = int(os.getenv("IO_TIME_LIMIT", "90"))
+QUEUE_TIME_LIMITS = {
+    QUEUE_INTERACTIVE: int(os.getenv("INTERACTIVE_TIME_LIMIT", "120")),
+    QUEUE_BULK: int(os.getenv("BULK_TIME_LIMIT", "600")),
+    QUEUE_IO_INTERACTIVE: IO_TIME_LIMIT,
+    QUEUE_IO_BULK: IO_TIME_LIMIT,
+    QUEUE_LITE: int(os.getenv("LITE_TIME_LIMIT", "30")),
+}
+# Where each queue's tasks hand their Gemini stage
+IO_QUEUES = {QUEUE_INTERACTIVE: QUEUE_IO_INTERACTIVE, QUEUE_BULK: QUEUE_IO_BULK}
+# Tasks reserved ahead per worker process. 1 keeps a busy worker from
+# hoarding tasks another idle worker could start.
+WORKER_PREFETCH_MULTIPLIER = int(os.getenv("WORKER_PREFETCH_MULTIPLIER", "1"))
+# Run the explainer as a follow-up task on the io queues. Opt-in: it needs
+# workers consuming io_interactive and io_bulk (see above)
+IO_STAGE = os.getenv("IO_STAGE", "0") == "1"
+
+# Task messages and results in Redis. "msgpack" (pip install msgpack) is
+# smaller and faster than JSON; both are always accepted, so workers and
+# API can be switched one at a time.
+CELERY_SERIALIZER = os.getenv("CELERY_SERIALIZER", "json")
+# Results are removed once persisted to Mongo (see forget_results); this
+# only bounds the ones that never get there, e.g. failures
+RESULT_EXPIRES = int(os.getenv("RESULT_EXPIRES", "3600"))
+# The STARTED state costs one more result write per task, but lets /status
+# answer "processing" for running tasks from Redis; without it they look
+# PENDING and every poll also looks them up in Mongo
+TRACK_STARTED = os.getenv("TRACK_STARTED", "1") == "1"
+# Remove finished results from Redis once Mongo has them; /status then
+# answers from Mongo
+FORGET_PERSISTED = os.getenv("FORGET_PERSISTED", "1") == "1"
+
 celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    task_serializer=CELERY_SERIALIZER,
+    accept_content=['json', 'msgpack'],
+    result_serializer=CELERY_SERIALIZER,
+    result_accept_content=['json', 'msgpack'],
+    result_expires=RESULT_EXPIRES,
     timezone='UTC',
     enable_utc=True,
-    task_track_started=True,
-    task_time_limit=600, # Increased to 10 mins for heavy model loads
+    task_track_started=TRACK_STARTED,
+    task_time_limit=600, # Fallback; queue_options() sets a limit per queue
+    task_queues=[Queue(QUEUE_INTERACTIVE), Queue(QUEUE_BULK), Queue(QUEUE_IO_INTERACTIVE), Queue(QUEUE_IO_BULK),
+                 Queue(QUEUE_LITE)],
+    task_default_queue=QUEUE_INTERACTIVE,
+    worker_prefetch_multiplier=WORKER_PREFETCH_MULTIPLIER,
+    # Ack after the task ran, so a task reserved by a worker that dies is redelivered
+    task_acks_late=True,
     broker_use_ssl={'ssl_cert_reqs': ssl.CERT_NONE},
     redis_backend_use_ssl={'ssl_cert_reqs': ssl.CERT_NONE}
 )
 
-# 2. Lazy Import to prevent worker from crashing during startup
-# We import the agent runner INSIDE the task
+def queue_options(queue: str) -> dict:
+    """
+    apply_async options that send a task to `queue` with that queue's time
+    limits. The soft limit fires first so the task can report the failure.
+    """
+    limit = QUEUE_TIME_LIMITS[queue]
+    return {"queue": queue, "time_limit": limit, "soft_time_limit": int(limit * 0.9)}
+
+# How a worker runs the graph:
+# - "prefork": synchronously, one analysis per pool process (default)
+# - "asyncio": the async graph on one event loop per worker process, so
+#   many analyses' Wikipedia and Gemini waits overlap while their model
+#   inference queues on INFERENCE_THREADS threads (agents/models.py). The
+#   Gemini stage then stays in the loop instead of going to an io queue.
+#   -c sets how many analyses are in flight:
+#     WORKER_EXECUTION=asyncio celery -A celery_worker worker -Q interactive,bulk -P threads -c 32 -n async@%h
+#   Also raise WIKIPEDIA_MAX_CONCURRENCY and LLM_MAX_CONCURRENCY, which
+#   are per process. Thread pools don't enforce the queue time limits;
+#   the Wikipedia and Gemini timeouts bound these tasks instead.
+WORKER_EXECUTION = os.getenv("WORKER_EXECUTION", "prefork")
+ASYNC_EXECUTION = WORKER_EXECUTION == "asyncio"
+
+# Publish each node's output over Redis pub/sub for the /stream endpoint
+STREAM_EVENTS = os.getenv("STREAM_EVENTS", "1") == "1"
+
+# 2. Optional preload: PRELOAD_MODELS=1 loads and warms every model in the
+# main worker process before it forks, so prefork children start ready and
+# share the weights copy-on-write instead of each loading their own copy.
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+# Torch intra-op threads per child (children share the machine's cores)
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "1"))
+# Port for the worker's Prometheus exporter (off when unset). With prefork
+# children, also set PROMETHEUS_MULTIPROC_DIR to a shared, empty folder.
+WORKER_METRICS_PORT = os.getenv("WORKER_METRICS_PORT")
+
+# Set once the worker is configured, before the pool forks; reported with
+# each task's duration so the API can estimate queue wait (admission.py)
+WORKER_NAME = None
+WORKER_SLOTS = None
+
+@celeryd_after_setup.connect
+def remember_worker(sender, instance, **kwargs):
+    global WORKER_NAME, WORKER_SLOTS
+    WORKER_NAME = sender
+    WORKER_SLOTS = instance.concurrency
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    if not WORKER_METRICS_PORT:
+        return
+    from prometheus_client import CollectorRegistry, REGISTRY, start_http_server
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(int(WORKER_METRICS_PORT), registry=registry)
+    logger.info(f"Worker metrics on :{WORKER_METRICS_PORT}/metrics")
+
+@worker_init.connect
+def preload_models(**kwargs):
+    if not PRELOAD_MODELS:
+        return
+    if not ASYNC_EXECUTION:
+        # Keep the parent single-threaded so no OpenMP/tokenizer thread pools
+        # exist at fork time (the asyncio worker doesn't fork, and gives
+        # torch every core)
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        import torch
+        torch.set_num_threads(1)
+
+    logger.info("Preloading and warming up models before accepting tasks...")
+    from agents.models import warm_up
+    warm_up()
+    # Seed an empty memory store once, in the parent, before the children
+    # fork (without PRELOAD_MODELS, each child does it; see seed_child_memory)
+    from agents.memory import seed_memory
+    seed_memory()
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the children don't touch (and un-share) those pages
+    gc.freeze()
+    logger.info("Models ready.")
+
+@worker_process_init.connect
+def configure_child(**kwargs):
+    if PRELOAD_MODELS:
+        import torch
+        torch.set_num_threads(WORKER_TORCH_THREADS)
+
+@worker_process_init.connect
+def seed_child_memory(**kwargs):
+    # The parent already seeded (and loaded) it when preloading; otherwise
+    # the children seed here, and store_lock lets only the first one add
+    if not PRELOAD_MODELS:
+        from agents.memory import seed_memory
+        seed_memory()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_results(**kwargs):
+    # Don't lose buffered analyses when a worker process exits
+    get_result_writer().flush()
+
+@worker_process_shutdown.connect
+def mark_metrics_dead(pid=None, **kwargs):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def run_async(coro):
+    """
+    Runs `coro` on this process's event loop (started on first use, in a
+    background thread) and blocks the calling task thread until it's done.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="inocula-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+def forget_results(task_ids):
+    """
+    Drops the Celery results of analyses Mongo now holds.
+    """
+    backend = celery_app.backend
+    backend.client.delete(*[backend.get_key_for_task(task_id) for task_id in task_ids])
+
+if FORGET_PERSISTED:
+    get_result_writer().on_persisted = forget_results
+
+@task_postrun.connect
+def settle_result(task_id=None, state=None, **kwargs):
+    # Sent after Celery has stored the task's result, so deleting it once
+    # Mongo has the analysis can't race the store. Replaced tasks (IO_STAGE)
+    # report IGNORED here; the replacement, under the same id, settles it.
+    if state == "SUCCESS":
+        get_result_writer().task_finished(task_id, stored=True)
+    elif state == "FAILURE":
+        get_result_writer().task_finished(task_id, stored=False)
+
+def analysis_details(result) -> dict:
+    """
+    The bulky context behind a verdict, stored in Mongo only and served by
+    /analysis/{analysis_id}/details.
+    """
+    metadata = result.get("metadata") or {}
+    details = {key: metadata[key] for key in ("verification_summary", "verification_link") if metadata.get(key)}
+    if result.get("memory_context"):
+        details["memory_context"] = result["memory_context"]
+    return details
+
+def finish_analysis(task_id, text, result, cache_key=None, trace=False, queue_wait=None,
+                    embedding=None, semantic_match=None, mode=None):
+    """
+    Turns the final graph state into the task result: persists it, caches
+    it (by text, and by `embedding` for near-duplicates) and publishes the
+    "complete" event. `semantic_match` marks a verdict reused from a
+    near-duplicate text, `mode="lite"` a degraded scan.
+    Everything kept in Redis (the returned task result and the caches) is
+    in the compact form of agents/reasons.py.
+    """
+    from agents.scoring import score_band
+
+    payload = {
+        "score": result.get("score", 0),
+        "reasons": result.get("reasons", []),
+        "explanation": result.get("explanation", ""),
+        "detected_emotions": result.get("detected_emotions", []),
+        "skipped_steps": result.get("skipped_steps", []),
+        "status": "complete",
+        # Known up front so /status and /chat can use it before the write lands
+        "analysis_id": str(ObjectId())
+    }
+    if semantic_match:
+        payload["semantic_match"] = semantic_match
+    if mode:
+        payload["mode"] = mode
+    # Persisted once, here, through the buffered bulk writer. Traced
+    # results stay in Redis, since Mongo doesn't keep the trace.
+    get_result_writer().write(build_analysis_doc(
+        task_id, text, text_hash(text), payload, score_band(payload["score"]), analysis_details(result)
+    ), settle=not trace)
+    compact = compact_result(payload)
+    if cache_key:
+        get_result_cache().set(cache_key, {"task_id": task_id, "result": compact})
+    if embedding is not None and not semantic_match:
+        try:
+            get_semantic_cache().set(embedding, text, {"task_id": task_id, "result": compact})
+        except Exception as e:
+            logger.warning(f"Semantic cache unavailable: {e}")
+    if trace:
+        # Only for this caller: kept out of Mongo and the result cache
+        trace_info = {
+            "nodes": result.get("trace", []),
+            "queue_wait_ms": round(queue_wait * 1000, 2) if queue_wait is not None else None,
+        }
+        payload = {**payload, "trace": trace_info}
+        compact = {**compact, "trace": trace_info}
+    if STREAM_EVENTS:
+        publish_event(task_id, "complete", payload)
+    TASKS.labels(status="complete").inc()
+    logger.info(f"Task {task_id} successfully completed.")
+    return compact
+
+def fail_analysis(task_id, error):
+    TASKS.labels(status="failed").inc()
+    logger.error(f"Task Failed! Error: {str(error)}")
+    if STREAM_EVENTS:
+        publish_event(task_id, "failed", {"error": str(error)})
+    return {"status": "failed", "error": str(error)}
+
+# 3. Lazy Import to prevent worker from crashing during startup
+# We import the agent runner INSIDE the task (a no-op when preloaded)
 @celery_app.task(name="analyze_misinformation_task", bind=True)
-def analyze_misinformation_task(self, text):
+def analyze_misinformation_task(self, text, cache_key=None, trace=False, enqueued_at=None):
     """
     Executes the agentic graph in the background.
+    When `cache_key` is given, a completed result is stored in the result
+    cache and the in-flight claim taken by /analyze is released.
+    With `trace`, the payload also carries per-node timings and queue wait.
+    With IO_STAGE, the Gemini stage continues on the io queue of the same
+    priority under the same task_id, so /status and /stream don't see the
+    hand-off.
+    With WORKER_EXECUTION=asyncio, the async graph runs on the process's
+    event loop, Gemini stage included.
     """
     logger.info(f"Task {self.request.id} started. Loading agents...")
-    
+    started = time.perf_counter()
+    queue = (self.request.delivery_info or {}).get("routing_key") or QUEUE_INTERACTIVE
+    queue_wait = None
+    if enqueued_at:
+        queue_wait = max(0.0, time.time() - enqueued_at)
+        QUEUE_WAIT_SECONDS.observe(queue_wait)
+
+    handoff = None
     try:
         # We import here so the worker starts instantly and then loads models
-        from agents.graph import run_inocula_agent
+        from agents.graph import arun_inocula_agent, run_inocula_agent
+        from agents.batching import BATCHING_ENABLED, arun_batched_agent, run_batched_agent
+        from agents.explainer import STAGE_KEYS
+        from agents.memory import embed
+        from agents.models import run_inference
         
         logger.info(f"Agents loaded. Running graph analysis on text: {text[:50]}...")
         
-        # Run the actual LangGraph logic
-        result = run_inocula_agent(text)
-        
-        logger.info(f"Task {self.request.id} successfully completed.")
-        
-        return {
-            "score": result.get("score", 0),
-            "reasons": result.get("reasons", []),
-            "explanation": result.get("explanation", ""),
-            "detected_emotions": result.get("detected_emotions", []),
-            "status": "complete"
-        }
+        task_id = self.request.id
+        on_event = None
+        if STREAM_EVENTS:
+            publish_event(task_id, "started", {})
+            on_event = lambda node_name, update: publish_event(task_id, node_name, node_event(update))
+
+        # Embedded once, for the semantic cache and every agent that needs it
+        if ASYNC_EXECUTION:
+            embedding = run_async(run_inference(embed, text))
+        else:
+            embedding = embed(text)
+        if not trace:
+            match = None
+            try:
+                match = get_semantic_cache().get(embedding, text)
+            except Exception as e:
+                logger.warning(f"Semantic cache unavailable: {e}")
+            record_cache("semantic", match is not None)
+            if match:
+                entry, similarity = match
+                semantic_match = {"task_id": entry["task_id"], "similarity": round(similarity, 4)}
+                return finish_analysis(task_id, text, expand_result(entry["result"]), cache_key,
+                                       semantic_match=semantic_match)
+
+        # Run the actual LangGraph logic (classifiers micro-batched if enabled)
+        explain = not IO_STAGE or ASYNC_EXECUTION
+        if ASYNC_EXECUTION:
+            # on_event publishes from the loop thread (one short Redis call)
+            runner = arun_batched_agent if BATCHING_ENABLED else arun_inocula_agent
+            result = run_async(runner(text, on_event=on_event, trace=trace, explain=explain, embedding=embedding))
+        elif BATCHING_ENABLED:
+            result = run_batched_agent(text, on_event=on_event, trace=trace, explain=explain, embedding=embedding)
+        else:
+            result = run_inocula_agent(text, on_event=on_event, trace=trace, explain=explain, embedding=embedding)
+
+        if explain:
+            return finish_analysis(task_id, text, result, cache_key, trace, queue_wait, embedding)
+        stage_state = {key: result[key] for key in STAGE_KEYS if key in result}
+        handoff = explain_analysis_task.si(
+            stage_state, cache_key=cache_key, trace=trace, queue_wait=queue_wait, embedding=embedding.tolist()
+        ).set(**queue_options(IO_QUEUES.get(queue, QUEUE_IO_INTERACTIVE)))
         
     except Exception as e:
-        logger.error(f"Task Failed! Error: {str(e)}")
-        return {"status": "failed", "error": str(e)}
\ No newline at end of file
+        return fail_analysis(self.request.id, e)
+    finally:
+        # After a hand-off the io task owns the claim
+        if cache_key and handoff is None:
+            get_result_cache().release(cache_key)
+        record_task(queue, time.perf_counter() - started, WORKER_NAME, WORKER_SLOTS)
+
+    # Outside the try: replace() raises Ignore, which has to reach Celery
+    return self.replace(handoff)
+
+@celery_app.task(name="explain_analysis_task", bind=True)
+def explain_analysis_task(self, state, cache_key=None, trace=False, queue_wait=None, embedding=None):
+    """
+    The Gemini stage of an analysis, run on an io queue. Only imports the
+    explainer, so io workers never load the classifiers.
+    """
+    try:
+        from agents.explainer import run_explainer_stage
+
+        on_event = None
+        if STREAM_EVENTS:
+            on_event = lambda node_name, update: publish_event(self.request.id, node_name, node_event(update))
+        result = run_explainer_stage(state, on_event=on_event)
+        return finish_analysis(self.request.id, state["input_text"], result, cache_key, trace, queue_wait, embedding)
+    except Exception as e:
+        return fail_analysis(self.request.id, e)
+    finally:
+        if cache_key:
+            get_result_cache().release(cache_key)
+
+@celery_app.task(name="analyze_lite_task", bind=True)
+def analyze_lite_task(self, text):
+    """
+    Degraded scan (memory lookup + toxicity) queued by admission control
+    when the full pipeline is backed up. Not cached, so a later request for
+    the same text gets the full analysis.
+    """
+    try:
+        from agents.graph import run_lite_agent
+
+        if STREAM_EVENTS:
+            publish_event(self.request.id, "started", {"mode": "lite"})
+        if ASYNC_EXECUTION:
+            # Queues with the other tasks' inference instead of competing for the cores
+            from agents.models import run_inference
+            result = run_async(run_inference(run_lite_agent, text))
+        else:
+            result = run_lite_agent(text)
+        return finish_analysis(self.request.id, text, result, mode="lite")
+    except Exception as e:
+        return fail_analysis(self.request.id, e)
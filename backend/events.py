@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+
+from redis_client import REDIS_URL, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Each task gets a pub/sub channel for live subscribers plus a short-lived
+# list holding every event so far, so late subscribers can replay them.
+EVENT_TTL = 3600
+TERMINAL_EVENTS = ("complete", "failed")
+# Node output kept out of the event log: the Wikipedia extracts are stored
+# with the analysis in Mongo (/analysis/{analysis_id}/details)
+DETAIL_KEYS = ("metadata",)
+
+
+def channel_name(task_id: str) -> str:
+    return f"inocula:events:{task_id}"
+
+
+def log_name(task_id: str) -> str:
+    return f"inocula:events:{task_id}:log"
+
+
+def node_event(update: dict) -> dict:
+    """
+    A node's update as published, without its detail blob.
+    """
+    return {key: value for key, value in update.items() if key not in DETAIL_KEYS}
+
+
+def publish_event(task_id: str, event: str, data: dict):
+    """
+    Worker side: records one node's output and pushes it to live subscribers.
+    Never raises; streaming is best-effort and must not fail the analysis.
+    """
+    try:
+        redis = get_redis()
+        message = {"event": event, "data": data}
+        seq = redis.rpush(log_name(task_id), json.dumps(message, default=str))
+        redis.expire(log_name(task_id), EVENT_TTL)
+        message["seq"] = seq
+        redis.publish(channel_name(task_id), json.dumps(message, default=str))
+    except Exception as e:
+        logger.warning(f"Could not publish '{event}' for task {task_id}: {e}")
+
+
+_async_client = None
+
+def get_async_redis():
+    global _async_client
+    if _async_client is None:
+        import redis.asyncio
+
+        options = {"decode_responses": True}
+        if REDIS_URL and REDIS_URL.startswith("rediss://"):
+            options["ssl_cert_reqs"] = None
+        _async_client = redis.asyncio.Redis.from_url(REDIS_URL, **options)
+    return _async_client
+
+
+async def stream_events(task_id: str, timeout: float = 600, keepalive: float = 15):
+    """
+    API side: yields every event of a task in order, starting from the
+    first one, until a terminal event arrives or `timeout` expires.
+    Yields None every `keepalive` seconds of silence.
+    """
+    redis = get_async_redis()
+    pubsub = redis.pubsub()
+    # Subscribe before reading the log so nothing falls in between
+    await pubsub.subscribe(channel_name(task_id))
+    try:
+        last_seq = 0
+        for seq, raw in enumerate(await redis.lrange(log_name(task_id), 0, -1), start=1):
+            message = json.loads(raw)
+            message["seq"] = seq
+            last_seq = seq
+            yield message
+            if message["event"] in TERMINAL_EVENTS:
+                return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        quiet_since = loop.time()
+        while loop.time() < deadline:
+            raw = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if raw is None:
+                if loop.time() - quiet_since >= keepalive:
+                    quiet_since = loop.time()
+                    yield None
+                continue
+            message = json.loads(raw["data"])
+            if message["seq"] <= last_seq:
+                continue
+            last_seq = message["seq"]
+            quiet_since = loop.time()
+            yield message
+            if message["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        await pubsub.unsubscribe(channel_name(task_id))
+        await pubsub.aclose()
+
+
+async def stream_terminal_events(task_ids, timeout: float = 600, keepalive: float = 15):
+    """
+    Yields (task_id, message) once per task when it completes or fails, in
+    completion order, over a single pub/sub connection. Yields
+    (None, None) every `keepalive` seconds of silence.
+    """
+    redis = get_async_redis()
+    pending = set(task_ids)
+    channels = {channel_name(task_id): task_id for task_id in pending}
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(*channels)
+    try:
+        # Tasks that finished before we subscribed
+        for task_id in list(pending):
+            raw = await redis.lindex(log_name(task_id), -1)
+            message = json.loads(raw) if raw else None
+            if message and message["event"] in TERMINAL_EVENTS:
+                pending.discard(task_id)
+                yield task_id, message
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        quiet_since = loop.time()
+        while pending and loop.time() < deadline:
+            raw = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if raw is None:
+                if loop.time() - quiet_since >= keepalive:
+                    quiet_since = loop.time()
+                    yield None, None
+                continue
+            message = json.loads(raw["data"])
+            task_id = channels.get(raw["channel"])
+            if message["event"] in TERMINAL_EVENTS and task_id in pending:
+                pending.discard(task_id)
+                quiet_since = loop.time()
+                yield task_id, message
+    finally:
+        await pubsub.unsubscribe(*channels)
+        await pubsub.aclose()
@@ -1,22 +1,46 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi.responses import Response, StreamingResponse
 from celery.result import AsyncResult
-from datetime import datetime
+from celery import group
+from celery.utils import uuid
+from datetime import datetime, timedelta, timezone
 import motor.motor_asyncio
 from os import getenv
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from bson import ObjectId
 import logging
 
 # 1. Import the Celery app and task from your worker file
-from celery_worker import celery_app, analyze_misinformation_task
+from celery_worker import (
+    celery_app, analyze_misinformation_task, analyze_lite_task, queue_options,
+    QUEUE_INTERACTIVE, QUEUE_BULK, QUEUE_LITE
+)
 from agents.chat import run_chat_followup
+from result_cache import cache_key, get_result_cache
+from events import stream_events, stream_terminal_events
+from batch_jobs import save_job, load_job
+from persistence import ANALYSIS_INDEXES
+from rollups import (
+    ROLLUP_COLLECTION, ROLLUP_INDEXES, bucket_point, choose_granularity, merge_buckets, rollup_query
+)
+from agents.scoring import SCORE_BANDS
+from agents.metrics import ADMISSIONS, record_cache
+from agents.reasons import expand_result
+from admission import admit, allow_client
+from prefilter import check_known_claim, delta_keys, get_prefilter_index, known_claim_result
+from pymongo import IndexModel
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import json
+import time
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+BATCH_MAX_TEXTS = int(getenv("BATCH_MAX_TEXTS", "200"))
+
 app = FastAPI(title="Project Inocula - Async API")
 
 # Enable CORS for Extension and Dashboards
@@ -26,16 +50,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the extension read the 429 back-off hint and the prefilter version
+    expose_headers=["Retry-After", "ETag"],
 )
 
 # --- DATABASE SETUP ---
 client = motor.motor_asyncio.AsyncIOMotorClient(getenv("MONGO_CONNECTION_STRING"))
 db = client.project_inocula
 analysis_collection = db.get_collection("analyses")
+rollup_collection = db.get_collection(ROLLUP_COLLECTION)
+
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        await analysis_collection.create_indexes([IndexModel(keys, **options) for keys, options in ANALYSIS_INDEXES])
+        await rollup_collection.create_indexes([IndexModel(keys, **options) for keys, options in ROLLUP_INDEXES])
+    except Exception as e:
+        # e.g. duplicate task_ids left by older versions block the unique index
+        logger.warning(f"Could not create analysis indexes: {e}")
 
 # --- MODELS ---
 class AnalysisRequest(BaseModel):
     text: str
+    # Return per-node timings with the result (skips the result cache)
+    trace: bool = False
+    # Queue to run on; "bulk" for background re-scans
+    priority: Literal["interactive", "bulk"] = QUEUE_INTERACTIVE
+
+class BatchAnalysisRequest(BaseModel):
+    texts: List[str]
+    priority: Literal["interactive", "bulk"] = QUEUE_BULK
 
 class ChatRequest(BaseModel):
     analysis_id: str
@@ -43,46 +87,281 @@ class ChatRequest(BaseModel):
 
 # --- ENDPOINTS ---
 
+def prepare_analysis(text: str, key: str = None, trace: bool = False, queue: str = QUEUE_INTERACTIVE):
+    """
+    Decides how a text gets its result. Returns (response, signature):
+    cached and already-running texts get a response and no signature;
+    new texts get a claimed task_id and the Celery signature (routed to
+    `queue`) to send. Traced requests always run, so their timings are real.
+    Exact and near-exact repeats of known debunked claims are answered by
+    the prefilter, without a task.
+    """
+    if not trace:
+        known = check_known_claim(text)
+        record_cache("prefilter", known is not None)
+        if known:
+            return {"task_id": None, "status": "completed", "result": known_claim_result(known), "prefilter": True}, None
+
+    if trace:
+        task_id = uuid()
+        signature = analyze_misinformation_task.signature(
+            args=[text], kwargs={"trace": True, "enqueued_at": time.time()}, task_id=task_id, **queue_options(queue))
+        return {"task_id": task_id, "status": "processing"}, signature
+
+    result_cache = get_result_cache()
+    key = key or cache_key(text)
+    try:
+        cached = result_cache.get(key)
+        record_cache("result", bool(cached))
+        if cached:
+            return {"task_id": cached["task_id"], "status": "completed", "result": expand_result(cached["result"]),
+                    "cached": True}, None
+
+        task_id = uuid()
+        owner = result_cache.claim(key, task_id)
+        if owner:
+            return {"task_id": owner, "status": "processing", "deduplicated": True}, None
+    except Exception as e:
+        # The cache is an optimization; never fail a scan because of it
+        logger.warning(f"Result cache unavailable: {e}")
+        task_id = uuid()
+
+    signature = analyze_misinformation_task.signature(
+        args=[text], kwargs={"cache_key": key, "enqueued_at": time.time()}, task_id=task_id, **queue_options(queue))
+    return {"task_id": task_id, "status": "processing"}, signature
+
+def release_claims(signatures):
+    for signature in signatures:
+        if not signature.kwargs.get("cache_key"):
+            continue
+        try:
+            get_result_cache().release(signature.kwargs["cache_key"])
+        except Exception:
+            pass
+
+def client_id(http_request: Request) -> str:
+    # The extension sends a per-install ID; fall back to the caller's address
+    return http_request.headers.get("X-Client-Id") or (http_request.client.host if http_request.client else "unknown")
+
+def too_many_requests(detail: str, retry_after: int):
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+
+def check_admission(http_request: Request, queue: str, signatures, degradable: bool = False, batch: bool = False):
+    """
+    Rate-limits the client and checks the queue's estimated wait before
+    anything is queued. Raises a 429 (releasing the signatures' claims)
+    or returns the admission decision ("accept" or "degrade"). Batches
+    are charged one token per queued text.
+    """
+    allowed, retry_after = allow_client(client_id(http_request), cost=len(signatures), batch=batch)
+    if not allowed:
+        ADMISSIONS.labels(queue=queue, decision="rate_limited").inc()
+        release_claims(signatures)
+        raise too_many_requests("Too many analyses from this client, slow down.", retry_after)
+
+    decision, wait, retry_after = admit(queue)
+    if decision == "degrade" and not degradable:
+        decision, retry_after = "reject", max(1, int(wait))
+    ADMISSIONS.labels(queue=queue, decision=decision).inc()
+    if decision == "reject":
+        release_claims(signatures)
+        raise too_many_requests("The analysis queue is full, try again later.", retry_after)
+    return decision
+
 @app.post("/analyze")
-async def analyze_text(request: AnalysisRequest):
+async def analyze_text(request: AnalysisRequest, http_request: Request):
     """
     Step 1: Start the Async Task.
     This sends the text to Redis and returns a task_id immediately.
+    Texts that were already analyzed are answered from the result cache,
+    and identical texts submitted while one is running share its task_id.
+    New work is rate-limited per client; when the queue is backed up the
+    text gets a quick memory + toxicity scan instead ("mode": "lite"), or
+    a 429 with Retry-After once even that would be too slow.
     """
+    response, signature = prepare_analysis(request.text, trace=request.trace, queue=request.priority)
+    if signature is None:
+        return response
+
+    if check_admission(http_request, request.priority, [signature], degradable=True) == "degrade":
+        # The claim is dropped: lite results are not cached, so the next
+        # request for this text can get the full analysis
+        release_claims([signature])
+        signature = analyze_lite_task.signature(
+            args=[request.text], task_id=response["task_id"], **queue_options(QUEUE_LITE))
+        response = {**response, "mode": "lite"}
+
     try:
-        # Trigger the Celery task (.delay() is what makes it async)
-        task = analyze_misinformation_task.delay(request.text)
-        return {"task_id": task.id, "status": "processing"}
+        # Trigger the Celery task (apply_async is what makes it async)
+        signature.apply_async()
+        return response
     except Exception as e:
         logger.error(f"Failed to queue task: {e}")
+        release_claims([signature])
         raise HTTPException(status_code=500, detail="Could not queue the AI analysis task.")
 
-@app.get("/status/{task_id}")
-async def get_task_status(task_id: str):
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest, http_request: Request):
+    """
+    Scans many texts (e.g. every post in a feed) with one request.
+    Duplicate texts in the batch share one analysis, and new texts are
+    queued together as a Celery group, on the bulk queue unless
+    priority="interactive". Returns a job_id for the
+    /analyze/batch/{job_id} endpoints.
+    """
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="No texts to analyze.")
+    if len(request.texts) > BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TEXTS} texts per batch.")
+
+    responses = {}
+    signatures = []
+    items = []
+    for index, text in enumerate(request.texts):
+        key = cache_key(text)
+        if key not in responses:
+            responses[key], signature = prepare_analysis(text, key, queue=request.priority)
+            if signature is not None:
+                signatures.append(signature)
+        response = responses[key]
+        items.append({"index": index, "task_id": response["task_id"], "result": response.get("result")})
+
+    if signatures:
+        # Batches are not degraded: bulk scans can wait, or come back later
+        check_admission(http_request, request.priority, signatures, batch=True)
+        try:
+            group(signatures).apply_async()
+        except Exception as e:
+            logger.error(f"Failed to queue batch: {e}")
+            release_claims(signatures)
+            raise HTTPException(status_code=500, detail="Could not queue the AI analysis tasks.")
+
+    job_id = uuid()
+    save_job({"job_id": job_id, "created": datetime.now().isoformat(), "items": items})
+    return {
+        "job_id": job_id,
+        "status": "processing",
+        "total": len(items),
+        "unique": len(responses),
+        "queued": len(signatures),
+    }
+
+def get_job_or_404(job_id: str):
+    job = load_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found or expired.")
+    return job
+
+async def item_status(item: dict):
+    if item.get("result"):
+        status = {"status": "completed", "result": item["result"]}
+    else:
+        status = await task_status(item["task_id"])
+    return {"index": item["index"], "task_id": item["task_id"], **status}
+
+@app.get("/analyze/batch/{job_id}")
+async def get_batch_status(job_id: str, offset: int = 0, limit: int = 50):
+    """
+    One page of a batch job's items with their current status/result.
+    """
+    job = get_job_or_404(job_id)
+    limit = max(1, min(limit, 200))
+    page = job["items"][offset:offset + limit]
+    items = [await item_status(item) for item in page]
+    next_offset = offset + limit if offset + limit < len(job["items"]) else None
+    return {
+        "job_id": job_id,
+        "total": len(job["items"]),
+        "offset": offset,
+        "next_offset": next_offset,
+        "items": items,
+    }
+
+@app.get("/analyze/batch/{job_id}/items/{index}")
+async def get_batch_item(job_id: str, index: int):
+    job = get_job_or_404(job_id)
+    if not 0 <= index < len(job["items"]):
+        raise HTTPException(status_code=404, detail="No such item in this batch.")
+    return await item_status(job["items"][index])
+
+@app.get("/analyze/batch/{job_id}/stream")
+async def stream_batch(job_id: str):
+    """
+    Server-Sent Events: one 'item' event per text as its analysis finishes
+    (cached items first), then 'done'.
+    """
+    job = get_job_or_404(job_id)
+
+    async def event_source():
+        waiting = {}
+        for item in job["items"]:
+            if item.get("result"):
+                yield sse("item", await item_status(item))
+            else:
+                waiting.setdefault(item["task_id"], []).append(item["index"])
+
+        # Tasks whose event log already expired but whose result is stored
+        stored = await stored_results(list(waiting))
+        for task_id in list(waiting):
+            if task_id in stored:
+                status = {"status": "completed", "result": stored[task_id]}
+            elif AsyncResult(task_id, app=celery_app).state in ('SUCCESS', 'FAILURE'):
+                status = await task_status(task_id)
+            else:
+                continue
+            for index in waiting.pop(task_id):
+                yield sse("item", {"index": index, "task_id": task_id, **status})
+
+        if waiting:
+            async for task_id, message in stream_terminal_events(list(waiting)):
+                if task_id is None:
+                    yield ": keepalive\n\n"
+                    continue
+                if message["event"] == "complete":
+                    status = {"status": "completed", "result": message["data"]}
+                else:
+                    status = {"status": "failed", "error": message["data"].get("error")}
+                for index in waiting.pop(task_id):
+                    yield sse("item", {"index": index, "task_id": task_id, **status})
+
+        yield sse("done", {"job_id": job_id, "total": len(job["items"])})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stored_results(task_ids) -> dict:
+    """
+    {task_id: result} for the given tasks that are already persisted.
+    Workers remove results from Redis once Mongo has them.
+    """
+    if not task_ids:
+        return {}
+    try:
+        docs = await analysis_collection.find(
+            {"task_id": {"$in": task_ids}}, {"task_id": 1, "result": 1}).to_list(length=len(task_ids))
+    except Exception as e:
+        logger.warning(f"Stored result lookup failed: {e}")
+        return {}
+    return {doc["task_id"]: doc["result"] for doc in docs}
+
+async def task_status(task_id: str):
     task_result = AsyncResult(task_id, app=celery_app)
     
     if task_result.state == 'PENDING':
+        # Unknown to Redis: still queued, or finished and moved to Mongo.
+        # Running tasks are STARTED (task_track_started), so they skip this
+        stored = await stored_results([task_id])
+        if task_id in stored:
+            return {"status": "completed", "result": stored[task_id]}
         return {"status": "pending"}
     elif task_result.state == 'STARTED':
         return {"status": "processing"}
     elif task_result.state == 'SUCCESS':
-        result_data = task_result.result
-        
-        # Ensure we don't save duplicates
-        existing = await analysis_collection.find_one({"task_id": task_id})
-        
-        if not existing:
-            doc = {
-                "task_id": task_id,
-                "timestamp": datetime.now(),
-                "request_text": "Remote Scan Result", # You can pass text in the task result if needed
-                "result": result_data,
-                "status": "complete"
-            }
-            inserted = await analysis_collection.insert_one(doc)
-            result_data["analysis_id"] = str(inserted.inserted_id)
-
-        return {"status": "completed", "result": result_data}
+        # Already persisted by the worker; analysis_id is in the result
+        return {"status": "completed", "result": expand_result(task_result.result)}
     
     # Handle failures
     elif task_result.state == 'FAILURE':
@@ -90,6 +369,95 @@ async def get_task_status(task_id: str):
     
     return {"status": task_result.state}
 
+@app.get("/status/{task_id}")
+async def get_task_status(task_id: str):
+    return await task_status(task_id)
+
+def sse(event: str, data, event_id=None) -> str:
+    """
+    Formats one Server-Sent Events message.
+    """
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/stream/{task_id}")
+async def stream_task(task_id: str):
+    """
+    Server-Sent Events alternative to polling /status: pushes each agent's
+    output as soon as it finishes (memory, verifier, detector, analyzer,
+    fallacy, join, explainer), then a final 'complete' or 'failed' event.
+    """
+    async def event_source():
+        # Results served from the cache have no live events; answer at once
+        task_result = AsyncResult(task_id, app=celery_app)
+        if task_result.state == 'SUCCESS':
+            yield sse("complete", expand_result(task_result.result))
+            return
+        if task_result.state == 'PENDING':
+            stored = await stored_results([task_id])
+            if task_id in stored:
+                yield sse("complete", stored[task_id])
+                return
+
+        async for message in stream_events(task_id):
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            yield sse(message["event"], message["data"], message["seq"])
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/analysis/{analysis_id}/details")
+async def get_analysis_details(analysis_id: str):
+    """
+    The context behind a verdict that /status leaves out: the Wikipedia
+    extracts and link the verifier found, and the matched known claim.
+    Available once the worker has persisted the analysis.
+    """
+    try:
+        object_id = ObjectId(analysis_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid analysis_id.")
+    doc = await analysis_collection.find_one({"_id": object_id}, {"details": 1})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Analysis not found (or not persisted yet).")
+    return {"analysis_id": analysis_id, "details": doc.get("details", {})}
+
+@app.get("/prefilter")
+def get_prefilter(http_request: Request):
+    """
+    The known-claim Bloom filter for the extension (see prefilter.py for
+    how to compute the keys). The ETag is "<epoch>:<version>"; afterwards,
+    /prefilter/delta brings a copy up to date.
+    """
+    index = get_prefilter_index()
+    try:
+        index.refresh()
+    except Exception as e:
+        logger.warning(f"Prefilter refresh failed: {e}")
+    if index.epoch is None:
+        raise HTTPException(status_code=404, detail="No prefilter has been published.")
+    etag = f'"{index.epoch}:{index.version}"'
+    if http_request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(json.dumps(index.snapshot()), media_type="application/json", headers={"ETag": etag})
+
+@app.get("/prefilter/delta")
+def get_prefilter_delta(epoch: str, since: int):
+    """
+    The Bloom keys added after version `since`. 410 when `epoch` is no
+    longer current: the filter was rebuilt, fetch /prefilter again.
+    """
+    delta = delta_keys(epoch, max(0, since))
+    if delta is None:
+        raise HTTPException(status_code=410, detail="Prefilter was rebuilt; fetch /prefilter.")
+    version, keys = delta
+    return {"epoch": epoch, "version": version, "keys": keys}
+
 @app.post("/chat")
 async def chat_with_analysis(request: ChatRequest):
     """
@@ -105,19 +473,107 @@ async def chat_with_analysis(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def encode_cursor(doc: dict) -> str:
+    return f"{doc['timestamp'].isoformat()}_{doc['_id']}"
+
+def decode_cursor(cursor: str):
+    timestamp, _, object_id = cursor.rpartition("_")
+    return datetime.fromisoformat(timestamp), ObjectId(object_id)
+
 @app.get("/history")
-async def get_history():
+async def get_history(limit: int = 20, cursor: Optional[str] = None, band: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None):
     """
-    Returns the most recent analyses.
+    Returns analyses, newest first, one page at a time. Pass next_cursor
+    back as `cursor` to get the following page. Optional filters: score
+    band (red / orange / green) and a [since, until) timestamp range.
     """
+    query = {}
+    if band:
+        if band not in SCORE_BANDS:
+            raise HTTPException(status_code=400, detail=f"band must be one of {', '.join(SCORE_BANDS)}.")
+        query["score_band"] = band
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    if cursor:
+        try:
+            timestamp, object_id = decode_cursor(cursor)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        # Keyset pagination on the (timestamp, _id) index: no skip() scans
+        after = {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": object_id}},
+        ]}
+        query = {"$and": [query, after]} if query else after
+
+    limit = max(1, min(limit, 100))
     try:
-        cursor = analysis_collection.find().sort("timestamp", -1).limit(20)
-        history = await cursor.to_list(length=20)
-        for item in history:
-            item["_id"] = str(item["_id"])
-        return history
+        docs = await analysis_collection.find(query, {"details": 0}).sort([("timestamp", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
     except Exception as e:
-        return []
+        logger.error(f"History query failed: {e}")
+        return {"items": [], "next_cursor": None}
+
+    next_cursor = encode_cursor(docs[-1]) if len(docs) == limit else None
+    for item in docs:
+        item["_id"] = str(item["_id"])
+    return {"items": docs, "next_cursor": next_cursor}
+
+# Longest range served with hour buckets by /stats/timeseries
+STATS_MAX_HOURLY_DAYS = 31
+
+def stats_range(since: Optional[datetime], until: Optional[datetime]):
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=7)
+    # Naive datetimes are taken as UTC, like the stored timestamps
+    until = until if until.tzinfo else until.replace(tzinfo=timezone.utc)
+    since = since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until.")
+    return since, until
+
+async def load_buckets(granularity: str, since: datetime, until: datetime):
+    cursor = rollup_collection.find(rollup_query(granularity, since, until), {"_id": 0}).sort("bucket", 1)
+    return await cursor.to_list(length=None)
+
+@app.get("/stats/summary")
+async def get_stats_summary(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """
+    Totals over [since, until) (default: the last 7 days): score average,
+    bands and histogram, top reasons, emotion counts and memory-hit rate.
+    Served from the rollups (rollups.py), so the range is widened to whole
+    hours, or whole days beyond a week.
+    """
+    since, until = stats_range(since, until)
+    granularity = choose_granularity(since, until)
+    buckets = await load_buckets(granularity, since, until)
+    return {"since": since, "until": until, "granularity": granularity, **merge_buckets(buckets)}
+
+@app.get("/stats/timeseries")
+async def get_stats_timeseries(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                               granularity: Optional[Literal["hour", "day"]] = None):
+    """
+    One point per hour or day bucket in [since, until) that has analyses:
+    count, average score, bands and memory hits.
+    """
+    since, until = stats_range(since, until)
+    granularity = granularity or choose_granularity(since, until)
+    if granularity == "hour" and until - since > timedelta(days=STATS_MAX_HOURLY_DAYS):
+        raise HTTPException(status_code=400, detail=f"Hourly series cover at most {STATS_MAX_HOURLY_DAYS} days.")
+    buckets = await load_buckets(granularity, since, until)
+    return {"since": since, "until": until, "granularity": granularity, "points": [bucket_point(b) for b in buckets]}
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus scrape endpoint for the API process. Workers export their
+    own metrics (see WORKER_METRICS_PORT in celery_worker.py).
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from rollups import ROLLUPS_ENABLED, apply_rollups, ensure_rollup_indexes, get_rollup_collection
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+MONGO_CONNECTION_STRING = os.getenv("MONGO_CONNECTION_STRING")
+# Results are buffered and written in bulk: whichever comes first of
+# PERSIST_BATCH_SIZE results or PERSIST_FLUSH_SECONDS.
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "100"))
+PERSIST_FLUSH_SECONDS = float(os.getenv("PERSIST_FLUSH_SECONDS", "1.0"))
+# Results kept in memory while Mongo is unreachable, before dropping the oldest
+PERSIST_MAX_BACKLOG = int(os.getenv("PERSIST_MAX_BACKLOG", "10000"))
+
+# (keys, options) for every index on the analyses collection
+ANALYSIS_INDEXES = [
+    ([("task_id", 1)], {"unique": True, "name": "task_id_unique"}),
+    ([("timestamp", -1), ("_id", -1)], {"name": "timestamp_desc"}),
+    ([("score_band", 1), ("timestamp", -1), ("_id", -1)], {"name": "band_timestamp_desc"}),
+    ([("text_hash", 1)], {"name": "text_hash"}),
+]
+
+
+def get_analysis_collection():
+    from pymongo import MongoClient
+
+    client = MongoClient(MONGO_CONNECTION_STRING)
+    return client.project_inocula.get_collection("analyses")
+
+
+def ensure_indexes(collection):
+    """
+    Creates the analyses indexes (no-op when they already exist).
+    """
+    from pymongo import IndexModel
+
+    collection.create_indexes([IndexModel(keys, **options) for keys, options in ANALYSIS_INDEXES])
+
+
+def build_analysis_doc(task_id: str, text: str, text_hash: str, result: dict, score_band: str,
+                       details: dict = None) -> dict:
+    """
+    The stored form of one finished analysis. `result["analysis_id"]` must
+    already be set; it becomes the document _id. `details` holds the bulky
+    context (Wikipedia extracts) that is only sent on request.
+    """
+    return {
+        "_id": ObjectId(result["analysis_id"]),
+        "task_id": task_id,
+        "timestamp": datetime.now(timezone.utc),
+        "request_text": text,
+        "text_hash": text_hash,
+        "score_band": score_band,
+        "result": result,
+        "details": details or {},
+        "status": "complete",
+    }
+
+
+class BufferedResultWriter:
+    """
+    Collects analysis documents from task threads and upserts them in bulk
+    from a background thread. Upserting on task_id ($setOnInsert) makes
+    retries and duplicate deliveries harmless: each task is stored once.
+
+    Newly inserted analyses are also added to the analytics rollups
+    (rollups.py) when `rollups` is on.
+
+    Documents written with `settle=True` are settled once both their write
+    has landed and the caller reports the task's own result stored
+    (`task_finished`); `on_persisted(task_ids)` is then called, so the
+    caller can drop the copies it kept until then.
+    """
+
+    def __init__(self, collection_factory=get_analysis_collection,
+                 batch_size=PERSIST_BATCH_SIZE, flush_interval=PERSIST_FLUSH_SECONDS, on_persisted=None,
+                 rollups=ROLLUPS_ENABLED):
+        self.collection_factory = collection_factory
+        self.rollups = rollups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_persisted = on_persisted
+        self._collection = None
+        self._rollup_collection = None
+        self._buffer = []
+        self._settle = set()
+        self._persisted = set()
+        self._stored = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = self.collection_factory()
+            ensure_indexes(self._collection)
+        return self._collection
+
+    @property
+    def rollup_collection(self):
+        if self._rollup_collection is None:
+            self._rollup_collection = get_rollup_collection(self.collection)
+            ensure_rollup_indexes(self._rollup_collection)
+        return self._rollup_collection
+
+    def write(self, doc: dict, settle: bool = False):
+        with self._lock:
+            self._buffer.append(doc)
+            if settle:
+                self._settle.add(doc["task_id"])
+            full = len(self._buffer) >= self.batch_size
+            # Started lazily so each prefork child gets its own thread
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inocula-persist", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        with self._flush_lock:
+            with self._lock:
+                docs, self._buffer = self._buffer, []
+            if not docs:
+                return
+
+            operations = [
+                UpdateOne(
+                    {"task_id": doc["task_id"]},
+                    {"$setOnInsert": {k: v for k, v in doc.items() if k != "task_id"}},
+                    upsert=True,
+                )
+                for doc in docs
+            ]
+            failed = set()
+            try:
+                inserted = set(self.collection.bulk_write(operations, ordered=False).upserted_ids)
+            except BulkWriteError as e:
+                # 11000 = duplicate key: the analysis was already stored
+                errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+                if errors:
+                    logger.error(f"Failed to persist {len(errors)} analyses: {errors[0].get('errmsg')}")
+                failed = {err["index"] for err in errors}
+                inserted = {upsert["index"] for upsert in e.details.get("upserted", [])}
+            except Exception as e:
+                logger.error(f"Mongo unavailable, keeping {len(docs)} analyses for retry: {e}")
+                with self._lock:
+                    backlog = docs + self._buffer
+                    for doc in backlog[:-PERSIST_MAX_BACKLOG]:
+                        self._forget_settle(doc["task_id"])
+                    self._buffer = backlog[-PERSIST_MAX_BACKLOG:]
+                return
+
+            if self.rollups and inserted:
+                # Only analyses stored by this write, so redeliveries count once
+                try:
+                    apply_rollups(self.rollup_collection, [docs[index] for index in sorted(inserted)])
+                except Exception as e:
+                    logger.error(f"Failed to update rollups for {len(inserted)} analyses: {e}")
+
+            settled = []
+            with self._lock:
+                for index, doc in enumerate(docs):
+                    task_id = doc["task_id"]
+                    if task_id not in self._settle:
+                        continue
+                    if index in failed:
+                        self._forget_settle(task_id)
+                    elif task_id in self._stored:
+                        self._forget_settle(task_id)
+                        settled.append(task_id)
+                    else:
+                        self._persisted.add(task_id)
+            self._settled(settled)
+
+    def task_finished(self, task_id: str, stored: bool):
+        """
+        Reports that the task's result has been stored (`stored`), or that
+        it never will be, e.g. the task failed after writing its analysis.
+        """
+        with self._lock:
+            if task_id not in self._settle:
+                return
+            if not stored:
+                self._forget_settle(task_id)
+                return
+            if task_id not in self._persisted:
+                self._stored.add(task_id)
+                return
+            self._forget_settle(task_id)
+        self._settled([task_id])
+
+    def _forget_settle(self, task_id):
+        self._settle.discard(task_id)
+        self._persisted.discard(task_id)
+        self._stored.discard(task_id)
+
+    def _settled(self, task_ids):
+        if task_ids and self.on_persisted:
+            try:
+                self.on_persisted(task_ids)
+            except Exception as e:
+                logger.warning(f"on_persisted failed for {len(task_ids)} analyses: {e}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_result_writer() -> BufferedResultWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BufferedResultWriter()
+        return _writer
@@ -0,0 +1,337 @@
+"""
+Known-claim prefilter: signatures of the debunked claims in semantic memory
+(agents/memory.py), published so that exact and near-exact repeats are
+recognized before any model runs, by the API (/analyze fast path) and by
+the browser extension (which downloads the Bloom filter from /prefilter).
+The extension only answers exact-key hits itself: a shared band pair
+doesn't bound the distance, so near hits are confirmed here (match()
+checks PREFILTER_MAX_DISTANCE against the stored fingerprints).
+
+Signatures, computed identically in extension/prefilter.js:
+- normalized text: NFKC, lowercase, every run of characters that are not
+  letters or digits replaced by one space, trimmed
+- exact: FNV-1a 64 of the normalized text (UTF-8)
+- simhash: 64-bit SimHash over the distinct words (FNV-1a 64 per word);
+  only for texts of MIN_TOKENS words or more
+- Bloom keys: "x:<exact hex>", plus one "p<i><j>:<band i><band j>" per
+  pair of the simhash's four 16-bit bands. Two simhashes at most 2 bits
+  apart share at least two intact bands, so a near-exact repeat always
+  hits one pair key.
+- Bloom positions: h = FNV-1a 64 of the key, h1 = low 32 bits,
+  h2 = high 32 bits | 1, position i = (h1 + i * h2) mod m
+
+Claims are appended to a Redis list (one JSON entry per claim, so the
+list length is the version) under an epoch that changes on every rebuild.
+Clients fetch the full filter once and then the keys added since their
+version (/prefilter/delta).
+
+Run from the backend folder:
+    python -m prefilter build   # new epoch from the whole memory store
+    python -m prefilter sync    # publish claims added to memory since
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import threading
+import time
+import unicodedata
+import uuid
+
+from agents.reasons import REASON_TEMPLATES
+from redis_client import REDIS_URL, get_redis
+
+PREFILTER_ENABLED = os.getenv("PREFILTER", "1") == "1"
+# Target false-positive rate per checked text (spread over its Bloom keys)
+PREFILTER_FP_RATE = float(os.getenv("PREFILTER_FP_RATE", "0.0001"))
+# Claims the filter is sized for; a sync past this rebuilds it larger
+PREFILTER_CAPACITY = int(os.getenv("PREFILTER_CAPACITY", "10000"))
+# How often the API picks up newly published claims
+PREFILTER_REFRESH_SECONDS = float(os.getenv("PREFILTER_REFRESH_SECONDS", "30"))
+# Largest simhash distance accepted as a near-exact repeat (the band
+# pairs guarantee finding anything up to 2)
+PREFILTER_MAX_DISTANCE = 2
+MIN_TOKENS = 3
+BANDS = 4
+BAND_PAIRS = [(i, j) for i in range(BANDS) for j in range(i + 1, BANDS)]
+KEYS_PER_CLAIM = 1 + len(BAND_PAIRS)
+
+# Everything after the memory lookup, none of which runs for a known claim
+PREFILTER_SKIPPED_STEPS = ["verifier", "detector", "analyzer", "fallacy", "explainer"]
+
+META_KEY = "inocula:prefilter:meta"
+LOG_KEY = "inocula:prefilter:log"
+
+_FNV_OFFSET = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+_MASK64 = (1 << 64) - 1
+
+
+def fnv1a64(data: bytes) -> int:
+    value = _FNV_OFFSET
+    for byte in data:
+        value = ((value ^ byte) * _FNV_PRIME) & _MASK64
+    return value
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+
+
+def simhash(tokens):
+    tokens = set(tokens)
+    if len(tokens) < MIN_TOKENS:
+        return None
+    weights = [0] * 64
+    for token in tokens:
+        value = fnv1a64(token.encode("utf-8"))
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def claim_signature(text: str) -> dict:
+    normalized = normalize(text)
+    return {"exact": fnv1a64(normalized.encode("utf-8")), "simhash": simhash(normalized.split(" "))}
+
+
+def pair_keys(fingerprint: int):
+    bands = [fingerprint >> (16 * band) & 0xffff for band in range(BANDS)]
+    return [f"p{i}{j}:{bands[i]:04x}{bands[j]:04x}" for i, j in BAND_PAIRS]
+
+
+def bloom_keys(signature: dict):
+    keys = [f"x:{signature['exact']:016x}"]
+    if signature["simhash"] is not None:
+        keys += pair_keys(signature["simhash"])
+    return keys
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BloomFilter:
+    def __init__(self, m: int, k: int, bits: bytes = None):
+        self.m = m
+        self.k = k
+        self.bits = bytearray(bits) if bits else bytearray((m + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, claims: int, fp_rate: float = PREFILTER_FP_RATE):
+        keys = max(1, claims) * KEYS_PER_CLAIM
+        key_fp = fp_rate / KEYS_PER_CLAIM
+        m = math.ceil(-keys * math.log(key_fp) / math.log(2) ** 2 / 8) * 8
+        return cls(m, max(1, round(m / keys * math.log(2))))
+
+    def positions(self, key: str):
+        value = fnv1a64(key.encode("utf-8"))
+        h1, h2 = value & 0xffffffff, (value >> 32) | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def add(self, key: str):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str):
+        return all(self.bits[position >> 3] >> (position & 7) & 1 for position in self.positions(key))
+
+
+class PrefilterIndex:
+    """
+    In-process view of the published claims: the Bloom filter served to
+    clients, plus exact and band-pair tables (with labels) that confirm a
+    match for the /analyze fast path. Catches up from Redis at most every
+    PREFILTER_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._reset(None, BloomFilter.for_capacity(PREFILTER_CAPACITY))
+
+    def _reset(self, epoch, bloom):
+        self.epoch = epoch
+        self.version = 0
+        self.bloom = bloom
+        self.exact = {}
+        self.pairs = {}
+        self._snapshot = None
+
+    def _apply(self, claim: dict):
+        signature = {"exact": int(claim["exact"], 16), "simhash": int(claim["simhash"], 16) if claim["simhash"] else None}
+        self.exact[signature["exact"]] = claim["label"]
+        if signature["simhash"] is not None:
+            for key in pair_keys(signature["simhash"]):
+                self.pairs.setdefault(key, []).append((signature["simhash"], claim["label"]))
+        for key in bloom_keys(signature):
+            self.bloom.add(key)
+
+    def refresh(self, force: bool = False):
+        if not force and time.monotonic() - self._checked < PREFILTER_REFRESH_SECONDS:
+            return
+        with self._lock:
+            self._checked = time.monotonic()
+            redis = get_redis()
+            meta = redis.hgetall(META_KEY)
+            if not meta:
+                return
+            if meta["epoch"] != self.epoch:
+                self._reset(meta["epoch"], BloomFilter(int(meta["m"]), int(meta["k"])))
+            entries = redis.lrange(LOG_KEY, self.version, -1)
+            for raw in entries:
+                self._apply(json.loads(raw))
+            if entries:
+                self.version += len(entries)
+                self._snapshot = None
+
+    def match(self, text: str):
+        """
+        {"kind": "exact" | "near", "label"} for a known claim, else None.
+        """
+        signature = claim_signature(text)
+        label = self.exact.get(signature["exact"])
+        if label is not None:
+            return {"kind": "exact", "label": label}
+        if signature["simhash"] is None:
+            return None
+        for key in pair_keys(signature["simhash"]):
+            for fingerprint, label in self.pairs.get(key, ()):
+                if hamming(fingerprint, signature["simhash"]) <= PREFILTER_MAX_DISTANCE:
+                    return {"kind": "near", "label": label}
+        return None
+
+    def snapshot(self) -> dict:
+        """
+        The whole filter for clients, built once per version.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = {
+                    "epoch": self.epoch,
+                    "version": self.version,
+                    "m": self.bloom.m,
+                    "k": self.bloom.k,
+                    "max_distance": PREFILTER_MAX_DISTANCE,
+                    "bits": base64.b64encode(bytes(self.bloom.bits)).decode("ascii"),
+                }
+            return self._snapshot
+
+
+def delta_keys(epoch: str, since: int):
+    """
+    (current version, Bloom keys of the claims published after `since`),
+    or None when `epoch` is not the current one (the client has to fetch
+    the whole filter again).
+    """
+    redis = get_redis()
+    meta = redis.hgetall(META_KEY)
+    if not meta or meta["epoch"] != epoch:
+        return None
+    entries = redis.lrange(LOG_KEY, since, -1)
+    keys = []
+    for raw in entries:
+        claim = json.loads(raw)
+        keys += bloom_keys({"exact": int(claim["exact"], 16),
+                            "simhash": int(claim["simhash"], 16) if claim["simhash"] else None})
+    return since + len(entries), keys
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_prefilter_index() -> PrefilterIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PrefilterIndex()
+    return _index
+
+
+def check_known_claim(text: str):
+    """
+    The /analyze fast path: the match for `text`, or None. Never raises.
+    """
+    if not PREFILTER_ENABLED or not REDIS_URL:
+        return None
+    try:
+        index = get_prefilter_index()
+        index.refresh()
+        return index.match(text)
+    except Exception:
+        return None
+
+
+def known_claim_result(match: dict) -> dict:
+    """
+    The verdict returned for a prefilter match, shaped like a task result.
+    """
+    return {
+        "score": 0,
+        "reasons": [REASON_TEMPLATES[0]],
+        "explanation": f"Quick check: matches a known claim ({match['label']}).",
+        "detected_emotions": [],
+        "skipped_steps": PREFILTER_SKIPPED_STEPS,
+        "status": "complete",
+        "mode": "prefilter",
+        "prefilter_match": match["kind"],
+    }
+
+
+# --- Publishing ---
+
+def claim_entry(text: str, label: str) -> str:
+    signature = claim_signature(text)
+    return json.dumps({
+        "exact": f"{signature['exact']:016x}",
+        "simhash": f"{signature['simhash']:016x}" if signature["simhash"] is not None else None,
+        "label": label,
+    })
+
+
+def publish(records, start: int = 0, rebuild: bool = False, chunk_size: int = 5000) -> dict:
+    """
+    Appends memory records[start:] to the claim log. With `rebuild` (or
+    once the log would outgrow the filter's capacity), starts a new epoch
+    sized for all records and publishes them all.
+    """
+    redis = get_redis()
+    meta = redis.hgetall(META_KEY)
+    total = len(records)
+    # Also rebuilt when the memory store lost records (e.g. restored from a backup)
+    if not meta or int(meta.get("capacity", 0)) < total or int(meta.get("records", 0)) > total:
+        rebuild = True
+    if rebuild:
+        start = 0
+        capacity = max(PREFILTER_CAPACITY, 2 * total)
+        bloom = BloomFilter.for_capacity(capacity)
+        meta = {"epoch": uuid.uuid4().hex[:12], "m": bloom.m, "k": bloom.k, "capacity": capacity, "records": 0}
+        pipe = redis.pipeline()
+        pipe.delete(LOG_KEY, META_KEY)
+        pipe.hset(META_KEY, mapping=meta)
+        pipe.execute()
+
+    published = 0
+    for offset in range(start, total, chunk_size):
+        chunk = [records[i] for i in range(offset, min(total, offset + chunk_size))]
+        pipe = redis.pipeline()
+        pipe.rpush(LOG_KEY, *[claim_entry(record["text"], record["label"]) for record in chunk])
+        pipe.hincrby(META_KEY, "records", len(chunk))
+        pipe.execute()
+        published += len(chunk)
+    return {"epoch": meta["epoch"], "rebuilt": rebuild, "published": published, "version": redis.llen(LOG_KEY)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the known-claim prefilter.")
+    parser.add_argument("command", choices=["build", "sync"])
+    args = parser.parse_args()
+
+    from agents import memory
+
+    memory.seed_memory()
+    records = list(memory.knowledge_base)
+    start = int(get_redis().hget(META_KEY, "records") or 0)
+    print(publish(records, start=start, rebuild=args.command == "build"))
@@ -0,0 +1,22 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+REDIS_URL = os.getenv("REDIS_URL")
+
+_client = None
+
+def get_redis():
+    """
+    Shared Redis connection (same REDIS_URL as the Celery broker).
+    Upstash uses rediss:// with unverified certificates, like celery_worker.py.
+    """
+    global _client
+    if _client is None:
+        import redis
+
+        options = {"decode_responses": True}
+        if REDIS_URL and REDIS_URL.startswith("rediss://"):
+            options["ssl_cert_reqs"] = None
+        _client = redis.Redis.from_url(REDIS_URL, **options)
+    return _client
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import time
+import unicodedata
+
+from agents.ttl_cache import LRUTTLCache
+from redis_client import REDIS_URL, get_redis
+
+# Bump these whenever a model or the explainer prompt changes, so stale
+# verdicts are not served for the new pipeline.
+MODEL_VERSION = os.getenv("INOCULA_MODEL_VERSION", "toxic-bert/emotion-distilroberta/deberta-v3-nli/minilm-l6")
+PROMPT_VERSION = os.getenv("INOCULA_PROMPT_VERSION", "1")
+
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "redis" if REDIS_URL else "memory")
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "50000"))
+# An in-flight claim should never outlive the task itself (task_time_limit)
+INFLIGHT_TTL = int(os.getenv("RESULT_CACHE_INFLIGHT_TTL", "600"))
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """
+    Version-independent identity of a text (stored with each analysis).
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def cache_key(text: str) -> str:
+    """
+    Content address for a text under the current model and prompt versions.
+    """
+    payload = f"{MODEL_VERSION}\n{PROMPT_VERSION}\n{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class InMemoryResultCache:
+    """
+    Process-local backend. Only useful when the API and the worker share a
+    process (tests, eager Celery), since nothing is shared across processes.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL):
+        self.results = LRUTTLCache(max_entries, ttl)
+        self.inflight = LRUTTLCache(max_entries, INFLIGHT_TTL)
+
+    def get(self, key):
+        return self.results.get(key)
+
+    def set(self, key, entry):
+        self.results.set(key, entry)
+
+    def claim(self, key, task_id):
+        """
+        Marks `key` as being analyzed by `task_id`. Returns the task ID that
+        already owns it, or None if this call won the claim.
+        """
+        owner = self.inflight.setdefault(key, task_id)
+        return None if owner == task_id else owner
+
+    def release(self, key):
+        self.inflight.delete(key)
+
+
+class RedisResultCache:
+    """
+    Shared backend on the existing REDIS_URL. Entries expire after `ttl`;
+    a sorted set of insertion times caps the number of stored results.
+    """
+
+    PREFIX = "inocula:result:"
+    INFLIGHT_PREFIX = "inocula:inflight:"
+    INDEX = "inocula:result:index"
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = get_redis()
+
+    def get(self, key):
+        raw = self.redis.get(self.PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, entry):
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.set(self.PREFIX + key, json.dumps(entry), ex=self.ttl)
+        pipe.zadd(self.INDEX, {key: now})
+        # Forget index entries whose results already expired
+        pipe.zremrangebyscore(self.INDEX, "-inf", now - self.ttl)
+        pipe.zcard(self.INDEX)
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [member for member, _ in self.redis.zpopmin(self.INDEX, overflow)]
+            if evicted:
+                self.redis.delete(*[self.PREFIX + k for k in evicted])
+
+    def claim(self, key, task_id):
+        name = self.INFLIGHT_PREFIX + key
+        # Two attempts: the previous owner may finish between SET NX and GET
+        for _ in range(2):
+            if self.redis.set(name, task_id, nx=True, ex=INFLIGHT_TTL):
+                return None
+            owner = self.redis.get(name)
+            if owner is not None:
+                return owner
+        return None
+
+    def release(self, key):
+        self.redis.delete(self.INFLIGHT_PREFIX + key)
+
+
+class NullResultCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, entry):
+        pass
+
+    def claim(self, key, task_id):
+        return None
+
+    def release(self, key):
+        pass
+
+
+_cache = None
+
+def get_result_cache():
+    global _cache
+    if _cache is None:
+        backends = {"redis": RedisResultCache, "memory": InMemoryResultCache, "off": NullResultCache}
+        _cache = backends[RESULT_CACHE_BACKEND]()
+    return _cache
@@ -0,0 +1,236 @@
+"""
+Time-bucketed analytics rollups of the analyses collection, for the /stats
+endpoints. Each bucket document holds counters for one hour or one day:
+    {"granularity": "hour", "bucket": <start>, "count", "score_sum",
+     "bands": {band: n}, "scores": {"0".."9": n}, "reasons": {key: n},
+     "emotions": {label: n}, "memory_hits", "lite", "semantic_matches"}
+The buffered result writer $inc's them for every newly stored analysis, so
+a range query reads a handful of small documents instead of scanning
+analyses.
+
+Backfill (rebuilds the buckets of analyses stored before rollups existed),
+run from the backend folder:
+    python -m rollups backfill --since 2024-01-01
+"""
+import argparse
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from agents.reasons import reason_key
+from agents.scoring import SCORE_BANDS, score_band
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS_ENABLED = os.getenv("ROLLUPS", "1") == "1"
+ROLLUP_COLLECTION = "analysis_rollups"
+GRANULARITIES = ("hour", "day")
+# Scores are counted in 10 bins of 10 points (100 falls in the last one)
+SCORE_BINS = 10
+COUNTERS = ("count", "score_sum", "memory_hits", "lite", "semantic_matches")
+
+ROLLUP_INDEXES = [
+    ([("granularity", 1), ("bucket", 1)], {"unique": True, "name": "granularity_bucket"}),
+]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    timestamp = timestamp.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0) if granularity == "day" else timestamp
+
+
+def score_bin(score) -> str:
+    return str(min(SCORE_BINS - 1, max(0, int(score)) * SCORE_BINS // 100))
+
+
+def analysis_increments(doc: dict) -> dict:
+    """
+    The counters one stored analysis adds to its buckets, as dotted
+    field names ready for $inc.
+    """
+    result = doc.get("result", {})
+    score = result.get("score", 0)
+    reasons = result.get("reasons", [])
+    increments = defaultdict(int)
+    increments["count"] = 1
+    increments["score_sum"] = score
+    increments[f"bands.{doc.get('score_band') or score_band(score)}"] += 1
+    increments[f"scores.{score_bin(score)}"] += 1
+    for key in {reason_key(reason) for reason in reasons}:
+        increments[f"reasons.{key}"] += 1
+    for label in set(result.get("detected_emotions", [])):
+        increments[f"emotions.{label}"] += 1
+    increments["memory_hits"] = int(any(reason_key(reason) == "memory_match" for reason in reasons))
+    increments["lite"] = int(result.get("mode") == "lite")
+    increments["semantic_matches"] = int("semantic_match" in result)
+    return increments
+
+
+def bucket_increments(docs) -> dict:
+    """
+    {(granularity, bucket): {field: n}} summed over `docs`.
+    """
+    buckets = defaultdict(lambda: defaultdict(int))
+    for doc in docs:
+        increments = analysis_increments(doc)
+        for granularity in GRANULARITIES:
+            counters = buckets[(granularity, bucket_start(doc["timestamp"], granularity))]
+            for field, value in increments.items():
+                counters[field] += value
+    return buckets
+
+
+def get_rollup_collection(analyses):
+    return analyses.database.get_collection(ROLLUP_COLLECTION)
+
+
+def ensure_rollup_indexes(collection):
+    from pymongo import IndexModel
+
+    collection.create_indexes([IndexModel(keys, **options) for keys, options in ROLLUP_INDEXES])
+
+
+def apply_rollups(collection, docs):
+    """
+    Adds newly stored analyses to their buckets: one upsert per bucket.
+    Not idempotent, so callers pass each analysis once (the writer only
+    passes documents its upsert actually inserted).
+    """
+    from pymongo import UpdateOne
+
+    buckets = bucket_increments(docs)
+    if not buckets:
+        return
+    collection.bulk_write([
+        UpdateOne({"granularity": granularity, "bucket": bucket}, {"$inc": dict(counters)}, upsert=True)
+        for (granularity, bucket), counters in buckets.items()
+    ], ordered=False)
+
+
+# --- Queries (shared by the API and the benchmark) ---
+
+def choose_granularity(since: datetime, until: datetime) -> str:
+    # Hour buckets up to a week (at most 168 documents), day buckets beyond
+    return "hour" if until - since <= timedelta(days=7) else "day"
+
+
+def rollup_query(granularity: str, since: datetime, until: datetime) -> dict:
+    return {
+        "granularity": granularity,
+        "bucket": {"$gte": bucket_start(since, granularity), "$lt": until},
+    }
+
+
+def merge_buckets(buckets) -> dict:
+    """
+    Sums bucket documents into one summary.
+    """
+    total = defaultdict(int)
+    nested = {"bands": defaultdict(int), "scores": defaultdict(int), "reasons": defaultdict(int), "emotions": defaultdict(int)}
+    for bucket in buckets:
+        for field in COUNTERS:
+            total[field] += bucket.get(field, 0)
+        for field, counts in nested.items():
+            for key, value in bucket.get(field, {}).items():
+                counts[key] += value
+    return summarize(total, nested)
+
+
+def summarize(total: dict, nested: dict) -> dict:
+    count = total["count"]
+    return {
+        "count": count,
+        "average_score": round(total["score_sum"] / count, 2) if count else None,
+        "bands": {band: nested["bands"].get(band, 0) for band in SCORE_BANDS},
+        "score_histogram": [nested["scores"].get(str(i), 0) for i in range(SCORE_BINS)],
+        "top_reasons": [
+            {"reason": key, "count": value}
+            for key, value in sorted(nested["reasons"].items(), key=lambda item: item[1], reverse=True)
+        ],
+        "emotions": dict(nested["emotions"]),
+        "memory_hit_rate": round(total["memory_hits"] / count, 4) if count else None,
+        "lite": total["lite"],
+        "semantic_matches": total["semantic_matches"],
+    }
+
+
+def bucket_point(bucket: dict) -> dict:
+    """
+    One time-series point of a bucket document.
+    """
+    count = bucket.get("count", 0)
+    return {
+        "bucket": bucket["bucket"],
+        "count": count,
+        "average_score": round(bucket.get("score_sum", 0) / count, 2) if count else None,
+        "bands": {band: bucket.get("bands", {}).get(band, 0) for band in SCORE_BANDS},
+        "memory_hits": bucket.get("memory_hits", 0),
+    }
+
+
+# --- Backfill ---
+
+def backfill(analyses, since: datetime = None, until: datetime = None, batch_size: int = 5000) -> dict:
+    """
+    Recomputes the buckets for analyses in [since, until) and replaces them.
+    `until` defaults to the start of the current UTC day: buckets from then
+    on are being incremented live, and replacing them would drop those
+    increments. Both ends are rounded down to the start of their day.
+    """
+    from pymongo import ReplaceOne
+
+    until = bucket_start(until or datetime.now(timezone.utc), "day")
+    since = bucket_start(since, "day") if since else None
+    rollups = get_rollup_collection(analyses)
+    ensure_rollup_indexes(rollups)
+
+    query = {"timestamp": {"$lt": until}}
+    if since:
+        query["timestamp"]["$gte"] = since
+    cursor = analyses.find(query, {"timestamp": 1, "score_band": 1, "result": 1}, batch_size=batch_size)
+
+    buckets = defaultdict(lambda: defaultdict(int))
+    seen = 0
+    for doc in cursor:
+        for key, counters in bucket_increments([doc]).items():
+            for field, value in counters.items():
+                buckets[key][field] += value
+        seen += 1
+        if seen % 100000 == 0:
+            logger.info(f"Backfill: {seen} analyses read")
+
+    # Replace every bucket of the range, dropping stale ones with no analyses left
+    removed = rollups.delete_many(
+        {"bucket": {"$lt": until, **({"$gte": since} if since else {})}}).deleted_count
+    operations = []
+    for (granularity, bucket), counters in buckets.items():
+        doc = {"granularity": granularity, "bucket": bucket}
+        for field, value in counters.items():
+            parent, _, child = field.partition(".")
+            if child:
+                doc.setdefault(parent, {})[child] = value
+            else:
+                doc[field] = value
+        operations.append(ReplaceOne({"granularity": granularity, "bucket": bucket}, doc, upsert=True))
+    for start in range(0, len(operations), batch_size):
+        rollups.bulk_write(operations[start:start + batch_size], ordered=False)
+    return {"analyses": seen, "buckets": len(operations), "replaced": removed}
+
+
+if __name__ == "__main__":
+    from persistence import get_analysis_collection
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollups.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("backfill", help="rebuild the buckets of already stored analyses")
+    command.add_argument("--since", type=datetime.fromisoformat)
+    command.add_argument("--until", type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    since = args.since.replace(tzinfo=args.since.tzinfo or timezone.utc) if args.since else None
+    until = args.until.replace(tzinfo=args.until.tzinfo or timezone.utc) if args.until else None
+    print(backfill(get_analysis_collection(), since, until))
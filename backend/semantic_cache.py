@@ -0,0 +1,170 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from redis_client import get_redis
+from result_cache import MODEL_VERSION, PROMPT_VERSION, RESULT_CACHE_BACKEND, RESULT_CACHE_TTL
+
+# Near-duplicate result cache: a text whose embedding is close enough to an
+# already-analyzed one (a reworded copy of a viral post) reuses its verdict.
+# The exact-text cache in result_cache.py is checked first, by the API.
+SEMANTIC_CACHE_BACKEND = os.getenv("SEMANTIC_CACHE_BACKEND", RESULT_CACHE_BACKEND)  # redis | memory | off
+# Cosine similarity of MiniLM embeddings. Negations barely move it, which
+# is why entries also have to agree on negation words (see negation_sign).
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "20000"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(RESULT_CACHE_TTL)))
+
+NEGATIONS = re.compile(r"\b(not|no|never|none|nobody|nothing|neither|nor|without|false|fake|hoax|myth)\b|n't\b", re.IGNORECASE)
+
+
+def negation_sign(text: str) -> int:
+    """
+    Parity of negation words: "X causes Y" and "X does not cause Y" embed
+    almost identically but must not share a verdict.
+    """
+    return len(NEGATIONS.findall(text)) % 2
+
+
+class VectorTable:
+    """
+    Fixed-size ring buffer of unit vectors with their entries. Lookups are a
+    brute-force dot product, which stays well under a millisecond at the
+    default size, and unlike a FAISS index it can overwrite old slots.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors = None
+        self._created = np.zeros(max_entries, dtype='float64')
+        self._entries = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def add(self, vector, entry, created_at: float = None):
+        vector = np.asarray(vector, dtype='float32')
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype='float32')
+            slot = self._next
+            self._vectors[slot] = vector
+            self._created[slot] = time.time() if created_at is None else created_at
+            self._entries[slot] = entry
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def nearest(self, vector):
+        """
+        (similarity, entry) of the closest unexpired vector, or None.
+        """
+        with self._lock:
+            if not self._size:
+                return None
+            similarity = self._vectors[:self._size] @ np.asarray(vector, dtype='float32')
+            similarity[self._created[:self._size] < time.time() - self.ttl] = -1.0
+            best = int(np.argmax(similarity))
+            if similarity[best] < 0:
+                return None
+            return float(similarity[best]), self._entries[best]
+
+    def __len__(self):
+        with self._lock:
+            return self._size
+
+
+class InMemorySemanticCache:
+    """
+    Process-local backend. With several workers each has its own table, and
+    an io-queue worker's writes never reach the CPU workers, so use redis
+    in that setup.
+    """
+
+    def __init__(self, max_entries=SEMANTIC_CACHE_MAX_ENTRIES, ttl=SEMANTIC_CACHE_TTL,
+                 threshold=SEMANTIC_CACHE_THRESHOLD):
+        self.threshold = threshold
+        self.table = VectorTable(max_entries, ttl)
+
+    def get(self, vector, text: str):
+        """
+        Returns (entry, similarity) for a cached text at or above the
+        threshold with the same negation sign, or None.
+        """
+        match = self.table.nearest(vector)
+        if match is None:
+            return None
+        similarity, entry = match
+        if similarity < self.threshold or entry["negation"] != negation_sign(text):
+            return None
+        return entry, similarity
+
+    def set(self, vector, text: str, entry: dict):
+        self.table.add(vector, {**entry, "negation": negation_sign(text)})
+
+
+class RedisSemanticCache(InMemorySemanticCache):
+    """
+    Shared backend: entries are appended to a capped Redis stream, and every
+    process mirrors the stream into its own VectorTable, reading only what
+    was added since its last lookup. The stream key includes the model and
+    prompt versions, so a new pipeline starts empty.
+    """
+
+    def __init__(self, max_entries=SEMANTIC_CACHE_MAX_ENTRIES, ttl=SEMANTIC_CACHE_TTL,
+                 threshold=SEMANTIC_CACHE_THRESHOLD):
+        super().__init__(max_entries, ttl, threshold)
+        self.max_entries = max_entries
+        self.redis = get_redis()
+        version = hashlib.sha256(f"{MODEL_VERSION}\n{PROMPT_VERSION}".encode("utf-8")).hexdigest()[:12]
+        self.stream = f"inocula:semantic:{version}"
+        self._last_id = "0-0"
+        self._sync_lock = threading.Lock()
+
+    def _sync(self):
+        with self._sync_lock:
+            while True:
+                records = self.redis.xrange(self.stream, f"({self._last_id}", "+", count=500)
+                for record_id, fields in records:
+                    vector = np.frombuffer(base64.b64decode(fields["v"]), dtype='float16').astype('float32')
+                    created_at = int(record_id.split("-")[0]) / 1000
+                    self.table.add(vector, json.loads(fields["e"]), created_at)
+                    self._last_id = record_id
+                if len(records) < 500:
+                    return
+
+    def get(self, vector, text: str):
+        self._sync()
+        return super().get(vector, text)
+
+    def set(self, vector, text: str, entry: dict):
+        # float16 halves the stream's memory; cosine changes by < 1e-3
+        packed = base64.b64encode(np.asarray(vector, dtype='float16').tobytes()).decode("ascii")
+        entry = {**entry, "negation": negation_sign(text)}
+        self.redis.xadd(self.stream, {"v": packed, "e": json.dumps(entry)},
+                        maxlen=self.max_entries, approximate=True)
+        self.redis.expire(self.stream, SEMANTIC_CACHE_TTL)
+
+
+class NullSemanticCache:
+    def get(self, vector, text: str):
+        return None
+
+    def set(self, vector, text: str, entry: dict):
+        pass
+
+
+_cache = None
+
+def get_semantic_cache():
+    global _cache
+    if _cache is None:
+        backends = {"redis": RedisSemanticCache, "memory": InMemorySemanticCache, "off": NullSemanticCache}
+        _cache = backends[SEMANTIC_CACHE_BACKEND]()
+    return _cache
@@ -50,13 +50,22 @@ function App() {
     try {
       const response = await fetch(`${API_URL}/history`);
       const data = await response.json();
-      setScans(data);
+      setScans(data.items || []);
     } catch (err) { console.error("History fetch failed", err); }
     finally { setHistoryLoading(false); }
   };
 
   useEffect(() => { fetchData(); }, []);
 
+  const showResult = async (result) => {
+    setIsProcessing(false);
+    // Immediately refresh history to show the new scan
+    await fetchData();
+    // Auto-select the new scan result
+    setSelectedScan({ request_text: inputText, result });
+    setInputText("");
+  };
+
   // --- ASYNC POLLING LOGIC ---
   const pollTaskStatus = async (taskId) => {
     const interval = setInterval(async () => {
@@ -66,12 +75,7 @@ function App() {
 
         if (data.status === 'completed') {
           clearInterval(interval);
-          setIsProcessing(false);
-          // Immediately refresh history to show the new scan
-          await fetchData();
-          // Auto-select the new scan result
-          setSelectedScan({ request_text: inputText, result: data.result });
-          setInputText("");
+          await showResult(data.result);
         } else if (data.status === 'failed') {
           clearInterval(interval);
           setIsProcessing(false);
@@ -96,10 +100,25 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ text: inputText }),
       });
+      // Rate-limited, or the queue is full (admission control)
+      if (response.status === 429) {
+        setIsProcessing(false);
+        const wait = response.headers.get('Retry-After') || 'a few';
+        alert(`The server is busy. Try again in ${wait} seconds.`);
+        return;
+      }
+      if (!response.ok) {
+        throw new Error(`API Error: ${response.status}`);
+      }
       const data = await response.json();
       
-      if (data.task_id) {
+      // Cached and known-claim (prefilter) answers come back completed, without polling
+      if (data.status === 'completed') {
+        await showResult(data.result);
+      } else if (data.task_id) {
         pollTaskStatus(data.task_id);
+      } else {
+        setIsProcessing(false);
       }
     } catch (err) {
       setIsProcessing(false);
@@ -1,8 +1,20 @@
+const API_URL = 'http://127.0.0.1:8000';
+
 // Get references to our HTML elements
 const analyzeButton = document.getElementById('analyze-button');
 const scoreCircle = document.getElementById('score-circle');
 const scoreText = document.getElementById('score-text');
 const reasonText = document.getElementById('reason-text');
+const KNOWN_CLAIM_REASON = "Historical Match: This claim matches a previously debunked narrative.";
+
+// Random per-install ID, so the backend rate-limits each install separately
+async function getClientId() {
+    const { clientId } = await chrome.storage.local.get('clientId');
+    if (clientId) return clientId;
+    const id = crypto.randomUUID();
+    await chrome.storage.local.set({ clientId: id });
+    return id;
+}
 
 // Add a click listener to our button
 analyzeButton.addEventListener('click', async () => {
@@ -21,22 +33,39 @@ analyzeButton.addEventListener('click', async () => {
 
     reasonText.innerText = "Analyzing...";
 
+    // Exact repeats of known debunked claims are answered on this device
+    // (prefilter.js); near repeats are confirmed by the server
+    const filter = await loadPrefilter();
+    if (filter && prefilterMatch(filter, textToAnalyze) === 'exact') {
+        updateUI({ score: 0, reasons: [KNOWN_CLAIM_REASON], mode: 'prefilter' });
+        return;
+    }
+
     // Step 3: Send the extracted text to our backend API
     try {
-        const response = await fetch('http://127.0.0.1:8000/analyze', {
+        const response = await fetch(`${API_URL}/analyze`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'X-Client-Id': await getClientId() },
             body: JSON.stringify({ text: textToAnalyze }),
         });
 
+        if (response.status === 429) {
+            const wait = response.headers.get('Retry-After') || 'a few';
+            reasonText.innerText = `The server is busy. Try again in ${wait} seconds.`;
+            return;
+        }
         if (!response.ok) {
             throw new Error(`API Error: ${response.status}`);
         }
 
         const analysis = await response.json();
 
-        // Step 4: Update the UI with the result
-        updateUI(analysis);
+        // Step 4: Update the UI with the result (cached results come back at once)
+        if (analysis.status === 'completed') {
+            updateUI(analysis.result);
+        } else {
+            streamAnalysis(analysis.task_id);
+        }
 
     } catch (error) {
         reasonText.innerText = "Failed to analyze. Is the server running?";
@@ -44,9 +73,62 @@ analyzeButton.addEventListener('click', async () => {
     }
 });
 
+// Listens to the backend's Server-Sent Events and shows partial verdicts
+// as each agent finishes, instead of polling /status.
+function streamAnalysis(taskId) {
+    const source = new EventSource(`${API_URL}/stream/${taskId}`);
+    const partialReasons = [];
+
+    const showPartial = (update) => {
+        const signal = Object.values(update.signals || {})[0];
+        if (signal && signal.reasons.length) {
+            partialReasons.push(...signal.reasons);
+            reasonText.innerText = `Analyzing... ${signal.reasons[0]}`;
+        }
+    };
+
+    ['verifier', 'detector', 'analyzer', 'fallacy'].forEach((agent) => {
+        source.addEventListener(agent, (event) => showPartial(JSON.parse(event.data)));
+    });
+
+    source.addEventListener('memory', (event) => {
+        const update = JSON.parse(event.data);
+        if (update.is_memory_hit) {
+            reasonText.innerText = update.reasons[0];
+        }
+    });
+
+    // Stylistic score, before the final fact check
+    source.addEventListener('join', (event) => {
+        const update = JSON.parse(event.data);
+        updateUI({ score: update.score, reasons: partialReasons });
+        reasonText.innerText = `Fact-checking... ${reasonText.innerText}`;
+    });
+
+    source.addEventListener('complete', (event) => {
+        source.close();
+        updateUI(JSON.parse(event.data));
+    });
+
+    source.addEventListener('failed', () => {
+        source.close();
+        reasonText.innerText = "Analysis failed. Please try again.";
+    });
+
+    source.onerror = () => {
+        source.close();
+        reasonText.innerText = "Lost connection to the server.";
+    };
+}
+
 function updateUI(analysis) {
     scoreText.innerText = `${analysis.score}%`;
     reasonText.innerText = analysis.reasons[0] || 'Looks good!';
+    if (analysis.mode === 'lite') {
+        reasonText.innerText += ' (quick check, the server is busy)';
+    } else if (analysis.mode === 'prefilter') {
+        reasonText.innerText += ' (quick match against known claims)';
+    }
 
     // Change the circle's border color based on the score
     if (analysis.score > 70) {
@@ -0,0 +1,113 @@
+// Known-claim prefilter: the same signatures as backend/prefilter.py, so
+// repeats of known debunked claims are recognized without calling the API.
+// The Bloom filter is downloaded once, then kept up to date with deltas.
+const FNV_OFFSET = 0xcbf29ce484222325n;
+const FNV_PRIME = 0x100000001b3n;
+const MASK64 = (1n << 64n) - 1n;
+const MIN_TOKENS = 3;
+const BAND_PAIRS = [[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]];
+// How long a downloaded filter is used before asking for a delta
+const PREFILTER_MAX_AGE_MS = 60 * 60 * 1000;
+const encoder = new TextEncoder();
+
+function fnv1a64(text) {
+    let value = FNV_OFFSET;
+    for (const byte of encoder.encode(text)) {
+        value = ((value ^ BigInt(byte)) * FNV_PRIME) & MASK64;
+    }
+    return value;
+}
+
+function normalizeText(text) {
+    return text.normalize('NFKC').toLowerCase().replace(/[^\p{L}\p{N}]+/gu, ' ').trim();
+}
+
+function simhash(tokens) {
+    const unique = [...new Set(tokens)];
+    if (unique.length < MIN_TOKENS) return null;
+    const weights = new Array(64).fill(0);
+    for (const token of unique) {
+        const value = fnv1a64(token);
+        for (let bit = 0; bit < 64; bit++) {
+            weights[bit] += (value >> BigInt(bit)) & 1n ? 1 : -1;
+        }
+    }
+    let fingerprint = 0n;
+    for (let bit = 0; bit < 64; bit++) {
+        if (weights[bit] > 0) fingerprint |= 1n << BigInt(bit);
+    }
+    return fingerprint;
+}
+
+const hex = (value, digits) => value.toString(16).padStart(digits, '0');
+
+function pairKeys(fingerprint) {
+    const bands = [0, 1, 2, 3].map((band) => hex((fingerprint >> BigInt(16 * band)) & 0xffffn, 4));
+    return BAND_PAIRS.map(([i, j]) => `p${i}${j}:${bands[i]}${bands[j]}`);
+}
+
+function bloomPositions(key, m, k) {
+    const value = fnv1a64(key);
+    const h1 = Number(value & 0xffffffffn);
+    const h2 = Number((value >> 32n) | 1n);
+    const positions = [];
+    for (let i = 0; i < k; i++) positions.push((h1 + i * h2) % m);
+    return positions;
+}
+
+const base64ToBytes = (text) => Uint8Array.from(atob(text), (c) => c.charCodeAt(0));
+
+function bytesToBase64(bytes) {
+    let text = '';
+    for (let i = 0; i < bytes.length; i += 0x8000) {
+        text += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+    }
+    return btoa(text);
+}
+
+// Returns 'exact', 'near' or null. Only 'exact' may be answered locally:
+// a shared band pair doesn't bound the simhash distance (and may be a
+// Bloom false positive), so 'near' texts go to /analyze, which confirms
+// the distance before answering.
+function prefilterMatch(filter, text) {
+    const bits = base64ToBytes(filter.bits);
+    const has = (key) => bloomPositions(key, filter.m, filter.k).every((p) => bits[p >> 3] & (1 << (p & 7)));
+    const normalized = normalizeText(text);
+    if (has(`x:${hex(fnv1a64(normalized), 16)}`)) return 'exact';
+    const fingerprint = simhash(normalized.split(' '));
+    if (fingerprint !== null && pairKeys(fingerprint).some(has)) return 'near';
+    return null;
+}
+
+// The stored filter, refreshed when older than PREFILTER_MAX_AGE_MS.
+// Returns null if none could be loaded (the server then checks instead).
+async function loadPrefilter() {
+    const { prefilter } = await chrome.storage.local.get('prefilter');
+    if (prefilter && Date.now() - prefilter.fetchedAt < PREFILTER_MAX_AGE_MS) return prefilter;
+    try {
+        if (prefilter) {
+            const response = await fetch(
+                `${API_URL}/prefilter/delta?epoch=${encodeURIComponent(prefilter.epoch)}&since=${prefilter.version}`);
+            if (response.ok) {
+                const delta = await response.json();
+                const bits = base64ToBytes(prefilter.bits);
+                for (const key of delta.keys) {
+                    for (const p of bloomPositions(key, prefilter.m, prefilter.k)) bits[p >> 3] |= 1 << (p & 7);
+                }
+                const updated = { ...prefilter, version: delta.version, bits: bytesToBase64(bits), fetchedAt: Date.now() };
+                await chrome.storage.local.set({ prefilter: updated });
+                return updated;
+            }
+            // Anything but 410 (filter rebuilt): keep the copy we have
+            if (response.status !== 410) return prefilter;
+        }
+        const response = await fetch(`${API_URL}/prefilter`);
+        if (!response.ok) return prefilter || null;
+        const full = { ...(await response.json()), fetchedAt: Date.now() };
+        await chrome.storage.local.set({ prefilter: full });
+        return full;
+    } catch (error) {
+        console.warn('Prefilter unavailable:', error);
+        return prefilter || null;
+    }
+}